@@ -0,0 +1,7 @@
+"""Performance benchmarks of the ingest, aggregation, feature, model and rendering code.
+
+Run on synthetic data of a given size and compare two result files::
+
+    python -m benchmarks.run --size medium
+    python -m benchmarks.compare benchmarks/results/old.json benchmarks/results/new.json
+"""
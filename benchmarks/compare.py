@@ -0,0 +1,59 @@
+"""Compare two benchmark result files and flag regressions.
+
+Medians are compared benchmark by benchmark. A benchmark is a regression
+when the new median is more than ``--threshold`` slower than the old one;
+the exit status is 1 if there is any, so the comparison can gate CI.
+
+Usage::
+
+    python -m benchmarks.compare old.json new.json --threshold 0.1
+"""
+import json
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(old, new, threshold=0.1):
+    """Rows of (name, old median, new median, ratio, status) for benchmarks in both runs"""
+    rows = []
+    for name, result in new['benchmarks'].items():
+        before = old['benchmarks'].get(name)
+        if before is None or 'median' not in before or 'median' not in result:
+            continue
+        ratio = result['median'] / before['median'] if before['median'] > 0 else float('inf')
+        if ratio > 1 + threshold:
+            status = 'slower'
+        elif ratio < 1 / (1 + threshold):
+            status = 'faster'
+        else:
+            status = 'same'
+        rows.append((name, before['median'], result['median'], ratio, status))
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files')
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.1, help='relative change that counts')
+    args = parser.parse_args()
+
+    old, new = load(args.old), load(args.new)
+    if old['size'] != new['size']:
+        print(f"⚠️ Comparing different data sizes: {old['size']} vs {new['size']}")
+    rows = compare(old, new, args.threshold)
+    print(f"{'benchmark':<40} {'old ms':>12} {'new ms':>12} {'ratio':>8}")
+    for name, before, after, ratio, status in rows:
+        marker = {'slower': '  ❌ slower', 'faster': '  ✅ faster'}.get(status, '')
+        print(f"{name:<40} {before * 1000:>12,.2f} {after * 1000:>12,.2f} {ratio:>8.2f}{marker}")
+    regressions = [row for row in rows if row[4] == 'slower']
+    print(f"\n{len(regressions)} regressions, "
+          f"{sum(row[4] == 'faster' for row in rows)} improvements "
+          f"({old['commit']} -> {new['commit']})")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,135 @@
+"""Run the benchmark suite on synthetic data and save the timings as JSON.
+
+Data for each size is generated once into ``<workdir>/<size>/data`` (see
+``retail_forecast.synthetic``) and reused by later runs. Every benchmark
+is timed ``--repeat`` times after an untimed setup. The results file
+records the machine, the git commit and, for each benchmark, every timing
+plus their min/median/mean, so runs can be compared with
+``python -m benchmarks.compare``.
+
+Usage::
+
+    python -m benchmarks.run --size tiny
+    python -m benchmarks.run --size kaggle --only 'models.*' --repeat 5
+"""
+import fnmatch
+import gc
+import json
+import os
+import platform
+import resource
+import subprocess
+import time
+import warnings
+from statistics import mean, median
+
+from benchmarks.suite import BENCHMARKS, Context
+from retail_forecast import synthetic
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+WORK_DIR = os.path.join(ROOT, 'benchmarks', '.data')
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def select(patterns=None):
+    """Benchmark names matching any of the glob patterns (all when None)"""
+    if not patterns:
+        return list(BENCHMARKS)
+    return [name for name in BENCHMARKS if any(fnmatch.fnmatch(name, p) for p in patterns)]
+
+
+def time_benchmark(ctx, name, repeat):
+    """Setup once, then time the returned callable `repeat` times"""
+    setup, fixed_repeat = BENCHMARKS[name]
+    run = setup(ctx)
+    times = []
+    for _ in range(fixed_repeat or repeat):
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return {
+        'times': [round(t, 6) for t in times],
+        'min': round(min(times), 6),
+        'median': round(median(times), 6),
+        'mean': round(mean(times), 6),
+    }
+
+
+def run_suite(size='tiny', patterns=None, repeat=3, workdir=WORK_DIR, seed=0, progress=print):
+    """Run the selected benchmarks on one data size; returns the results dict"""
+    data_path = os.path.join(workdir, size, 'data')
+    cache_dir = os.path.join(workdir, size, 'cache')
+    params = synthetic.ensure(data_path, size, seed)
+    # Convergence warnings of the statsmodels fits would drown the progress lines
+    warnings.filterwarnings('ignore')
+    ctx = Context(data_path, cache_dir)
+
+    results = {
+        'size': size,
+        'data': {key: params[key] for key in ('stores', 'families', 'days', 'rows', 'seed')},
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'cpus': os.cpu_count(),
+        'started_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'benchmarks': {},
+    }
+    started = time.perf_counter()
+    for name in select(patterns):
+        try:
+            result = time_benchmark(ctx, name, repeat)
+        except Exception as e:
+            result = {'error': f'{type(e).__name__}: {e}'}
+            progress(f"   {name:<40} failed: {result['error']}")
+        else:
+            progress(f"   {name:<40} {result['median'] * 1000:>12,.2f} ms")
+        results['benchmarks'][name] = result
+    results['wall_seconds'] = round(time.perf_counter() - started, 2)
+    results['peak_rss_mb'] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return results
+
+
+def save_results(results, output=RESULTS_DIR):
+    os.makedirs(output, exist_ok=True)
+    stamp = results['started_at'].replace(':', '').replace('-', '')
+    path = os.path.join(output, f"{stamp}-{results['size']}-{results['commit'] or 'nogit'}.json")
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=2)
+    return path
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the benchmark suite on synthetic data')
+    parser.add_argument('--size', choices=synthetic.SIZES, default='tiny')
+    parser.add_argument('--only', nargs='+', default=None, metavar='PATTERN',
+                        help="glob patterns of benchmark names, e.g. 'models.*'")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', default=WORK_DIR, help='where synthetic data and caches are kept')
+    parser.add_argument('--output', default=RESULTS_DIR, help='folder for the JSON results')
+    parser.add_argument('--list', action='store_true', help='list the benchmarks and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        print('\n'.join(select(args.only)))
+    else:
+        print(f"Running benchmarks on the '{args.size}' synthetic data...")
+        results = run_suite(args.size, args.only, args.repeat, args.workdir, args.seed)
+        path = save_results(results, args.output)
+        failed = [name for name, result in results['benchmarks'].items() if 'error' in result]
+        print(f"✅ {len(results['benchmarks']) - len(failed)} benchmarks in {results['wall_seconds']}s "
+              f"(peak RSS {results['peak_rss_mb']:,.0f} MB): {path}")
+        if failed:
+            print(f"   Failed: {', '.join(failed)}")
@@ -0,0 +1,286 @@
+"""Benchmark definitions.
+
+Each benchmark is a setup function registered with ``@benchmark(name)``. It
+receives a ``Context`` (paths and lazily loaded inputs shared by every
+benchmark of a run) and returns the zero-argument callable that is timed.
+Setup work (loading inputs, fitting the model a predict benchmark needs)
+is not timed.
+"""
+import os
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import (baselines, decomposition, drilldown, features, global_model, holiday_calendar,
+                             ingest, overview, rollups, snapshot)
+from retail_forecast.hierarchy import fit_profile, load_bottom_series
+from retail_forecast.models import available_models, make_model
+from retail_forecast.render_cache import RenderCache, figure_to_png
+from retail_forecast.seasonal_stats import compute_seasonal_stats
+
+# name -> (setup, repeat override)
+BENCHMARKS = {}
+
+FORECAST_DAYS = 90
+
+# Statsmodels/Prophet fits take seconds each; time them once
+SLOW_FITS = ('ARIMA', 'SARIMA', 'Prophet')
+
+
+def benchmark(name, repeat=None):
+    def register(setup):
+        BENCHMARKS[name] = (setup, repeat)
+        return setup
+    return register
+
+
+class Context:
+    """Paths of one run plus inputs loaded once and shared by the benchmarks"""
+
+    def __init__(self, data_path, cache_dir):
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+
+    def csv(self, name):
+        return os.path.join(self.data_path, name)
+
+    @cached_property
+    def train_df(self):
+        return pd.read_csv(self.csv('train.csv'), dtype=ingest.TRAIN_DTYPES, parse_dates=['date'])
+
+    @cached_property
+    def stores_df(self):
+        return pd.read_csv(self.csv('stores.csv'), dtype=ingest.STORES_DTYPES)
+
+    @cached_property
+    def holidays_df(self):
+        return pd.read_csv(self.csv('holidays_events.csv'), parse_dates=['date'])
+
+    @cached_property
+    def daily(self):
+        return rollups.load_daily_series(self.data_path, self.cache_dir)
+
+    @cached_property
+    def bottom(self):
+        """(values, keys, dates) of every store x family series"""
+        return load_bottom_series(data_path=self.data_path, cache_dir=self.cache_dir)
+
+
+# Ingest
+
+@benchmark('ingest.read_csv')
+def read_csv(ctx):
+    return lambda: pd.read_csv(ctx.csv('train.csv'), dtype=ingest.TRAIN_DTYPES, parse_dates=['date'])
+
+
+@benchmark('ingest.build_cache', repeat=1)
+def build_cache(ctx):
+    return lambda: ingest.build_cache(ctx.data_path, ctx.cache_dir, force=True)
+
+
+@benchmark('ingest.load_train')
+def load_train(ctx):
+    ingest.ensure_cache(ctx.data_path, ctx.cache_dir)
+    return lambda: ingest.load_train(data_path=ctx.data_path, cache_dir=ctx.cache_dir)
+
+
+# Aggregation
+
+@benchmark('aggregate.merge_groupby')
+def merge_groupby(ctx):
+    """The original dashboard load_data(): merge stores and holidays into rows, then group"""
+    train_df, stores_df, holidays_df = ctx.train_df, ctx.stores_df, ctx.holidays_df
+
+    def run():
+        rows = train_df.merge(stores_df, on='store_nbr', how='left')
+        flags = holidays_df[['date']].drop_duplicates().assign(is_holiday=True)
+        rows = rows.merge(flags, on='date', how='left')
+        rows['is_holiday'] = rows['is_holiday'].fillna(False)
+        return rows.groupby('date').agg({'sales': 'sum', 'onpromotion': 'sum', 'is_holiday': 'max'})
+    return run
+
+
+@benchmark('holiday_calendar.flag_rows')
+def holiday_flag_rows(ctx):
+    """Locale-aware holiday flags of every train row by day offset, no merge"""
+    train_df, stores_df = ctx.train_df, ctx.stores_df
+
+    def run():
+        calendar = holiday_calendar.EventCalendar(holiday_calendar.clean_events(ctx.holidays_df))
+        regional, local = calendar.store_columns(stores_df)
+        positions = pd.Index(stores_df['store_nbr']).get_indexer(train_df['store_nbr'])
+        return holiday_calendar.flag_columns(
+            calendar.store_flags(train_df['date'], regional[positions], local[positions]))
+    return run
+
+
+@benchmark('aggregate.rollup_cubes')
+def rollup_cubes(ctx):
+    train_df = ctx.train_df
+    calendar = holiday_calendar.EventCalendar(holiday_calendar.clean_events(ctx.holidays_df))
+    return lambda: rollups.aggregate(train_df, calendar)
+
+
+@benchmark('aggregate.build_rollups', repeat=1)
+def build_rollups(ctx):
+    ingest.ensure_cache(ctx.data_path, ctx.cache_dir)
+    return lambda: rollups.build_rollups(ctx.data_path, ctx.cache_dir, force=True)
+
+
+@benchmark('aggregate.load_daily_series')
+def load_daily(ctx):
+    rollups.build_rollups(ctx.data_path, ctx.cache_dir)
+    return lambda: rollups.load_daily_series(ctx.data_path, ctx.cache_dir)
+
+
+# Analysis and features
+
+@benchmark('seasonal_stats.compute')
+def seasonal_stats(ctx):
+    daily = ctx.daily
+    return lambda: compute_seasonal_stats(daily['date'], daily['sales'], daily['onpromotion'])
+
+
+@benchmark('features.daily')
+def features_daily(ctx):
+    y, dates = ctx.daily['sales'].to_numpy(), ctx.daily['date']
+    return lambda: features.build_features(y, dates)
+
+
+@benchmark('features.store_family')
+def features_store_family(ctx):
+    values, _, dates = ctx.bottom
+    return lambda: features.build_features(values, dates)
+
+
+@benchmark('features.recursive_forecast')
+def features_recursive(ctx):
+    values, _, dates = ctx.bottom
+    n_features = len(features.feature_names())
+    weights = np.full(n_features, 1.0 / n_features, dtype=np.float32)
+    return lambda: features.recursive_forecast(
+        lambda X: np.nan_to_num(X) @ weights, values, dates[-1], FORECAST_DAYS
+    )
+
+
+@benchmark('decomposition.store_family')
+def decomposition_store_family(ctx):
+    values, keys, dates = ctx.bottom
+    return lambda: decomposition.decompose(values, dates, keys=keys)
+
+
+@benchmark('decomposition.update_14_days')
+def decomposition_update(ctx):
+    values, keys, dates = ctx.bottom
+    previous = decomposition.decompose(values[:, :-14], dates[:-14], keys=keys)
+    return lambda: decomposition.update(previous, values, dates, keys)
+
+
+@benchmark('drilldown.build_index')
+def drilldown_build(ctx):
+    return lambda: drilldown.build_index(ctx.data_path, ctx.cache_dir)
+
+
+@benchmark('drilldown.select')
+def drilldown_select(ctx):
+    index = drilldown.build_index(ctx.data_path, ctx.cache_dir)
+    store, family = index.options('store_nbr')[0], index.options('family')[0]
+    state = index.options('state')[0]
+
+    def run():
+        index.series({'store_nbr': [store]})
+        index.series({'state': [state], 'family': [family]})
+    return run
+
+
+@benchmark('snapshot.build', repeat=1)
+def snapshot_build(ctx):
+    return lambda: snapshot.build_snapshot(ctx.data_path, ctx.cache_dir, force=True)
+
+
+@benchmark('snapshot.open')
+def snapshot_open(ctx):
+    """What a new dashboard process does before its first page: map the arrays, index the series"""
+    path = snapshot.build_snapshot(ctx.data_path, ctx.cache_dir)
+    return lambda: snapshot.Snapshot(path)
+
+
+# Models
+
+def _register_model(name):
+    @benchmark(f'models.{name}.fit', repeat=1 if name in SLOW_FITS else None)
+    def fit(ctx):
+        y, dates = ctx.daily['sales'].to_numpy(), ctx.daily['date']
+        return lambda: make_model(name).fit(y, dates)
+
+    @benchmark(f'models.{name}.predict')
+    def predict(ctx):
+        model = make_model(name).fit(ctx.daily['sales'].to_numpy(), ctx.daily['date'])
+        return lambda: model.predict(FORECAST_DAYS)
+
+
+for _name in available_models():
+    _register_model(_name)
+
+
+@benchmark('models.profile_store_family')
+def profile_store_family(ctx):
+    values, _, dates = ctx.bottom
+    return lambda: fit_profile(values, dates, FORECAST_DAYS)
+
+
+@benchmark('models.global_gbm.fit', repeat=1)
+def global_gbm_fit(ctx):
+    values, keys, dates = ctx.bottom
+    stores_df = ctx.stores_df
+    return lambda: global_model.GlobalModel().fit(values, keys, dates, stores_df)
+
+
+@benchmark('models.global_gbm.predict')
+def global_gbm_predict(ctx):
+    values, keys, dates = ctx.bottom
+    model = global_model.GlobalModel().fit(values, keys, dates, ctx.stores_df)
+    return lambda: model.predict(FORECAST_DAYS)
+
+
+@benchmark('baselines.store_family_folds')
+def baselines_store_family(ctx):
+    values, _, dates = ctx.bottom
+    return lambda: baselines.evaluate(values, 28, 26, 7, dates=dates)
+
+
+# Rendering
+
+def _render(draw):
+    import matplotlib.pyplot as plt
+
+    fig = draw()
+    try:
+        return figure_to_png(fig)
+    finally:
+        plt.close(fig)
+
+
+@benchmark('render.daily_trend')
+def render_daily_trend(ctx):
+    daily = ctx.daily
+    return lambda: _render(lambda: overview.daily_trend(daily))
+
+
+@benchmark('render.overview')
+def render_overview(ctx):
+    daily = ctx.daily
+
+    def run():
+        return [_render(lambda: draw(daily)) for draw in overview.CHARTS.values()]
+    return run
+
+
+@benchmark('render.cache_hit')
+def render_cache_hit(ctx):
+    daily = ctx.daily
+    charts = RenderCache()
+    key = ('daily_trend', 'benchmark')
+    charts.render(key, lambda: overview.daily_trend(daily))
+    return lambda: charts.render(key, lambda: overview.daily_trend(daily))
@@ -1,14 +1,21 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib
-matplotlib.use('Agg')  # Use non-interactive backend
-import matplotlib.pyplot as plt
-import seaborn as sns
 from datetime import datetime, timedelta
+import json
 import warnings
 warnings.filterwarnings('ignore')
 
+# matplotlib (see pyplot) and the modules of a single page (backtest,
+# baselines, intervals) are imported where they are used, so a new process
+# serves its first page without loading them
+from retail_forecast import decomposition, drilldown, ingest, overview, perf, rollups, snapshot
+from retail_forecast.config import PERF_PAGE, RENDER_CACHE_MB, SNAPSHOT_PATH
+from retail_forecast.profile_forecast import SeasonalProfileForecaster
+from retail_forecast.registry import ModelRegistry
+from retail_forecast.seasonal_stats import MONTH_NAMES, compute_seasonal_stats
+from retail_forecast.render_cache import RenderCache, pyplot
+
 # Page config
 st.set_page_config(
     page_title="Retail Sales Forecasting Dashboard",
@@ -66,57 +73,237 @@ st.markdown('<h1 class="main-header">📊 Retail Sales Time Series Forecasting D
 
 # Sidebar
 st.sidebar.title("Navigation")
-page = st.sidebar.selectbox(
-    "Choose a page",
-    ["📈 Overview", "📅 Seasonal Analysis", "🤖 Model Performance", "🔮 Forecasts", "💡 Business Insights"]
-)
+pages = ["📈 Overview", "📅 Seasonal Analysis", "🤖 Model Performance", "🔮 Forecasts", "💡 Business Insights"]
+# Hidden unless RETAIL_PERF_PAGE=1 or the URL has ?perf=1
+if PERF_PAGE or st.query_params.get("perf") == "1":
+    pages.append("⏱ Performance")
+page = st.sidebar.selectbox("Choose a page", pages)
+
+# Timing of this rerun for the Performance page (and the optional exports)
+perf.start_rerun(page)
+perf.serve_metrics()
+
+@st.cache_resource
+def render_cache():
+    """Rendered chart PNGs shared by every session, keyed by chart and data version"""
+    return RenderCache(max_bytes=RENDER_CACHE_MB * 1024 * 1024)
 
-# Data loading function
+charts = render_cache()
+
+# Data loading functions
+@perf.timed(cached=True)
 @st.cache_data
-def load_data():
-    """Load and preprocess the sales data"""
-    DATA_PATH = '/Users/mbgirish/Downloads/store-sales-time-series-forecasting'
-    
+def load_daily_year(fingerprint, year, version):
+    """Load one year of the daily rollup; re-read only when that year changes"""
+    perf.miss()
+    return rollups.load_rollup('daily', start=f'{year}-01-01', end=f'{year}-12-31')
+
+@perf.timed(cached=True)
+@st.cache_data
+def load_data(fingerprint, partitions):
+    """Load the daily sales rollup and store metadata"""
+    perf.miss()
     try:
-        # Load data
-        train_df = pd.read_csv(f'{DATA_PATH}/train.csv')
-        stores_df = pd.read_csv(f'{DATA_PATH}/stores.csv')
-        holidays_df = pd.read_csv(f'{DATA_PATH}/holidays_events.csv')
-        
-        # Convert dates
-        train_df['date'] = pd.to_datetime(train_df['date'])
-        holidays_df['date'] = pd.to_datetime(holidays_df['date'])
-        
-        # Merge with store information
-        train_df = train_df.merge(stores_df, on='store_nbr', how='left')
-        
-        # Create holiday flag
-        holidays_df['is_holiday'] = True
-        holidays_df = holidays_df[['date', 'is_holiday']].drop_duplicates()
-        train_df = train_df.merge(holidays_df, on='date', how='left')
-        train_df['is_holiday'] = train_df['is_holiday'].fillna(False)
-        
-        # Aggregate to daily level
-        daily_sales = train_df.groupby('date').agg({
-            'sales': 'sum',
-            'onpromotion': 'sum',
-            'is_holiday': 'max'
-        }).reset_index()
-        
-        daily_sales = daily_sales.sort_values('date').reset_index(drop=True)
-        
-        return daily_sales, train_df, stores_df
+        # Pages only need daily totals, so read the pre-aggregated cube
+        # instead of holding the row-level frame in every session
+        daily_sales = pd.concat(
+            [load_daily_year(fingerprint, year, version) for year, version in partitions],
+            ignore_index=True
+        )
+        daily_sales['sales'] = daily_sales['sales'].astype('float64')
+        stores_df = ingest.load_stores()
+        
+        return daily_sales, stores_df
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return None, None, None
+        return None, None
 
-# Load data
-daily_sales, train_df, stores_df = load_data()
+@perf.timed(cached=True)
+@st.cache_resource
+def open_snapshot(path):
+    """Memory-mapped snapshot, opened once per process; its Overview charts seed the render cache"""
+    perf.miss()
+    opened = snapshot.Snapshot(path)
+    for name, png in opened.charts().items():
+        charts.put((name, (opened.version, ())), png)
+    return opened
+
+# Load data. With RETAIL_SNAPSHOT set, the newest snapshot there is served
+# as is (no CSV or cache access); otherwise the snapshot of the current data
+# version if one was built, else the rollups (cached per source CSV version
+# and per year partition, so appending new days only invalidates the years
+# that changed)
+data_snapshot = None
+try:
+    with perf.span('data_version'):
+        if SNAPSHOT_PATH:
+            snapshot_path = snapshot.find_snapshot(SNAPSHOT_PATH)
+            if snapshot_path is None:
+                raise FileNotFoundError(f"no snapshot in {SNAPSHOT_PATH}")
+        else:
+            data_fingerprint = ingest.source_fingerprint()
+            data_partitions = tuple(sorted(rollups.partition_versions().items()))
+            data_version = rollups.data_version()
+            snapshot_path = snapshot.find_snapshot(snapshot.snapshot_root(), data_version)
+    if snapshot_path is not None:
+        data_snapshot = open_snapshot(snapshot_path)
+        data_fingerprint, data_partitions = data_snapshot.fingerprint, data_snapshot.partitions
+        data_version = data_snapshot.version
+        daily_sales, stores_df = data_snapshot.daily, data_snapshot.stores
+    else:
+        daily_sales, stores_df = load_data(data_fingerprint, data_partitions)
+except Exception as e:
+    st.error(f"Error loading data: {e}")
+    daily_sales, stores_df = None, None
 
 if daily_sales is None:
     st.error("Could not load data. Please check the data path.")
     st.stop()
 
+@perf.timed(cached=True)
+@st.cache_resource
+def load_drilldown(version):
+    """Store/family/region index of the store_family cube, built once per data version"""
+    perf.miss()
+    return drilldown.build_index()
+
+@perf.timed(cached=True)
+@st.cache_data
+def selection_sales(version, selection):
+    """Daily series of the stores and families picked in the sidebar"""
+    perf.miss()
+    return drilldown_index(version).series(dict(selection))
+
+def snapshot_of(version):
+    """The snapshot being served when it holds this data version, else None"""
+    if data_snapshot is not None and data_snapshot.version == version:
+        return data_snapshot
+    return None
+
+def drilldown_index(version):
+    """The snapshot's index when it holds this version, else the one built from the cubes"""
+    held = snapshot_of(version)
+    return held.drilldown if held is not None else load_drilldown(version)
+
+def full_daily(fingerprint, partitions, version):
+    """Daily totals of all series from the snapshot when it holds this version, else the rollup"""
+    held = snapshot_of(version)
+    return held.daily if held is not None else load_data(fingerprint, partitions)[0]
+
+# Sidebar filters; every page shows the daily totals of the selected series
+st.sidebar.markdown("---")
+st.sidebar.subheader("Filters")
+drill = drilldown_index(data_version)
+selection = drilldown.normalize({
+    'store_nbr': st.sidebar.multiselect("Store", drill.options('store_nbr')),
+    'family': st.sidebar.multiselect("Product family", drill.options('family')),
+    'state': st.sidebar.multiselect("State", drill.options('state')),
+    'city': st.sidebar.multiselect("City", drill.options('city')),
+    'cluster': st.sidebar.multiselect("Cluster", drill.options('cluster')),
+})
+if selection:
+    selected_rows = drill.rows(selection)
+    if len(selected_rows) == 0:
+        st.warning("No store and product family matches these filters.")
+        st.stop()
+    st.sidebar.caption(f"{len(selected_rows):,} of {len(drill.keys):,} store × family series")
+    daily_sales = selection_sales(data_version, selection)
+# Cache key of everything drawn from daily_sales
+view_version = (data_version, selection)
+
+model_registry = ModelRegistry()
+
+@perf.timed()
+def model_metrics(version):
+    """Registry metrics for this data version, else the newest available"""
+    results_df = model_registry.metrics_table(version)
+    if results_df.empty:
+        results_df = model_registry.metrics_table()
+    return results_df
+
+@perf.timed(cached=True)
+@st.cache_data
+def load_backtest(version):
+    """Rolling-origin backtest for this data version, else the newest run"""
+    perf.miss()
+    from retail_forecast import backtest
+    return backtest.load_backtest(version) or backtest.load_backtest()
+
+@perf.timed(cached=True)
+@st.cache_data
+def interval_table(version, model_name, selection=()):
+    """Conformal interval table from the model's backtest errors (None without any)
+
+    A selection is scored on its own daily total, refitting the profile at
+    two years of weekly cutoffs, since errors of the national total would
+    understate its spread. Other models have no errors on a selection (None).
+    """
+    perf.miss()
+    if selection:
+        if model_name != 'Seasonal Profile':
+            return None
+        from retail_forecast import intervals
+        daily = selection_sales(version, selection)
+        return intervals.profile_table(daily['sales'].to_numpy(), daily['date'], folds=104)
+    held = snapshot_of(version)
+    table = held.interval_table(model_name) if held is not None else None
+    if table is None:
+        from retail_forecast import intervals
+        table = intervals.daily_table(model_name, version=version)
+    return table
+
+@perf.timed(cached=True)
+@st.cache_resource
+def load_registered_model(path):
+    """Unpickle a fitted model from the registry (no refitting)"""
+    perf.miss()
+    return model_registry.load(path)
+
+@perf.timed(cached=True)
+@st.cache_resource
+def seasonal_stats(fingerprint, partitions, version, selection=()):
+    """Weekday/month/promotion profiles, computed once per data version and selection (immutable, shared)"""
+    perf.miss()
+    held = snapshot_of(version)
+    if held is not None and not selection:
+        return held.seasonal
+    daily = selection_sales(version, selection) if selection else full_daily(fingerprint, partitions, version)
+    return compute_seasonal_stats(daily['date'], daily['sales'], daily['onpromotion'])
+
+@perf.timed(cached=True)
+@st.cache_resource
+def load_decomposition(level, version):
+    """Trend/weekly/yearly decomposition of a level (kept on disk per data version, updated on appends)"""
+    perf.miss()
+    held = snapshot_of(version)
+    if held is not None:
+        return held.decomposition(level)
+    return decomposition.load_decomposition(level, version=version)
+
+def show_chart(key, draw):
+    """Serve a chart from the render cache, drawing it only when its key is new"""
+    def draw_on_miss():
+        perf.miss()
+        return draw()
+    
+    with perf.span(f'chart.{key[0]}', cached=True):
+        png = charts.render(key, draw_on_miss)
+    with perf.span('st.image'):
+        st.image(png, use_container_width=True)
+
+@perf.timed(cached=True)
+@st.cache_resource
+def fit_forecast_model(fingerprint, partitions, version, selection=()):
+    """Fit the seasonal-profile forecaster and slice the last year of history"""
+    perf.miss()
+    daily = selection_sales(version, selection) if selection else full_daily(fingerprint, partitions, version)
+    model = SeasonalProfileForecaster().fit(daily['sales'].to_numpy(), daily['date'])
+    historical = daily[daily['date'] >= daily['date'].max() - timedelta(days=365)]
+    return model, historical
+
+# Page body (everything below up to the footer)
+page_span = perf.begin(f'page.{page}')
+
 # Overview Page
 if page == "📈 Overview":
     st.header("📊 Sales Overview")
@@ -165,16 +352,8 @@ if page == "📈 Overview":
     st.subheader("📈 Sales Trend Over Time")
     
     try:
-        fig, ax = plt.subplots(figsize=(14, 6))
-        ax.plot(daily_sales['date'], daily_sales['sales'], linewidth=1, alpha=0.7, color='steelblue')
-        ax.set_title('Daily Sales Over Time', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Date', fontsize=12)
-        ax.set_ylabel('Total Sales ($)', fontsize=12)
-        ax.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
+        # Shared with the snapshot build, which prerenders it for the unfiltered data
+        show_chart(('daily_trend', view_version), lambda: overview.daily_trend(daily_sales))
     except Exception as e:
         st.error(f"Error creating chart: {e}")
         st.write("Data preview:")
@@ -183,18 +362,7 @@ if page == "📈 Overview":
     # Monthly Aggregation
     st.subheader("📅 Monthly Sales Trend")
     try:
-        monthly_sales = daily_sales.set_index('date').resample('M')['sales'].sum().reset_index()
-        
-        fig, ax = plt.subplots(figsize=(14, 6))
-        ax.plot(monthly_sales['date'], monthly_sales['sales'], marker='o', linewidth=2, markersize=6, color='coral')
-        ax.set_title('Monthly Sales Trend', fontsize=16, fontweight='bold')
-        ax.set_xlabel('Date', fontsize=12)
-        ax.set_ylabel('Monthly Sales ($)', fontsize=12)
-        ax.grid(True, alpha=0.3)
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
+        show_chart(('monthly_trend', view_version), lambda: overview.monthly_trend(daily_sales))
     except Exception as e:
         st.error(f"Error creating monthly chart: {e}")
     
@@ -219,235 +387,323 @@ if page == "📈 Overview":
 elif page == "📅 Seasonal Analysis":
     st.header("Seasonal Patterns Analysis")
     
-    # Add time features
-    daily_sales['day_of_week'] = daily_sales['date'].dt.day_name()
-    daily_sales['month'] = daily_sales['date'].dt.month
-    daily_sales['day_of_month'] = daily_sales['date'].dt.day
+    # Profiles shared with the Business Insights page
+    stats = seasonal_stats(data_fingerprint, data_partitions, data_version, selection)
     
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("Weekly Pattern")
-        weekly_avg = daily_sales.groupby('day_of_week')['sales'].mean()
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        weekly_avg = weekly_avg.reindex(day_order)
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.bar(range(len(weekly_avg)), weekly_avg.values, color='steelblue', alpha=0.7)
-        ax.set_xticks(range(len(weekly_avg)))
-        ax.set_xticklabels(weekly_avg.index, rotation=45)
-        ax.set_title('Average Sales by Day of Week', fontsize=14, fontweight='bold')
-        ax.set_ylabel('Average Sales ($)', fontsize=12)
-        ax.grid(True, alpha=0.3, axis='y')
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
+        weekly_avg = stats.weekly
+        
+        def draw_weekly_pattern():
+            plt = pyplot()
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.bar(range(len(weekly_avg)), weekly_avg.values, color='steelblue', alpha=0.7)
+            ax.set_xticks(range(len(weekly_avg)))
+            ax.set_xticklabels(weekly_avg.index, rotation=45)
+            ax.set_title('Average Sales by Day of Week', fontsize=14, fontweight='bold')
+            ax.set_ylabel('Average Sales ($)', fontsize=12)
+            ax.grid(True, alpha=0.3, axis='y')
+            plt.tight_layout()
+            return fig
+        
+        show_chart(('weekly_pattern', view_version), draw_weekly_pattern)
         
-        st.write(f"**Best Day:** {weekly_avg.idxmax()} (${weekly_avg.max():,.0f})")
-        st.write(f"**Worst Day:** {weekly_avg.idxmin()} (${weekly_avg.min():,.0f})")
+        st.write(f"**Best Day:** {stats.best_day} (${weekly_avg.max():,.0f})")
+        st.write(f"**Worst Day:** {stats.worst_day} (${weekly_avg.min():,.0f})")
     
     with col2:
         st.subheader("Monthly Pattern")
-        monthly_avg = daily_sales.groupby('month')['sales'].mean()
-        month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-        
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.bar(range(len(monthly_avg)), monthly_avg.values, color='coral', alpha=0.7)
-        ax.set_xticks(range(len(monthly_avg)))
-        ax.set_xticklabels(month_names, rotation=45)
-        ax.set_title('Average Sales by Month', fontsize=14, fontweight='bold')
-        ax.set_ylabel('Average Sales ($)', fontsize=12)
-        ax.grid(True, alpha=0.3, axis='y')
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
+        monthly_avg = stats.monthly
+        month_names = MONTH_NAMES
+        
+        def draw_monthly_pattern():
+            plt = pyplot()
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.bar(range(len(monthly_avg)), monthly_avg.values, color='coral', alpha=0.7)
+            ax.set_xticks(range(len(monthly_avg)))
+            ax.set_xticklabels(month_names, rotation=45)
+            ax.set_title('Average Sales by Month', fontsize=14, fontweight='bold')
+            ax.set_ylabel('Average Sales ($)', fontsize=12)
+            ax.grid(True, alpha=0.3, axis='y')
+            plt.tight_layout()
+            return fig
         
-        st.write(f"**Best Month:** {month_names[monthly_avg.idxmax()-1]} (${monthly_avg.max():,.0f})")
-        st.write(f"**Worst Month:** {month_names[monthly_avg.idxmin()-1]} (${monthly_avg.min():,.0f})")
+        show_chart(('monthly_pattern', view_version), draw_monthly_pattern)
+        
+        st.write(f"**Best Month:** {month_names[stats.best_month-1]} (${monthly_avg.max():,.0f})")
+        st.write(f"**Worst Month:** {month_names[stats.worst_month-1]} (${monthly_avg.min():,.0f})")
     
     # Promotion Impact
     st.subheader("Promotion Impact")
-    daily_sales['has_promotion'] = daily_sales['onpromotion'] > 0
-    promo_impact = daily_sales.groupby('has_promotion')['sales'].mean()
+    promo_impact = stats.promo_mean
     
     col1, col2 = st.columns(2)
     
     with col1:
-        fig, ax = plt.subplots(figsize=(8, 6))
-        ax.bar(['No Promotion', 'With Promotion'], promo_impact.values, 
-               color=['gray', 'green'], alpha=0.7)
-        ax.set_title('Sales: Promotion vs No Promotion', fontsize=14, fontweight='bold')
-        ax.set_ylabel('Average Sales ($)', fontsize=12)
-        ax.grid(True, alpha=0.3, axis='y')
+        def draw_promo_impact():
+            plt = pyplot()
+            fig, ax = plt.subplots(figsize=(8, 6))
+            ax.bar(['No Promotion', 'With Promotion'], np.nan_to_num(promo_impact), 
+                   color=['gray', 'green'], alpha=0.7)
+            ax.set_title('Sales: Promotion vs No Promotion', fontsize=14, fontweight='bold')
+            ax.set_ylabel('Average Sales ($)', fontsize=12)
+            ax.grid(True, alpha=0.3, axis='y')
+            
+            if stats.has_promo_split:
+                ax.text(0.5, max(promo_impact) * 0.9, f'Lift: {stats.promo_lift:.1f}%', 
+                       ha='center', fontsize=12, fontweight='bold')
+            plt.tight_layout()
+            return fig
         
-        if len(promo_impact) > 1:
-            lift = (promo_impact[True] - promo_impact[False]) / promo_impact[False] * 100
-            ax.text(0.5, max(promo_impact.values) * 0.9, f'Lift: {lift:.1f}%', 
-                   ha='center', fontsize=12, fontweight='bold')
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
+        show_chart(('promo_impact', view_version), draw_promo_impact)
     
     with col2:
-        if len(promo_impact) > 1:
-            lift = (promo_impact[True] - promo_impact[False]) / promo_impact[False] * 100
-            st.metric("Promotion Lift", f"{lift:.1f}%")
-            st.metric("Sales with Promotion", f"${promo_impact[True]:,.0f}")
-            st.metric("Sales without Promotion", f"${promo_impact[False]:,.0f}")
+        if stats.has_promo_split:
+            st.metric("Promotion Lift", f"{stats.promo_lift:.1f}%")
+            st.metric("Sales with Promotion", f"${promo_impact[1]:,.0f}")
+            st.metric("Sales without Promotion", f"${promo_impact[0]:,.0f}")
     
     # Day of Month Pattern
     st.subheader("Day of Month Pattern")
-    dom_avg = daily_sales.groupby('day_of_month')['sales'].mean()
+    dom_avg = stats.day_of_month
     
-    fig, ax = plt.subplots(figsize=(14, 6))
-    ax.plot(dom_avg.index, dom_avg.values, marker='o', linewidth=2, markersize=4, color='purple')
-    ax.set_title('Average Sales by Day of Month', fontsize=14, fontweight='bold')
-    ax.set_xlabel('Day of Month', fontsize=12)
-    ax.set_ylabel('Average Sales ($)', fontsize=12)
-    ax.grid(True, alpha=0.3)
-    plt.tight_layout()
-    st.pyplot(fig)
+    def draw_day_of_month():
+        plt = pyplot()
+        fig, ax = plt.subplots(figsize=(14, 6))
+        ax.plot(dom_avg.index, dom_avg.values, marker='o', linewidth=2, markersize=4, color='purple')
+        ax.set_title('Average Sales by Day of Month', fontsize=14, fontweight='bold')
+        ax.set_xlabel('Day of Month', fontsize=12)
+        ax.set_ylabel('Average Sales ($)', fontsize=12)
+        ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+        return fig
+    
+    show_chart(('day_of_month', view_version), draw_day_of_month)
+    
+    # Weekly + yearly decomposition; a selection is the sum of its store x family rows
+    st.subheader("Trend and Seasonal Decomposition")
+    if not selection:
+        components = load_decomposition('daily', data_version).frame()
+    else:
+        bottom = load_decomposition('store_family', data_version)
+        picked = drill.keys.iloc[selected_rows][['store_nbr', 'family']]
+        rows = pd.MultiIndex.from_frame(bottom.keys[['store_nbr', 'family']]).get_indexer(
+            pd.MultiIndex.from_frame(picked))
+        components = bottom.frame(rows[rows >= 0])
+    
+    def draw_decomposition():
+        plt = pyplot()
+        fig, axes = plt.subplots(4, 1, figsize=(16, 12))
+        axes[0].plot(components.index, components['observed'], linewidth=0.8, alpha=0.6, label='Observed')
+        axes[0].plot(components.index, components['trend'], linewidth=2, color='green', label='Trend')
+        axes[0].set_title('Observed and Trend', fontsize=14, fontweight='bold')
+        axes[0].legend()
+        axes[1].plot(components.index, components['seasonal_365.25'], linewidth=1, color='orange')
+        axes[1].set_title('Yearly Seasonal Component', fontsize=14, fontweight='bold')
+        recent = components.iloc[-91:]
+        axes[2].plot(recent.index, recent['seasonal_7'], linewidth=1.5, color='purple', marker='o', markersize=3)
+        axes[2].set_title('Weekly Seasonal Component (last 13 weeks)', fontsize=14, fontweight='bold')
+        axes[3].plot(components.index, components['resid'], linewidth=0.8, color='red', alpha=0.7)
+        axes[3].set_title('Residual', fontsize=14, fontweight='bold')
+        for ax in axes:
+            ax.set_ylabel('Sales ($)')
+            ax.grid(True, alpha=0.3)
+        plt.tight_layout()
+        return fig
+    
+    show_chart(('decomposition', view_version), draw_decomposition)
+    
+    strength = decomposition.frame_strength(components)
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Trend Strength", f"{strength['trend']:.2f}")
+    col2.metric("Weekly Seasonality Strength", f"{strength['seasonal_7']:.2f}")
+    col3.metric("Yearly Seasonality Strength", f"{strength['seasonal_365.25']:.2f}")
+    st.caption("Strength is 1 - var(residual) / var(residual + component): near 1 when the component "
+               "dominates the noise, 0 when it does not stand out.")
 
 # Model Performance Page
 elif page == "🤖 Model Performance":
     st.header("Model Performance Comparison")
     
-    st.info("""
-    **Note:** This section shows model comparison metrics. In a production environment, 
-    these would be calculated from actual model training. For demonstration, we show 
-    typical performance ranges for different forecasting models.
-    """)
-    
-    # Simulated model results (in production, these would come from actual model training)
-    models = {
-        'Naive Forecast': {'MAE': 45000, 'RMSE': 55000, 'MAPE': 12.5},
-        'Moving Average': {'MAE': 38000, 'RMSE': 48000, 'MAPE': 10.2},
-        'ARIMA': {'MAE': 32000, 'RMSE': 42000, 'MAPE': 8.5},
-        'SARIMA': {'MAE': 28000, 'RMSE': 36000, 'MAPE': 7.2},
-        'Prophet': {'MAE': 25000, 'RMSE': 33000, 'MAPE': 6.8},
-        'Random Forest': {'MAE': 30000, 'RMSE': 40000, 'MAPE': 8.0}
-    }
-    
-    results_df = pd.DataFrame(models).T
-    results_df = results_df.sort_values('MAE')
-    
-    # Display metrics table
-    st.subheader("Model Metrics Comparison")
-    st.dataframe(results_df.style.highlight_min(axis=0, subset=['MAE', 'RMSE', 'MAPE']))
-    
-    # Visualizations
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.subheader("MAE Comparison")
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.barh(results_df.index, results_df['MAE'], color='steelblue', alpha=0.7)
-        ax.set_xlabel('MAE ($)', fontsize=12)
-        ax.set_title('Mean Absolute Error', fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3, axis='x')
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
-    
-    with col2:
-        st.subheader("RMSE Comparison")
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.barh(results_df.index, results_df['RMSE'], color='coral', alpha=0.7)
-        ax.set_xlabel('RMSE ($)', fontsize=12)
-        ax.set_title('Root Mean Squared Error', fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3, axis='x')
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
-    
-    with col3:
-        st.subheader("MAPE Comparison")
-        fig, ax = plt.subplots(figsize=(10, 6))
-        ax.barh(results_df.index, results_df['MAPE'], color='green', alpha=0.7)
-        ax.set_xlabel('MAPE (%)', fontsize=12)
-        ax.set_title('Mean Absolute Percentage Error', fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3, axis='x')
-        plt.tight_layout()
-        st.pyplot(fig, use_container_width=True)
-        plt.close(fig)
+    from retail_forecast import backtest, baselines
+    
+    if selection:
+        # Registered models and their backtests cover the national total only
+        st.info("The trained models below forecast the national total. The baselines are scored "
+                "on the stores and families selected in the sidebar.")
+        st.subheader("Baselines on the Selection")
+        selected_sales, _ = drill.totals(selection)
+        baseline_scores = baselines.evaluate(selected_sales, 28, 26, 7, dates=drill.dates)
+        st.dataframe(baseline_scores.groupby('method', sort=False)[['MAE', 'RMSE', 'WAPE']].mean()
+                     .style.format({'MAE': '{:,.2f}', 'RMSE': '{:,.2f}', 'WAPE': '{:.1f}%'}))
+        st.caption("Mean over 26 weekly folds of a 28-day horizon.")
+        st.markdown("---")
+    
+    # Holdout metrics recorded by `python -m retail_forecast.train`
+    results_df = model_metrics(data_version)
+    
+    if results_df.empty:
+        st.warning("""
+        **No trained models found in the model registry.** Run 
+        `python -m retail_forecast.train` to fit the models and record their holdout metrics.
+        """)
+    else:
+        trained_on = model_registry.latest(data_version)
+        if trained_on.empty:
+            st.info("Showing metrics from models trained on an earlier version of the data.")
+        
+        # Display metrics table
+        st.subheader("Model Metrics Comparison")
+        st.dataframe(results_df.style.highlight_min(axis=0, subset=['MAE', 'RMSE', 'MAPE']))
+        
+        # Visualizations
+        def draw_metric_bars(table, metric, color, xlabel, title):
+            plt = pyplot()
+            fig, ax = plt.subplots(figsize=(10, 6))
+            ax.barh(table.index, table[metric], color=color, alpha=0.7)
+            ax.set_xlabel(xlabel, fontsize=12)
+            ax.set_title(title, fontsize=14, fontweight='bold')
+            ax.grid(True, alpha=0.3, axis='x')
+            plt.tight_layout()
+            return fig
+        
+        col1, col2, col3 = st.columns(3)
+        
+        with col1:
+            st.subheader("MAE Comparison")
+            show_chart(('metric_bars', 'MAE', tuple(results_df['MAE'].items())),
+                       lambda: draw_metric_bars(results_df, 'MAE', 'steelblue', 'MAE ($)', 'Mean Absolute Error'))
+        
+        with col2:
+            st.subheader("RMSE Comparison")
+            show_chart(('metric_bars', 'RMSE', tuple(results_df['RMSE'].items())),
+                       lambda: draw_metric_bars(results_df, 'RMSE', 'coral', 'RMSE ($)', 'Root Mean Squared Error'))
+        
+        with col3:
+            st.subheader("MAPE Comparison")
+            show_chart(('metric_bars', 'MAPE', tuple(results_df['MAPE'].items())),
+                       lambda: draw_metric_bars(results_df, 'MAPE', 'green', 'MAPE (%)', 'Mean Absolute Percentage Error'))
+        
+        # Best Model
+        st.success(f"🏆 **Best Model:** {results_df.index[0]} with MAPE of {results_df.iloc[0]['MAPE']:.2f}%")
     
-    # Best Model
-    st.success(f"🏆 **Best Model:** {results_df.index[0]} with MAPE of {results_df.iloc[0]['MAPE']:.2f}%")
+    # Rolling-origin backtest written by `python -m retail_forecast.backtest`
+    st.markdown("---")
+    st.subheader("Rolling-Origin Backtest")
+    backtest_run = load_backtest(data_version)
+    
+    if backtest_run is None:
+        st.info("No backtest found. Run `python -m retail_forecast.backtest` to score every model over several cutoffs.")
+    else:
+        fold_metrics, _, backtest_meta = backtest_run
+        if backtest_meta['fingerprint'] != data_version:
+            st.info("Showing a backtest run on an earlier version of the data.")
+        st.caption(f"{len(backtest_meta['cutoffs'])} {backtest_meta['window']} folds, "
+                   f"{backtest_meta['horizon']}-day horizon, cutoffs "
+                   f"{backtest_meta['cutoffs'][0]} to {backtest_meta['cutoffs'][-1]}")
+        summary_df = backtest.summarize(fold_metrics)
+        st.dataframe(summary_df.style.highlight_min(axis=0, subset=['MAE', 'RMSE', 'MAPE']))
+        
+        def draw_backtest_mape():
+            plt = pyplot()
+            fig, ax = plt.subplots(figsize=(14, 5))
+            for model_name, model_folds in fold_metrics.groupby('model'):
+                ax.plot(model_folds['cutoff'], model_folds['MAPE'], marker='o', label=model_name)
+            ax.set_xlabel('Cutoff', fontsize=12)
+            ax.set_ylabel('MAPE (%)', fontsize=12)
+            ax.set_title('MAPE by Cutoff', fontsize=14, fontweight='bold')
+            ax.legend()
+            ax.grid(True, alpha=0.3)
+            plt.tight_layout()
+            return fig
+        
+        show_chart(('backtest_mape', backtest_meta['fingerprint'], backtest_meta['saved_at']), draw_backtest_mape)
 
 # Forecasts Page
 elif page == "🔮 Forecasts":
     st.header("Sales Forecasts")
+    from retail_forecast import intervals
     
     # Forecast horizon selector
     forecast_days = st.slider("Forecast Horizon (days)", 30, 90, 30)
     
-    st.info(f"Generating {forecast_days}-day forecast using historical patterns...")
-    
-    # Simple forecast based on recent trends and seasonality
-    last_date = daily_sales['date'].max()
-    future_dates = pd.date_range(start=last_date + timedelta(days=1), periods=forecast_days, freq='D')
-    
-    # Calculate trend
-    recent_avg = daily_sales['sales'].iloc[-30:].mean()
-    earlier_avg = daily_sales['sales'].iloc[:30].mean()
-    trend_factor = (recent_avg - earlier_avg) / earlier_avg if earlier_avg > 0 else 0
-    
-    # Simple forecast with seasonality
-    forecasts = []
-    for date in future_dates:
-        # Base forecast
-        base = recent_avg * (1 + trend_factor * (len(forecasts) / forecast_days))
-        
-        # Weekly seasonality
-        day_of_week = date.dayofweek
-        weekly_factor = 1.0
-        if day_of_week >= 5:  # Weekend
-            weekly_factor = 1.3
-        else:
-            weekly_factor = 0.9
-        
-        # Monthly seasonality (simplified)
-        month = date.month
-        if month in [11, 12]:  # Nov, Dec
-            monthly_factor = 1.4
-        elif month == 1:  # Jan
-            monthly_factor = 0.8
-        else:
-            monthly_factor = 1.0
-        
-        forecast = base * weekly_factor * monthly_factor
-        forecasts.append(forecast)
+    # Models trained on the current data are loaded from the registry; the
+    # seasonal profile is fitted once per data version. Neither refits on a
+    # slider move.
+    # Registered models forecast the national total; a selection uses the profile fitted on it
+    registered = model_registry.latest(data_version)
+    model_names = ["Seasonal Profile"]
+    if not selection:
+        model_names += [name for name in registered.index if name != 'Seasonal Profile']
+    model_choice = st.selectbox("Forecast Model", model_names)
+    
+    st.info(f"Generating {forecast_days}-day forecast using {model_choice}...")
+    
+    profile_model, historical = fit_forecast_model(data_fingerprint, data_partitions, data_version, selection)
+    last_date = profile_model.last_date
+    if model_choice == "Seasonal Profile":
+        future_dates, forecast_matrix = profile_model.predict(forecast_days)
+        forecasts = forecast_matrix[0]
+    else:
+        stored_model = load_registered_model(registered.loc[model_choice, 'path'])
+        future_dates = stored_model.future_dates(forecast_days)
+        forecasts = np.maximum(np.asarray(stored_model.predict(forecast_days), dtype=float), 0)
+    
+    # Prediction intervals from the model's backtest errors at each horizon step
+    coverage = st.radio("Prediction Interval", intervals.COVERAGES, index=len(intervals.COVERAGES) - 1,
+                        format_func=lambda c: f"{c:.0%}", horizontal=True)
+    table = interval_table(data_version, model_choice, selection)
+    if table is not None:
+        lower, upper = intervals.intervals(forecasts, historical['sales'].to_numpy(), table, coverage)
+        lower, upper = lower[0], upper[0]
+        st.caption(f"Split-conformal interval from {int(table['samples'].min())} backtest windows "
+                   "per horizon step.")
+    elif selection:
+        st.warning(f"{model_choice} has no backtest errors on the selected series, so no prediction "
+                   "interval is shown. Only the Seasonal Profile is scored on a filtered selection.")
+    else:
+        st.warning(f"No backtest errors for {model_choice} yet, so no prediction interval is shown. "
+                   "Run `python -m retail_forecast.backtest` to add one.")
+        lower = upper = np.full(len(forecasts), np.nan)
     
     forecast_df = pd.DataFrame({
         'date': future_dates,
         'forecast': forecasts,
-        'lower_bound': np.array(forecasts) * 0.85,  # 15% lower
-        'upper_bound': np.array(forecasts) * 1.15   # 15% higher
+        'lower_bound': lower,
+        'upper_bound': upper
     })
     
     # Plot forecast
-    fig, ax = plt.subplots(figsize=(16, 8))
-    
-    # Historical data (last 365 days)
-    historical = daily_sales[daily_sales['date'] >= daily_sales['date'].max() - timedelta(days=365)]
-    ax.plot(historical['date'], historical['sales'], label='Historical Sales', 
-            linewidth=1.5, color='steelblue', alpha=0.8)
-    
-    # Forecast
-    ax.plot(forecast_df['date'], forecast_df['forecast'], label='Forecast', 
-           linewidth=2, color='red', linestyle='--')
-    ax.fill_between(forecast_df['date'], forecast_df['lower_bound'], forecast_df['upper_bound'], 
-                    alpha=0.3, color='red', label='95% Confidence Interval')
-    ax.axvline(x=last_date, color='black', linestyle=':', linewidth=2, label='Forecast Start')
-    
-    ax.set_title(f'Sales Forecast ({forecast_days} days)', fontsize=16, fontweight='bold')
-    ax.set_xlabel('Date', fontsize=12)
-    ax.set_ylabel('Sales ($)', fontsize=12)
-    ax.legend(loc='best', fontsize=11)
-    ax.grid(True, alpha=0.3)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    st.pyplot(fig)
+    def draw_forecast():
+        plt = pyplot()
+        fig, ax = plt.subplots(figsize=(16, 8))
+        
+        # Historical data (last 365 days)
+        ax.plot(historical['date'], historical['sales'], label='Historical Sales', 
+                linewidth=1.5, color='steelblue', alpha=0.8)
+        
+        # Forecast
+        ax.plot(forecast_df['date'], forecast_df['forecast'], label='Forecast', 
+               linewidth=2, color='red', linestyle='--')
+        if table is not None:
+            ax.fill_between(forecast_df['date'], forecast_df['lower_bound'], forecast_df['upper_bound'], 
+                            alpha=0.3, color='red', label=f'{coverage:.0%} Prediction Interval')
+        ax.axvline(x=last_date, color='black', linestyle=':', linewidth=2, label='Forecast Start')
+        
+        ax.set_title(f'Sales Forecast ({forecast_days} days)', fontsize=16, fontweight='bold')
+        ax.set_xlabel('Date', fontsize=12)
+        ax.set_ylabel('Sales ($)', fontsize=12)
+        ax.legend(loc='best', fontsize=11)
+        ax.grid(True, alpha=0.3)
+        plt.xticks(rotation=45)
+        plt.tight_layout()
+        return fig
+    
+    model_stamp = None if model_choice == "Seasonal Profile" else registered.loc[model_choice, 'saved_at']
+    show_chart(('forecast', view_version, model_choice, model_stamp, forecast_days, coverage,
+                table is not None), draw_forecast)
     
     # Forecast summary
     col1, col2, col3, col4 = st.columns(4)
@@ -475,25 +731,20 @@ elif page == "🔮 Forecasts":
 elif page == "💡 Business Insights":
     st.header("Business Insights & Recommendations")
     
-    # Calculate insights
-    daily_sales['day_of_week'] = daily_sales['date'].dt.day_name()
-    daily_sales['month'] = daily_sales['date'].dt.month
-    daily_sales['has_promotion'] = daily_sales['onpromotion'] > 0
-    
-    # Seasonal patterns
-    monthly_avg = daily_sales.groupby('month')['sales'].mean()
-    weekly_avg = daily_sales.groupby('day_of_week')['sales'].mean()
-    promo_impact = daily_sales.groupby('has_promotion')['sales'].mean()
+    # Seasonal patterns (shared with the Seasonal Analysis page)
+    stats = seasonal_stats(data_fingerprint, data_partitions, data_version, selection)
+    monthly_avg = stats.monthly
+    weekly_avg = stats.weekly
+    promo_impact = stats.promo_mean
     
-    month_names = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
-    best_month = monthly_avg.idxmax()
-    worst_month = monthly_avg.idxmin()
+    month_names = MONTH_NAMES
+    best_month = stats.best_month
+    worst_month = stats.worst_month
     
     # Trend analysis
-    recent_avg = daily_sales['sales'].iloc[-365:].mean()
-    earlier_avg = daily_sales['sales'].iloc[:365].mean()
-    trend_direction = "increasing" if recent_avg > earlier_avg else "decreasing"
-    trend_pct = abs((recent_avg - earlier_avg) / earlier_avg * 100) if earlier_avg > 0 else 0
+    recent_avg = stats.recent_avg
+    trend_direction = "increasing" if recent_avg > stats.earlier_avg else "decreasing"
+    trend_pct = abs(stats.trend_pct)
     
     st.subheader("📊 Key Findings")
     
@@ -512,14 +763,13 @@ elif page == "💡 Business Insights":
         """.format(
             month_names[best_month-1], monthly_avg[best_month],
             month_names[worst_month-1], monthly_avg[worst_month],
-            (monthly_avg.max() - monthly_avg.min()) / monthly_avg.mean() * 100,
-            weekly_avg.idxmax(), weekly_avg.max(),
-            weekly_avg.idxmin(), weekly_avg.min()
+            stats.seasonal_variation,
+            stats.best_day, weekly_avg.max(),
+            stats.worst_day, weekly_avg.min()
         ))
     
     with col2:
-        if len(promo_impact) > 1:
-            lift = (promo_impact[True] - promo_impact[False]) / promo_impact[False] * 100
+        if stats.has_promo_split:
             st.markdown("""
             **Promotion Impact:**
             - Sales lift during promotions: **{:.1f}%**
@@ -531,7 +781,7 @@ elif page == "💡 Business Insights":
             - Year-over-year change: **{:.1f}%**
             - Recent average: **${:,.0f}**
             """.format(
-                lift, promo_impact[True], promo_impact[False],
+                stats.promo_lift, promo_impact[1], promo_impact[0],
                 trend_direction, trend_pct, recent_avg
             ))
     
@@ -571,7 +821,7 @@ elif page == "💡 Business Insights":
            - Plan inventory buildup 1-2 weeks before promotions
            - Coordinate with suppliers for increased demand
            - Expected impact: **15-25% improvement in promotion ROI**
-        """.format(month_names[worst_month-1], lift if len(promo_impact) > 1 else 0))
+        """.format(month_names[worst_month-1], stats.promo_lift))
     
     with tab3:
         st.markdown("""
@@ -585,7 +835,7 @@ elif page == "💡 Business Insights":
         2. **Weekly Patterns**
            - Schedule more staff on weekends (higher sales)
            - Expected impact: **10-15% reduction in labor costs**
-        """.format(weekly_avg.idxmax(), weekly_avg.idxmin()))
+        """.format(stats.best_day, stats.worst_day))
     
     with tab4:
         st.markdown("""
@@ -614,6 +864,79 @@ elif page == "💡 Business Insights":
     with impact_col3:
         st.metric("Labor Cost Reduction", "10-15%", "Optimized staffing")
 
+# Performance Page (hidden, see the sidebar setup)
+elif page == "⏱ Performance":
+    st.header("⏱ Performance")
+    st.markdown("Timings of data loading, page computation and chart rendering recorded by "
+                "`retail_forecast.perf` in this dashboard process.")
+    
+    reruns = [rerun for rerun in perf.RECORDER.recent_reruns() if rerun['page'] != page]
+    if not reruns:
+        st.info("No reruns recorded yet. Open another page, then come back here.")
+    else:
+        last = reruns[-1]
+        spans_df = pd.DataFrame(last['spans'])
+        spans_df['ms'] = spans_df['seconds'] * 1000
+        
+        st.subheader("Last Rerun")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Page", last['page'])
+        with col2:
+            st.metric("Total Time", f"{last['seconds'] * 1000:,.0f} ms")
+        with col3:
+            cached = spans_df['cache'].notna()
+            st.metric("Cache Hits", f"{(spans_df['cache'] == 'hit').sum()}/{cached.sum()}")
+        with col4:
+            st.metric("Peak RSS Growth", f"{spans_df['peak_rss_delta_mb'].max():,.1f} MB")
+        
+        st.bar_chart(spans_df.groupby('name', sort=False)['ms'].sum(), horizontal=True)
+        st.dataframe(spans_df[['name', 'ms', 'rss_delta_mb', 'peak_rss_delta_mb', 'cache']]
+                     .style.format({'ms': '{:,.1f}', 'rss_delta_mb': '{:,.2f}', 'peak_rss_delta_mb': '{:,.2f}'}))
+        
+        st.subheader("Recent Reruns")
+        st.dataframe(pd.DataFrame([{
+            'rerun': rerun['id'],
+            'page': rerun['page'],
+            'started': datetime.fromtimestamp(rerun['started']).strftime('%H:%M:%S'),
+            'total_ms': rerun['seconds'] * 1000,
+            'spans': len(rerun['spans']),
+            'cache_misses': sum(span['cache'] == 'miss' for span in rerun['spans']),
+        } for rerun in reversed(reruns)]).style.format({'total_ms': '{:,.1f}'}))
+    
+    st.subheader("Rolling Percentiles")
+    summary_df = pd.DataFrame(perf.RECORDER.summary())
+    if not summary_df.empty:
+        st.dataframe(summary_df.style.format({
+            'mean_ms': '{:,.1f}', 'p50_ms': '{:,.1f}', 'p90_ms': '{:,.1f}', 'p99_ms': '{:,.1f}',
+            'max_ms': '{:,.1f}', 'mean_rss_delta_mb': '{:,.2f}', 'hit_rate': '{:.0%}'
+        }, na_rep='-'))
+    
+    st.subheader("Startup")
+    if data_snapshot is not None:
+        st.markdown(f"Serving the snapshot `{data_snapshot.path}` built {data_snapshot.meta['built_at']}.")
+    else:
+        st.markdown("No snapshot of this data version, so data is read from the rollups. Run "
+                    "`python -m retail_forecast.snapshot` to prebuild one for faster startup.")
+
+    st.subheader("Export")
+    st.markdown("Set `RETAIL_PERF_PORT` to serve these numbers as Prometheus text on "
+                "`http://127.0.0.1:<port>/metrics`, or `RETAIL_PERF_JSONL` to append every span to a file.")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.download_button("Prometheus metrics", perf.RECORDER.to_prometheus(),
+                           file_name="retail_metrics.prom", mime="text/plain")
+    with col2:
+        spans_jsonl = "".join(json.dumps(span) + "\n" for rerun in reruns for span in rerun['spans'])
+        st.download_button("Recent spans (JSONL)", spans_jsonl, file_name="retail_spans.jsonl",
+                           mime="application/x-ndjson")
+    with col3:
+        if st.button("Clear Measurements"):
+            perf.RECORDER.clear()
+            st.rerun()
+
+perf.end(page_span)
+
 # Footer
 st.markdown("---")
 st.markdown("""
@@ -623,3 +946,4 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+perf.finish_rerun()
@@ -0,0 +1 @@
+"""Data and forecasting utilities shared by the dashboard and the notebook."""
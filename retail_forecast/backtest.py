@@ -0,0 +1,215 @@
+"""Rolling-origin backtests of the model zoo, run in parallel across cores.
+
+Instead of one 90-day holdout, every candidate is refitted at N cutoffs
+(expanding or sliding training window) and scored on the ``horizon`` days
+after each cutoff. (model, cutoff) fits are spread over a
+``ProcessPoolExecutor``; the series is sent to each worker once. The feature
+matrix (``features.build_features``) is built once per data version, saved
+as ``.npy`` and memory-mapped by the workers, so each fold only takes a
+slice.
+
+Results are written next to the model registry as tidy tables:
+
+- ``metrics.parquet``: model, cutoff, MAE, RMSE, MAPE, fit_seconds
+- ``errors.parquet``: model, cutoff, step, actual, forecast
+
+Usage::
+
+    python -m retail_forecast.backtest --folds 8 --horizon 30 --workers 8
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import features, rollups
+from retail_forecast.config import DATA_PATH, cache_dir_for
+from retail_forecast.metrics import calculate_metrics
+from retail_forecast.models import available_models, make_model
+from retail_forecast.registry import fingerprint_id
+from retail_forecast.train import model_params
+
+WINDOWS = ('expanding', 'sliding')
+
+# Set in each worker by _init_worker
+_WORKER = {}
+
+
+def make_cutoffs(n_days, horizon, folds, step=None, window='expanding', train_days=None):
+    """(train_start, cutoff) index pairs, newest fold last
+
+    The model is trained on [train_start, cutoff) and scored on
+    [cutoff, cutoff + horizon). Folds are ``step`` days apart (default:
+    ``horizon``). Sliding windows keep ``train_days`` of history.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown window '{window}', expected one of {WINDOWS}")
+    step = step or horizon
+    last_cutoff = n_days - horizon
+    cutoffs = [last_cutoff - i * step for i in range(folds)][::-1]
+    if window == 'sliding':
+        train_days = train_days or 2 * 365
+        pairs = [(max(cutoff - train_days, 0), cutoff) for cutoff in cutoffs]
+    else:
+        pairs = [(0, cutoff) for cutoff in cutoffs]
+    if pairs[0][1] - pairs[0][0] < 2 * horizon:
+        raise ValueError("Not enough history for the requested folds")
+    return pairs
+
+
+def backtest_path(fingerprint, data_path=DATA_PATH, cache_dir=None):
+    return os.path.join(cache_dir or cache_dir_for(data_path), 'backtests', fingerprint_id(fingerprint))
+
+
+def feature_matrix(y, dates, path):
+    """Lag/rolling/calendar features for every history date, cached as a .npy file
+
+    Features at day t only use sales before t, so any fold can train on a
+    slice of this one matrix.
+    """
+    layout = '_'.join(map(str, features.LAGS)) + '-' + '_'.join(map(str, features.WINDOWS))
+    features_file = os.path.join(path, f'features-{layout}.npy')
+    if not os.path.exists(features_file):
+        os.makedirs(path, exist_ok=True)
+        tmp = f'{features_file}.{os.getpid()}.tmp.npy'
+        np.save(tmp, features.build_features(y, dates)[0])
+        os.replace(tmp, features_file)
+    return features_file
+
+
+def _init_worker(y, dates, features_file):
+    _WORKER['y'] = y
+    _WORKER['dates'] = dates
+    _WORKER['X'] = np.load(features_file, mmap_mode='r') if features_file else None
+
+
+def _run_fold(name, params, start, cutoff, horizon):
+    """Worker entry point: fit on [start, cutoff), forecast horizon days"""
+    y, dates, X = _WORKER['y'], _WORKER['dates'], _WORKER['X']
+    started = time.perf_counter()
+    model = make_model(name, **params)
+    if name == 'Random Forest' and X is not None:
+        # Training rows come from the cached matrix; the forecast stays
+        # recursive so it never sees lags from after the cutoff
+        model.fit(y[start:cutoff], dates[start:cutoff], X=np.asarray(X[start:cutoff]))
+    else:
+        model.fit(y[start:cutoff], dates[start:cutoff])
+    forecast = model.predict(horizon)
+    return name, cutoff, np.asarray(forecast, dtype=np.float64), time.perf_counter() - started
+
+
+def run_backtest(names=None, folds=5, horizon=90, step=None, window='expanding', train_days=None,
+                 workers=None, data_path=DATA_PATH, cache_dir=None, save=True):
+    """Backtest every model over every cutoff; returns (metrics, errors) frames"""
+    names = names or available_models()
+    daily_df = rollups.load_daily_series(data_path, cache_dir)
+    fingerprint = rollups.data_version(data_path=data_path, cache_dir=cache_dir)
+    y = daily_df['sales'].to_numpy()
+    dates = pd.DatetimeIndex(daily_df['date'])
+    pairs = make_cutoffs(len(y), horizon, folds, step, window, train_days)
+
+    path = backtest_path(fingerprint, data_path, cache_dir)
+    features_file = feature_matrix(y, dates, path)
+    params = {name: model_params(name, data_path, cache_dir) for name in names}
+    if 'Random Forest' in params:
+        # One core per fit; the pool already spreads folds over the cores
+        params['Random Forest']['n_jobs'] = 1
+
+    metric_rows, error_frames, failed = [], [], []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(y, dates, features_file)) as pool:
+        futures = {
+            pool.submit(_run_fold, name, params[name], start, cutoff, horizon): (name, cutoff)
+            for name in names for start, cutoff in pairs
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            name, cutoff = futures[future]
+            try:
+                name, cutoff, forecast, seconds = future.result()
+            except Exception as e:
+                print(f"   {name} fold failed: {e}")
+                failed.append(f"{name} @ {dates[cutoff]:%Y-%m-%d} ({e})")
+                continue
+            actual = y[cutoff:cutoff + horizon]
+            metric_rows.append({
+                'model': name, 'cutoff': dates[cutoff], **calculate_metrics(actual, forecast),
+                'fit_seconds': seconds,
+            })
+            error_frames.append(pd.DataFrame({
+                'model': name, 'cutoff': dates[cutoff], 'step': np.arange(1, horizon + 1),
+                'actual': actual, 'forecast': forecast,
+            }))
+            print(f"   [{done}/{len(futures)}] {name} @ {dates[cutoff]:%Y-%m-%d}: "
+                  f"MAPE {metric_rows[-1]['MAPE']:.2f}% ({seconds:.1f}s)", flush=True)
+
+    if not metric_rows:
+        raise ValueError(f"Every backtest fold failed: {'; '.join(sorted(failed))}")
+    metrics = pd.DataFrame(metric_rows).sort_values(['model', 'cutoff']).reset_index(drop=True)
+    errors = pd.concat(error_frames, ignore_index=True) if error_frames else pd.DataFrame()
+    if save:
+        metrics.to_parquet(os.path.join(path, 'metrics.parquet'), index=False)
+        errors.to_parquet(os.path.join(path, 'errors.parquet'), index=False)
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({
+                'fingerprint': fingerprint, 'folds': folds, 'horizon': horizon, 'step': step or horizon,
+                'window': window, 'train_days': train_days, 'models': names,
+                'cutoffs': [dates[cutoff].strftime('%Y-%m-%d') for _, cutoff in pairs],
+                'wall_seconds': round(time.perf_counter() - started, 2),
+                'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }, f, indent=2)
+    return metrics, errors
+
+
+def summarize(metrics):
+    """Mean (and MAPE spread) of each model's metrics across folds, best first"""
+    summary = metrics.groupby('model').agg(
+        MAE=('MAE', 'mean'), RMSE=('RMSE', 'mean'), MAPE=('MAPE', 'mean'),
+        MAPE_std=('MAPE', 'std'), folds=('cutoff', 'count')
+    )
+    return summary.sort_values('MAE')
+
+
+def load_backtest(fingerprint=None, data_path=DATA_PATH, cache_dir=None):
+    """Saved (metrics, errors, meta) for a data version, else the newest run; None if absent"""
+    root = os.path.join(cache_dir or cache_dir_for(data_path), 'backtests')
+    if fingerprint is not None:
+        path = backtest_path(fingerprint, data_path, cache_dir)
+    else:
+        runs = [os.path.join(root, name) for name in os.listdir(root)] if os.path.isdir(root) else []
+        runs = [run for run in runs if os.path.exists(os.path.join(run, 'meta.json'))]
+        path = max(runs, key=lambda run: os.path.getmtime(os.path.join(run, 'meta.json')), default=None)
+    if path is None or not os.path.exists(os.path.join(path, 'meta.json')):
+        return None
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    return (pd.read_parquet(os.path.join(path, 'metrics.parquet')),
+            pd.read_parquet(os.path.join(path, 'errors.parquet')),
+            meta)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of the model zoo')
+    parser.add_argument('--models', nargs='+', default=None, help=f'default: {available_models()}')
+    parser.add_argument('--folds', type=int, default=5)
+    parser.add_argument('--horizon', type=int, default=90)
+    parser.add_argument('--step', type=int, default=None, help='days between cutoffs (default: horizon)')
+    parser.add_argument('--window', choices=WINDOWS, default='expanding')
+    parser.add_argument('--train-days', type=int, default=None, help='history kept by sliding windows')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    started = time.time()
+    metrics, _ = run_backtest(
+        args.models, args.folds, args.horizon, args.step, args.window, args.train_days,
+        args.workers, args.data_path, args.cache_dir
+    )
+    print(f"\n✅ Backtest finished in {time.time() - started:.1f}s")
+    print(summarize(metrics).to_string())
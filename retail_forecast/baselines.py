@@ -0,0 +1,223 @@
+"""Vectorized baseline forecasts over many series at many origins.
+
+Naive, seasonal-naive (any season length), moving-average and EWMA
+forecasts for a (series x day) matrix, computed for every forecast origin
+at once instead of one series and one day at a time:
+
+- moving averages come from one padded cumulative sum: the mean of
+  ``values[:, t - window:t]`` is ``(csum[:, t] - csum[:, t - window]) / window``
+- EWMA levels of every day come from one ``scipy.signal.lfilter`` pass
+- seasonal-naive and the actuals of each backtest window are gathered from
+  ``sliding_window_view`` views, without copying the history
+
+``forecast`` makes multi-step forecasts at the end of the history or at a
+list of cutoffs; ``walk_forward`` makes one-step-ahead predictions of every
+day from the days before it. ``evaluate`` scores every baseline on every
+series over the backtest folds of ``backtest.make_cutoffs``; these scores
+are the bar the other models have to beat.
+
+Usage::
+
+    python -m retail_forecast.baselines --horizon 28 --folds 26 --step 7
+"""
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Method -> default parameters
+METHODS = {
+    'naive': {},
+    'seasonal_naive': {'season': 7},
+    'moving_average': {'window': 30},
+    'ewma': {'span': 30},
+}
+
+
+def _as_2d(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[None, :] if values.ndim == 1 else values
+
+
+def _check(method, params):
+    if method not in METHODS:
+        raise ValueError(f"Unknown baseline '{method}', expected one of {list(METHODS)}")
+    unknown = set(params) - set(METHODS[method])
+    if unknown:
+        raise ValueError(f"Unknown parameters {sorted(unknown)} for baseline '{method}'")
+    return {**METHODS[method], **params}
+
+
+def padded_cumsum(values):
+    """(series, days + 1) cumulative sums with a leading zero column"""
+    values = _as_2d(values)
+    csum = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=csum[:, 1:])
+    return csum
+
+
+def window_means(values, ends, window, csum=None):
+    """Mean of values[:, end - window:end] for each end; (series, len(ends))
+
+    Ends closer than `window` to the start average the days available.
+    """
+    csum = padded_cumsum(values) if csum is None else csum
+    ends = np.asarray(ends)
+    starts = np.maximum(ends - window, 0)
+    return (csum[:, ends] - csum[:, starts]) / np.maximum(ends - starts, 1)
+
+
+def ewma_levels(values, span=None, alpha=None):
+    """EWMA level after each day, (series, days); starts at the first value
+
+    level[t] = alpha * values[t] + (1 - alpha) * level[t - 1], with
+    alpha = 2 / (span + 1) unless given.
+    """
+    # Imported here: scipy.signal takes over a second to import and most
+    # importers of the model zoo never compute an EWMA
+    from scipy.signal import lfilter
+
+    values = _as_2d(values)
+    alpha = alpha if alpha is not None else 2 / (span + 1)
+    if values.shape[1] == 0:
+        return values.copy()
+    decay = 1 - alpha
+    levels, _ = lfilter([alpha], [1, -decay], values, axis=1, zi=decay * values[:, :1])
+    return levels
+
+
+def forecast(values, method, horizon, cutoffs=None, **params):
+    """Baseline forecasts of the `horizon` days after each cutoff
+
+    values is one series or a (series x day) matrix; each cutoff is the
+    index of the first forecast day, so only values[:, :cutoff] is used.
+    Returns (series, horizon) forecasts from the end of the history, or
+    (series, len(cutoffs), horizon) when cutoffs are given. A 1-D series
+    gives arrays without the series axis.
+    """
+    params = _check(method, params)
+    single = np.ndim(values) == 1
+    values = _as_2d(values)
+    ends = np.atleast_1d(values.shape[1] if cutoffs is None else np.asarray(cutoffs))
+    if ends.min() < 1 or ends.max() > values.shape[1]:
+        raise ValueError(f"Cutoffs must be within 1..{values.shape[1]}")
+
+    if method == 'seasonal_naive':
+        season = params['season']
+        if ends.min() < season:
+            raise ValueError(f"Seasonal naive needs {season} days of history before each cutoff")
+        # Last season before each cutoff, repeated over the horizon
+        last_season = sliding_window_view(values, season, axis=1)[:, ends - season]
+        result = last_season[:, :, np.arange(horizon) % season]
+    else:
+        if method == 'naive':
+            level = values[:, ends - 1]
+        elif method == 'moving_average':
+            level = window_means(values, ends, params['window'])
+        else:
+            level = ewma_levels(values, params['span'])[:, ends - 1]
+        result = np.repeat(level[:, :, None], horizon, axis=2)
+
+    if cutoffs is None:
+        result = result[:, 0]
+    return result[0] if single else result
+
+
+def walk_forward(values, method, start=None, **params):
+    """One-step-ahead predictions of days start..end, each from the days before it
+
+    Returns (series, days - start) predictions (1-D for one series). start
+    defaults to the first day every method can predict.
+    """
+    params = _check(method, params)
+    single = np.ndim(values) == 1
+    values = _as_2d(values)
+    start = params.get('season', 1) if start is None else start
+    if method == 'naive':
+        result = values[:, start - 1:-1]
+    elif method == 'seasonal_naive':
+        result = values[:, start - params['season']:values.shape[1] - params['season']]
+    elif method == 'moving_average':
+        result = window_means(values, np.arange(start, values.shape[1]), params['window'])
+    else:
+        result = ewma_levels(values[:, :-1], params['span'])[:, start - 1:]
+    return result[0] if single else result
+
+
+def fold_actuals(values, cutoffs, horizon):
+    """Actual values of each backtest window, (series, len(cutoffs), horizon)"""
+    return sliding_window_view(_as_2d(values), horizon, axis=1)[:, np.asarray(cutoffs)]
+
+
+def fold_scores(actual, forecasts):
+    """MAE, RMSE and WAPE of each fold, pooled over series and steps
+
+    WAPE (sum of absolute errors over sum of actuals) replaces MAPE, which
+    is undefined for the many store x family days with zero sales.
+    """
+    errors = actual - forecasts
+    absolute = np.abs(errors).sum(axis=(0, 2))
+    count = errors.shape[0] * errors.shape[2]
+    total = np.abs(actual).sum(axis=(0, 2))
+    return {
+        'MAE': absolute / count,
+        'RMSE': np.sqrt((errors ** 2).sum(axis=(0, 2)) / count),
+        'WAPE': np.divide(absolute, total, out=np.full_like(absolute, np.nan), where=total > 0) * 100,
+    }
+
+
+def evaluate(values, horizon, folds, step=None, methods=None, dates=None):
+    """Per-fold scores of every baseline over the rows of values
+
+    Returns a frame of method, cutoff, MAE, RMSE, WAPE; cutoff is a date
+    when dates are given, otherwise the day index.
+    """
+    # Imported here: backtest imports the model zoo, which builds on this module
+    from retail_forecast import backtest
+
+    values = _as_2d(values)
+    methods = methods or METHODS
+    if not isinstance(methods, dict):
+        methods = {method: {} for method in methods}
+    pairs = backtest.make_cutoffs(values.shape[1], horizon, folds, step)
+    cutoffs = np.array([cutoff for _, cutoff in pairs])
+    actual = fold_actuals(values, cutoffs, horizon)
+    labels = pd.DatetimeIndex(dates)[cutoffs] if dates is not None else cutoffs
+    frames = []
+    for method, params in methods.items():
+        scores = fold_scores(actual, forecast(values, method, horizon, cutoffs, **params))
+        frames.append(pd.DataFrame({'method': method, 'cutoff': labels, **scores}))
+    return pd.concat(frames, ignore_index=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from retail_forecast.config import DATA_PATH
+    from retail_forecast.hierarchy import load_bottom_series
+
+    parser = argparse.ArgumentParser(description='Score the baselines on every store x family series')
+    parser.add_argument('--horizon', type=int, default=28)
+    parser.add_argument('--folds', type=int, default=26)
+    parser.add_argument('--step', type=int, default=7)
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    values, keys, dates = load_bottom_series(data_path=args.data_path, cache_dir=args.cache_dir)
+    started = time.perf_counter()
+    scores = evaluate(values, args.horizon, args.folds, args.step, dates=dates)
+    seconds = time.perf_counter() - started
+    print(f"✅ {len(METHODS)} baselines x {len(values):,} series x {args.folds} folds "
+          f"({args.horizon}-day horizon) in {seconds:.2f}s")
+    summary = scores.groupby('method', sort=False)[['MAE', 'RMSE', 'WAPE']].mean()
+    print(summary.to_string(formatters={'MAE': '{:,.2f}'.format, 'RMSE': '{:,.2f}'.format,
+                                        'WAPE': '{:.1f}%'.format}))
+
+    started = time.perf_counter()
+    print("\nOne-step walk-forward over the last year:")
+    for method in METHODS:
+        predictions = walk_forward(values, method, start=values.shape[1] - 365)
+        errors = values[:, -365:] - predictions
+        print(f"   {method:<15} MAE {np.abs(errors).mean():,.2f}")
+    print(f"   ({(time.perf_counter() - started) * 1000:.0f} ms for all methods)")
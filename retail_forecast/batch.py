@@ -0,0 +1,224 @@
+"""Headless batch forecast of every store x family series to Parquet.
+
+For the nightly replenishment run: loads the ``store_family`` cube, fits
+the chosen model per series on a process pool (the ``profile`` model is
+vectorized and runs in-process) and writes point forecasts with prediction
+intervals to a Parquet dataset::
+
+    <output>/model=<model>/origin=<first forecast day>/chunk-00000.parquet
+
+Each chunk of series is written atomically as soon as it is fitted, which
+doubles as a checkpoint: re-running the same job (same data version, model,
+horizon and chunking) skips the chunks already on disk.
+
+Intervals of the ``profile`` model are split-conformal quantiles from a
+vectorized backtest of every series (``intervals.profile_table``). The
+per-series models assume normal errors whose spread grows with the square
+root of the horizon step, scaled from each series' in-sample residuals.
+
+Usage::
+
+    python -m retail_forecast.batch --output forecasts/ --horizon 28 --workers 8
+"""
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from retail_forecast import intervals, rollups
+from retail_forecast.config import DATA_PATH
+from retail_forecast.hierarchy import MODELS, POOL_MODELS, fit_chunk, fit_profile, load_bottom_series
+
+JOB_MANIFEST = '_job.json'
+
+
+def select_series(values, keys, stores=None, families=None):
+    """Rows of (values, keys) restricted to the given stores/families"""
+    mask = np.ones(len(keys), dtype=bool)
+    if stores:
+        mask &= keys['store_nbr'].isin([int(store) for store in stores]).to_numpy()
+    if families:
+        mask &= keys['family'].isin(families).to_numpy()
+    return values[mask], keys[mask].reset_index(drop=True)
+
+
+def residual_scale(residuals):
+    """Std of each row's residuals over its active span (after leading zeros)"""
+    scale = np.zeros(len(residuals))
+    for i, row in enumerate(residuals):
+        active = np.flatnonzero(row)
+        if len(active) > 1:
+            scale[i] = row[active[0]:].std(ddof=1)
+    return scale
+
+
+def normal_bounds(forecasts, residuals, interval):
+    """(lower, upper) from normal errors with in-sample spread growing as sqrt(step)"""
+    z = NormalDist().inv_cdf(0.5 + interval / 2)
+    steps = np.arange(1, forecasts.shape[1] + 1)
+    width = z * residual_scale(residuals)[:, None] * np.sqrt(steps)[None, :]
+    return np.maximum(forecasts - width, 0), forecasts + width
+
+
+def chunk_frame(keys, forecasts, lower, upper, future_dates, errors):
+    """Long frame (store_nbr, family, date, step, forecast, lower, upper) for one chunk"""
+    n, horizon = forecasts.shape
+    return pd.DataFrame({
+        'store_nbr': np.repeat(keys['store_nbr'].to_numpy(), horizon),
+        'family': np.repeat(keys['family'].to_numpy(), horizon),
+        'date': np.tile(future_dates.values, n),
+        'step': np.tile(np.arange(1, horizon + 1, dtype=np.int16), n),
+        'forecast': forecasts.ravel().astype(np.float32),
+        'lower': lower.ravel().astype(np.float32),
+        'upper': upper.ravel().astype(np.float32),
+        'error': np.repeat(np.array(errors, dtype=object), horizon),
+    })
+
+
+def _write_chunk(frame, path):
+    # Dot-files are ignored by Parquet dataset readers until renamed
+    tmp = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    # A clean chunk's all-null error column would otherwise be typed null,
+    # which clashes with the string type of chunks that had failures
+    column = table.schema.get_field_index('error')
+    table = table.set_column(column, 'error', table['error'].cast(pa.string()))
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+
+
+def _job_config(model, horizon, interval, chunk_size, version, keys):
+    return {
+        'model': model,
+        'horizon': horizon,
+        'interval': interval,
+        'chunk_size': chunk_size,
+        'data_version': version,
+        'series': len(keys),
+        'series_hash': str(pd.util.hash_pandas_object(keys, index=False).sum()),
+    }
+
+
+def run_batch(output, model='ets', horizon=28, interval=0.95, workers=None, chunk_size=64,
+              stores=None, families=None, start=None, force=False, progress=None,
+              data_path=DATA_PATH, cache_dir=None):
+    """Forecast every selected series and write the chunks; returns a summary dict"""
+    if model not in MODELS:
+        raise ValueError(f"Unknown model '{model}', expected one of {MODELS}")
+    started = time.perf_counter()
+    values, keys, dates = load_bottom_series(start=start, data_path=data_path, cache_dir=cache_dir)
+    values, keys = select_series(values, keys, stores, families)
+    future_dates = pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    version = rollups.data_version(data_path=data_path, cache_dir=cache_dir)
+
+    target = os.path.join(output, f'model={model}', f'origin={future_dates[0]:%Y-%m-%d}')
+    config = _job_config(model, horizon, interval, chunk_size, version, keys)
+    manifest_file = os.path.join(target, JOB_MANIFEST)
+    if os.path.exists(manifest_file):
+        with open(manifest_file) as f:
+            previous = json.load(f)
+        if force or previous.get('config') != config:
+            # A different job (or --force): its chunks can't be reused
+            shutil.rmtree(target)
+    os.makedirs(target, exist_ok=True)
+    with open(manifest_file, 'w') as f:
+        json.dump({'config': config, 'started_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, indent=2)
+
+    chunks = [(lo, min(lo + chunk_size, len(keys))) for lo in range(0, len(keys), chunk_size)]
+
+    def chunk_path(chunk_id):
+        return os.path.join(target, f'chunk-{chunk_id:05d}.parquet')
+
+    todo = [i for i in range(len(chunks)) if not os.path.exists(chunk_path(i))]
+    skipped_series = len(keys) - sum(chunks[i][1] - chunks[i][0] for i in todo)
+
+    done_series, failed = 0, 0
+    total = sum(chunks[i][1] - chunks[i][0] for i in todo)
+    fit_started = time.perf_counter()
+
+    def finish(chunk_id, forecasts, lower, upper, errors):
+        nonlocal done_series, failed
+        lo, hi = chunks[chunk_id]
+        frame = chunk_frame(keys.iloc[lo:hi], forecasts, lower, upper, future_dates, errors)
+        _write_chunk(frame, chunk_path(chunk_id))
+        done_series += hi - lo
+        failed += sum(error is not None for error in errors)
+        if progress is not None:
+            progress(done_series, total, time.perf_counter() - fit_started)
+
+    if model in POOL_MODELS:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(fit_chunk, i, values[chunks[i][0]:chunks[i][1]], horizon, model)
+                for i in todo
+            ]
+            for future in as_completed(futures):
+                chunk_id, forecasts, residuals, _, errors = future.result()
+                finish(chunk_id, forecasts, *normal_bounds(forecasts, residuals, interval), errors)
+    elif todo:
+        table = intervals.profile_table(values, dates, horizon, version, level='store_family',
+                                        coverages=(interval,), data_path=data_path, cache_dir=cache_dir)
+        for i in todo:
+            lo, hi = chunks[i]
+            forecasts, _, _, errors = fit_profile(values[lo:hi], dates, horizon)
+            forecasts = np.maximum(forecasts, 0)
+            finish(i, forecasts, *intervals.intervals(forecasts, values[lo:hi], table, interval), errors)
+
+    fit_seconds = time.perf_counter() - fit_started
+    summary = {
+        'output': target,
+        'series': len(keys),
+        'fitted': done_series,
+        'resumed': skipped_series,
+        'failed': failed,
+        'chunks': len(chunks),
+        'fit_seconds': round(fit_seconds, 2),
+        'wall_seconds': round(time.perf_counter() - started, 2),
+        'series_per_second': round(done_series / fit_seconds, 2) if fit_seconds > 0 else None,
+    }
+    with open(manifest_file, 'w') as f:
+        json.dump({'config': config, 'summary': summary,
+                   'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S')}, f, indent=2)
+    return summary
+
+
+def print_progress(done, total, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"   {done:,}/{total:,} series forecast ({rate:,.1f} series/s)", flush=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Batch forecast every store x family series to Parquet')
+    parser.add_argument('--output', required=True, help='folder of the Parquet dataset')
+    parser.add_argument('--model', choices=MODELS, default='ets')
+    parser.add_argument('--horizon', type=int, default=28)
+    parser.add_argument('--interval', type=float, default=0.95, help='prediction interval coverage')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=64, help='series per chunk (and checkpoint)')
+    parser.add_argument('--stores', nargs='+', default=None)
+    parser.add_argument('--families', nargs='+', default=None)
+    parser.add_argument('--start', default=None, help='only use history from this date')
+    parser.add_argument('--force', action='store_true', help='discard checkpoints of an earlier run')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    summary = run_batch(
+        args.output, args.model, args.horizon, args.interval, args.workers, args.chunk_size,
+        args.stores, args.families, args.start, args.force, print_progress,
+        args.data_path, args.cache_dir
+    )
+    print(f"✅ Forecasts written to {summary['output']}")
+    print(f"   Series: {summary['series']:,} ({summary['fitted']:,} fitted, "
+          f"{summary['resumed']:,} resumed from checkpoints, {summary['failed']:,} failed)")
+    print(f"   Throughput: {summary['series_per_second']} series/s "
+          f"({summary['fit_seconds']}s fitting, {summary['wall_seconds']}s total)")
@@ -0,0 +1,36 @@
+"""Paths and settings shared by the dashboard, the notebook and the batch jobs."""
+import os
+
+# Folder holding the Kaggle CSVs (train.csv, stores.csv, holidays_events.csv)
+DATA_PATH = os.environ.get(
+    'RETAIL_DATA_PATH',
+    '/Users/mbgirish/Downloads/store-sales-time-series-forecasting'
+)
+
+
+def cache_dir_for(data_path=DATA_PATH):
+    """Folder for derived columnar files; RETAIL_CACHE_DIR overrides the default"""
+    return os.environ.get('RETAIL_CACHE_DIR') or os.path.join(data_path, '.retail_cache')
+
+
+CACHE_DIR = cache_dir_for(DATA_PATH)
+
+# Stream train.csv in chunks of this many rows when building the cache
+# (0/unset reads it in one go)
+INGEST_CHUNKSIZE = int(os.environ.get('RETAIL_INGEST_CHUNKSIZE') or 0) or None
+
+# Snapshot (or folder of snapshots) written by `python -m retail_forecast.snapshot`;
+# when set the dashboard serves the newest one without reading the CSVs
+SNAPSHOT_PATH = os.environ.get('RETAIL_SNAPSHOT') or None
+
+# Memory budget of the dashboard's rendered-chart cache
+RENDER_CACHE_MB = int(os.environ.get('RETAIL_RENDER_CACHE_MB') or 64)
+
+# Memory budget of the forecast service's fitted-model cache
+SERVICE_CACHE_MB = int(os.environ.get('RETAIL_SERVICE_CACHE_MB') or 256)
+
+# Performance instrumentation: show the hidden "⏱ Performance" page, serve
+# Prometheus metrics on this port, append every span to this JSONL file
+PERF_PAGE = os.environ.get('RETAIL_PERF_PAGE', '') not in ('', '0')
+PERF_PORT = int(os.environ.get('RETAIL_PERF_PORT') or 0)
+PERF_JSONL = os.environ.get('RETAIL_PERF_JSONL') or None
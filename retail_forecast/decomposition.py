@@ -0,0 +1,451 @@
+"""Batched multi-seasonal (weekly + yearly) decomposition of many series.
+
+An MSTL-style additive decomposition of a (series x day) matrix::
+
+    observed = trend + seasonal[7] + seasonal[365.25] + resid
+
+Every smoother is a cumulative-sum window mean over all rows at once, so
+decomposing every store x family series costs a few array passes instead
+of one STL fit per series. The seasonal components are estimated by
+backfitting (``ITERATIONS`` rounds), each period on the series with the
+other periods removed:
+
+- periods listed in ``SEASONAL_WINDOWS`` (weekly by default) vary slowly:
+  each phase is averaged over a centred window of that many cycles
+- other periods (yearly, 365.25 days) use a fixed phase profile averaged
+  over every day whose detrending window is complete, then smoothed over
+  ``PROFILE_SMOOTH`` neighbouring days
+
+The trend is a centred ``TREND_WINDOW``-day mean of the deseasonalised
+series. All steps are linear, so the decomposition of a sum of series is
+the sum of their decompositions.
+
+``load_decomposition`` caches results under
+``<cache>/decomposition/<level>/`` per data version. When the data version
+changes (e.g. ``retail_forecast.incremental`` appended days), the previous
+decomposition is updated instead of refitted: only the days from the first
+changed one (less the smoothers' reach) are recomputed, and the yearly
+profile's sums are corrected for the days that changed or became complete.
+
+Usage::
+
+    python -m retail_forecast.decomposition --level store_family
+"""
+import glob
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import rollups
+from retail_forecast.config import DATA_PATH, cache_dir_for
+from retail_forecast.hierarchy import load_bottom_series
+from retail_forecast.registry import fingerprint_id
+
+PERIODS = (7, 365.25)
+# Period -> centred window in cycles for slowly varying components
+SEASONAL_WINDOWS = {7: 13}
+TREND_WINDOW = 91
+PROFILE_SMOOTH = 7
+ITERATIONS = 2
+LEVELS = ('daily', 'store_family')
+
+# Decompositions kept per level (the newest is the base of the next update)
+KEEP = 2
+
+
+def centered_mean(values, window, axis=-1):
+    """Mean of the centred window (rounded up to odd) ignoring NaN; shrinks at the ends"""
+    values = np.moveaxis(np.asarray(values, dtype=np.float64), axis, -1)
+    valid = ~np.isnan(values)
+    shape = values.shape[:-1] + (values.shape[-1] + 1,)
+    csum = np.zeros(shape)
+    ccount = np.zeros(shape)
+    np.cumsum(np.where(valid, values, 0), axis=-1, out=csum[..., 1:])
+    np.cumsum(valid, axis=-1, out=ccount[..., 1:])
+    t = values.shape[-1]
+    half = window // 2
+    idx = np.arange(t)
+    lo = np.maximum(idx - half, 0)
+    hi = np.minimum(idx + half + 1, t)
+    count = ccount[..., hi] - ccount[..., lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (csum[..., hi] - csum[..., lo]) / count
+    mean[count == 0] = np.nan
+    return np.moveaxis(mean, -1, axis)
+
+
+def _span(period):
+    """Odd window length that removes one cycle of period"""
+    return 2 * (int(round(period)) // 2) + 1
+
+
+def _bins(period):
+    return int(np.ceil(period))
+
+
+def _phase(days, period):
+    """Position of each day (offset from the origin) within the cycle"""
+    return np.floor(np.mod(days, period)).astype(np.int64) % _bins(period)
+
+
+def _cycle_smooth(detrended, start, period, cycles):
+    """Slowly varying seasonal: each phase averaged over `cycles` neighbouring cycles
+
+    start is the day offset of column 0, so phases line up across calls.
+    """
+    n, t = detrended.shape
+    lead = start % period
+    total = -(-(lead + t) // period) * period
+    padded = np.full((n, total), np.nan)
+    padded[:, lead:lead + t] = detrended
+    smooth = centered_mean(padded.reshape(n, -1, period), cycles, axis=1)
+    # Each cycle of the component sums to zero
+    with np.errstate(invalid='ignore'):
+        smooth -= np.nanmean(smooth, axis=2, keepdims=True)
+    return np.nan_to_num(smooth.reshape(n, -1)[:, lead:lead + t])
+
+
+def _profile_sums(others, lo, hi, period, start=0):
+    """Per-phase sums and day counts of the detrended values of complete days in [lo, hi)
+
+    others is the series with the other seasonal periods removed, from day
+    offset `start` to the last day.
+    """
+    n, t = others.shape
+    half = _span(period) // 2
+    lo, hi = max(lo, start + half), min(hi, start + t - half)
+    bins = _bins(period)
+    if hi <= lo:
+        return np.zeros((n, bins)), np.zeros(bins)
+    window = others[:, lo - half - start:hi + half - start]
+    detrended = (window - centered_mean(window, _span(period)))[:, half:half + hi - lo]
+    phase = _phase(np.arange(lo, hi), period)
+    codes = (np.arange(n)[:, None] * bins + phase[None, :]).ravel()
+    sums = np.bincount(codes, weights=detrended.ravel(), minlength=n * bins).reshape(n, bins)
+    return sums, np.bincount(phase, minlength=bins).astype(np.float64)
+
+
+def _profile_values(sums, counts, smooth=PROFILE_SMOOTH):
+    """Zero-mean phase profile from per-phase sums, circularly smoothed"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        profile = sums / counts
+    profile[:, counts == 0] = np.nan
+    if smooth > 1:
+        half = smooth // 2
+        wrapped = np.concatenate([profile[:, -half:], profile, profile[:, :half]], axis=1)
+        profile = centered_mean(wrapped, smooth)[:, half:half + profile.shape[1]]
+    with np.errstate(invalid='ignore'):
+        profile -= np.nanmean(profile, axis=1, keepdims=True)
+    return np.nan_to_num(profile)
+
+
+def _reach(params):
+    """Days before a change whose trend or slowly varying seasonals can move"""
+    reach = params['trend_window'] // 2
+    for period, cycles in params['seasonal_windows'].items():
+        reach += _span(period) // 2 + (cycles // 2 + 1) * int(period)
+    return reach
+
+
+def _strength(resid, component):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.clip(1 - resid.var(axis=-1) / (resid + component).var(axis=-1), 0, 1)
+
+
+def frame_strength(frame):
+    """Trend and seasonal strength of a Decomposition.frame()"""
+    resid = frame['resid'].to_numpy()
+    return {column: float(_strength(resid, frame[column].to_numpy()))
+            for column in frame.columns if column == 'trend' or column.startswith('seasonal_')}
+
+
+class Decomposition:
+    """Trend, seasonal components and yearly profile state of a (series x day) matrix"""
+
+    def __init__(self, origin, observed, trend, seasonal, profiles, params, keys=None):
+        self.origin = pd.Timestamp(origin)
+        self.observed = observed
+        self.trend = trend
+        self.seasonal = seasonal
+        self.profiles = profiles
+        self.params = params
+        self.keys = keys
+        self.version = None
+
+    @property
+    def periods(self):
+        return tuple(self.seasonal)
+
+    @property
+    def n_days(self):
+        return self.observed.shape[1]
+
+    @property
+    def dates(self):
+        return pd.date_range(self.origin, periods=self.n_days, freq='D')
+
+    @property
+    def seasonal_total(self):
+        return sum(self.seasonal.values())
+
+    @property
+    def resid(self):
+        return self.observed - self.trend - self.seasonal_total
+
+    def future_seasonal(self, horizon):
+        """(series, horizon, period) seasonal components of the days after the history
+
+        Fixed profiles are read at the future phases; slowly varying
+        components repeat their last cycle.
+        """
+        future = np.arange(self.n_days, self.n_days + horizon)
+        columns = []
+        for period, component in self.seasonal.items():
+            if period in self.params['seasonal_windows']:
+                p = int(period)
+                columns.append(component[:, self.n_days - p + np.arange(horizon) % p])
+            else:
+                sums, counts = self.profiles[period]
+                columns.append(_profile_values(sums, counts, self.params['profile_smooth'])[
+                    :, _phase(future, period)])
+        return np.stack(columns, axis=2)
+
+    def strength(self):
+        """Per-series trend and seasonal strength, max(0, 1 - var(resid) / var(resid + component))"""
+        resid = self.resid
+        out = {'trend': _strength(resid, self.trend)}
+        out.update({f'seasonal_{period:g}': _strength(resid, values) for period, values in self.seasonal.items()})
+        frame = pd.DataFrame(out)
+        if self.keys is not None:
+            frame = pd.concat([self.keys.reset_index(drop=True), frame], axis=1)
+        return frame
+
+    def frame(self, rows=None):
+        """Components of one row, or the sum of several rows, as a date-indexed frame"""
+        rows = np.arange(len(self.observed)) if rows is None else np.atleast_1d(rows)
+        columns = {'observed': self.observed, 'trend': self.trend}
+        columns.update({f'seasonal_{period:g}': values for period, values in self.seasonal.items()})
+        out = pd.DataFrame({name: values[rows].sum(axis=0, dtype=np.float64)
+                            for name, values in columns.items()}, index=self.dates)
+        out['resid'] = out['observed'] - out['trend'] - out.filter(like='seasonal_').sum(axis=1)
+        return out.rename_axis('date')
+
+    def save(self, path, version=None):
+        arrays = {
+            'observed': self.observed,
+            'trend': self.trend.astype(np.float32),
+            'meta': np.array(json.dumps({
+                'origin': self.origin.strftime('%Y-%m-%d'),
+                'periods': list(self.seasonal),
+                'params': {**self.params, 'seasonal_windows': list(self.params['seasonal_windows'].items())},
+                'version': version,
+            })),
+        }
+        for i, period in enumerate(self.seasonal):
+            arrays[f'seasonal_{i}'] = self.seasonal[period].astype(np.float32)
+            if period in self.profiles:
+                arrays[f'profile_sums_{i}'], arrays[f'profile_counts_{i}'] = self.profiles[period]
+        if self.keys is not None:
+            arrays['store_nbr'] = self.keys['store_nbr'].to_numpy()
+            arrays['family'] = self.keys['family'].to_numpy(dtype=str)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            params = {**meta['params'], 'seasonal_windows': dict(
+                (float(p) if float(p) % 1 else int(p), c) for p, c in meta['params']['seasonal_windows'])}
+            seasonal, profiles = {}, {}
+            for i, period in enumerate(meta['periods']):
+                seasonal[period] = data[f'seasonal_{i}']
+                if f'profile_sums_{i}' in data:
+                    profiles[period] = (data[f'profile_sums_{i}'], data[f'profile_counts_{i}'])
+            keys = None
+            if 'store_nbr' in data:
+                keys = pd.DataFrame({'store_nbr': data['store_nbr'], 'family': data['family'].astype(str)})
+            decomposition = cls(meta['origin'], data['observed'], data['trend'], seasonal, profiles,
+                                params, keys)
+        decomposition.version = meta['version']
+        return decomposition
+
+
+def _params(periods, seasonal_windows, trend_window, profile_smooth, iterations):
+    seasonal_windows = {period: cycles for period, cycles in seasonal_windows.items() if period in periods}
+    for period in seasonal_windows:
+        if float(period) % 1:
+            raise ValueError(f"Slowly varying seasonals need a whole-day period, got {period}")
+    return {'trend_window': trend_window, 'seasonal_windows': seasonal_windows,
+            'profile_smooth': profile_smooth, 'iterations': iterations}
+
+
+def _seasonal_pass(values, start, seasonal, profiles, params, estimate_profiles):
+    """One backfitting round over the periods, in place; values start at day offset `start`"""
+    days = np.arange(start, start + values.shape[1])
+    for period in seasonal:
+        others = values - sum(component for p, component in seasonal.items() if p != period)
+        cycles = params['seasonal_windows'].get(period)
+        if cycles:
+            detrended = others - centered_mean(others, _span(period))
+            seasonal[period] = _cycle_smooth(detrended, start, int(period), cycles)
+        else:
+            if estimate_profiles:
+                profiles[period] = _profile_sums(others, 0, others.shape[1], period)
+            sums, counts = profiles[period]
+            seasonal[period] = _profile_values(sums, counts, params['profile_smooth'])[:, _phase(days, period)]
+
+
+def decompose(values, dates, periods=PERIODS, seasonal_windows=SEASONAL_WINDOWS, trend_window=TREND_WINDOW,
+              profile_smooth=PROFILE_SMOOTH, iterations=ITERATIONS, keys=None):
+    """Decompose every row of values (one series or series x day) on consecutive dates"""
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    params = _params(periods, seasonal_windows, trend_window, profile_smooth, iterations)
+    seasonal = {period: np.zeros_like(values) for period in sorted(periods)}
+    profiles = {}
+    for _ in range(iterations):
+        _seasonal_pass(values, 0, seasonal, profiles, params, estimate_profiles=True)
+    trend = centered_mean(values - sum(seasonal.values()), trend_window)
+    return Decomposition(pd.DatetimeIndex(dates)[0], values, trend, seasonal, profiles, params, keys)
+
+
+def _compatible(previous, values, dates, keys):
+    if previous.origin != pd.DatetimeIndex(dates)[0] or values.shape[0] != previous.observed.shape[0]:
+        return False
+    if values.shape[1] < previous.n_days:
+        return False
+    if (keys is None) != (previous.keys is None):
+        return False
+    return keys is None or keys.reset_index(drop=True).equals(previous.keys.reset_index(drop=True))
+
+
+def update(previous, values, dates, keys=None):
+    """Decomposition of values (the previous history, possibly revised, plus new days)
+
+    Recomputes trend and slowly varying seasonals from the first changed
+    day (less the smoothers' reach) and corrects the fixed profiles' sums
+    for the days that changed or became complete. Falls back to a full
+    decomposition when the series do not line up with previous.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    params = previous.params
+    decompose_args = dict(periods=previous.periods, seasonal_windows=params['seasonal_windows'],
+                          trend_window=params['trend_window'], profile_smooth=params['profile_smooth'],
+                          iterations=params['iterations'], keys=keys)
+    if not _compatible(previous, values, dates, keys):
+        return decompose(values, dates, **decompose_args)
+
+    old_days = previous.n_days
+    changed = ~np.isclose(values[:, :old_days], previous.observed, rtol=1e-9, atol=1e-6).all(axis=0)
+    first_changed = int(np.argmax(changed)) if changed.any() else old_days
+    if first_changed == old_days and values.shape[1] == old_days:
+        return previous
+    reach = _reach(params)
+    keep_from = first_changed - reach
+    window_start = keep_from - reach
+    if window_start <= 0:
+        return decompose(values, dates, **decompose_args)
+
+    # Fixed profiles: swap the old contributions of days that may move for the new ones
+    fixed = [period for period in previous.periods if period not in params['seasonal_windows']]
+    old_seasonal = previous.seasonal
+    window = values[:, window_start:]
+    days = np.arange(window_start, values.shape[1])
+    seasonal = {}
+    for period, component in old_seasonal.items():
+        if period in fixed:
+            sums, counts = previous.profiles[period]
+            seasonal[period] = _profile_values(sums, counts, params['profile_smooth'])[:, _phase(days, period)]
+        else:
+            seasonal[period] = np.zeros_like(window)
+            seasonal[period][:, :old_days - window_start] = component[:, window_start:]
+    profiles = dict(previous.profiles)
+    for _ in range(params['iterations']):
+        _seasonal_pass(window, window_start, seasonal, profiles, params, estimate_profiles=False)
+
+    new_seasonal = {
+        period: np.concatenate([old_seasonal[period][:, :keep_from], seasonal[period][:, keep_from - window_start:]],
+                               axis=1)
+        for period in previous.periods
+    }
+    for period in fixed:
+        first = keep_from - _span(period) // 2
+        context = max(first - _span(period) // 2, 0)
+        old_others = previous.observed[:, context:] - sum(
+            c[:, context:] for p, c in old_seasonal.items() if p != period)
+        new_others = values[:, context:] - sum(c[:, context:] for p, c in new_seasonal.items() if p != period)
+        old_sums, old_counts = _profile_sums(old_others, first, old_days, period, context)
+        new_sums, new_counts = _profile_sums(new_others, first, values.shape[1], period, context)
+        sums, counts = previous.profiles[period]
+        profiles[period] = (sums - old_sums + new_sums, counts - old_counts + new_counts)
+        days = np.arange(values.shape[1])
+        new_seasonal[period] = _profile_values(*profiles[period], params['profile_smooth'])[:, _phase(days, period)]
+
+    window_trend = centered_mean(window - sum(c[:, window_start:] for c in new_seasonal.values()),
+                                 params['trend_window'])
+    trend = np.concatenate([previous.trend[:, :keep_from], window_trend[:, keep_from - window_start:]], axis=1)
+    return Decomposition(previous.origin, values, trend, new_seasonal, profiles, params, keys)
+
+
+def load_level(level, data_path=DATA_PATH, cache_dir=None):
+    """(values, keys, dates) of the national daily series or every store x family series"""
+    if level not in LEVELS:
+        raise ValueError(f"Unknown level '{level}', expected one of {LEVELS}")
+    if level == 'daily':
+        daily_df = rollups.load_daily_series(data_path, cache_dir)
+        return daily_df['sales'].to_numpy()[None, :], None, pd.DatetimeIndex(daily_df['date'])
+    return load_bottom_series(data_path=data_path, cache_dir=cache_dir)
+
+
+def decomposition_dir(level, data_path=DATA_PATH, cache_dir=None):
+    return os.path.join(cache_dir or cache_dir_for(data_path), 'decomposition', level)
+
+
+def load_decomposition(level='daily', version=None, data_path=DATA_PATH, cache_dir=None):
+    """Cached decomposition of a level for the data version, updating the newest older one"""
+    version = version or rollups.data_version(data_path=data_path, cache_dir=cache_dir)
+    root = decomposition_dir(level, data_path, cache_dir)
+    path = os.path.join(root, fingerprint_id(version) + '.npz')
+    if os.path.exists(path):
+        return Decomposition.load(path)
+
+    values, keys, dates = load_level(level, data_path, cache_dir)
+    previous = sorted(glob.glob(os.path.join(root, '*.npz')), key=os.path.getmtime)
+    base = Decomposition.load(previous[-1]) if previous else None
+    defaults = _params(PERIODS, SEASONAL_WINDOWS, TREND_WINDOW, PROFILE_SMOOTH, ITERATIONS)
+    if base is not None and base.periods == tuple(sorted(PERIODS)) and base.params == defaults:
+        decomposition = update(base, values, dates, keys)
+    else:
+        decomposition = decompose(values, dates, keys=keys)
+    decomposition.save(path, version)
+    decomposition.version = version
+    for old in previous[:max(len(previous) + 1 - KEEP, 0)]:
+        os.remove(old)
+    return decomposition
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Decompose the daily or store x family series')
+    parser.add_argument('--level', choices=LEVELS, default='daily')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--force', action='store_true', help='refit from scratch instead of loading or updating')
+    args = parser.parse_args()
+
+    if args.force:
+        for old in glob.glob(os.path.join(decomposition_dir(args.level, args.data_path, args.cache_dir), '*.npz')):
+            os.remove(old)
+    started = time.perf_counter()
+    result = load_decomposition(args.level, data_path=args.data_path, cache_dir=args.cache_dir)
+    seconds = time.perf_counter() - started
+    print(f"✅ {len(result.observed):,} series x {result.n_days:,} days decomposed in {seconds:.2f}s")
+    strength = result.strength()
+    for column in strength.columns.drop(['store_nbr', 'family'], errors='ignore'):
+        print(f"   {column:<17} strength: median {strength[column].median():.2f}")
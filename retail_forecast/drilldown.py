@@ -0,0 +1,185 @@
+"""Indexed store/family/region drill-down over the store_family cube.
+
+The ``store_family`` cube is pivoted once into dense (series x day) sales
+and promotion matrices, one row per (store_nbr, family), with each row's
+store attributes (city, state, type, cluster). For every dimension the rows
+are grouped CSR-style: ``indices`` lists the rows sorted by group and
+``indptr[g]:indptr[g + 1]`` is the slice of group ``g``, so the rows of any
+set of groups are a few slices instead of a boolean mask over the
+row-level data. The daily totals of every group are precomputed from the
+same ordering with one ``np.add.reduceat``.
+
+A selection maps dimensions to the labels kept, e.g.
+``{'state': ['Pichincha'], 'family': ['BEVERAGES']}``. A selection on one
+dimension sums a few precomputed group rows; several dimensions intersect
+their row lists and sum those rows of the matrix. Either way a filter
+resolves to a daily series in milliseconds.
+
+Usage::
+
+    python -m retail_forecast.drilldown --state Pichincha --family BEVERAGES
+"""
+import numpy as np
+import pandas as pd
+
+from retail_forecast import ingest, rollups
+from retail_forecast.config import DATA_PATH
+
+DIMENSIONS = ('store_nbr', 'family', 'city', 'state', 'type', 'cluster')
+STORE_ATTRIBUTES = ('city', 'state', 'type', 'cluster')
+
+
+class Grouping:
+    """CSR grouping of rows by the label of one dimension"""
+
+    def __init__(self, labels):
+        codes, self.labels = pd.factorize(pd.Series(labels), sort=True)
+        self.indices = np.argsort(codes, kind='stable').astype(np.int32)
+        self.indptr = np.zeros(len(self.labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(self.labels)), out=self.indptr[1:])
+
+    def codes(self, labels):
+        """Group codes of the labels; unknown labels are dropped"""
+        codes = self.labels.get_indexer(pd.Index(list(labels)))
+        return codes[codes >= 0]
+
+    def rows(self, codes):
+        """Sorted rows of the groups"""
+        if len(codes) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.sort(np.concatenate([self.indices[self.indptr[c]:self.indptr[c + 1]] for c in codes]))
+
+    def totals(self, values):
+        """(groups, day) sums of the rows of each group"""
+        return np.add.reduceat(values[self.indices], self.indptr[:-1], axis=0)
+
+
+def normalize(selection):
+    """Hashable, order-independent form of a selection; empty dimensions are dropped"""
+    selection = dict(selection)
+    unknown = set(selection) - set(DIMENSIONS)
+    if unknown:
+        raise ValueError(f"Unknown dimensions {sorted(unknown)}, expected some of {DIMENSIONS}")
+    return tuple((dim, tuple(sorted(selection[dim]))) for dim in DIMENSIONS if selection.get(dim))
+
+
+class DrilldownIndex:
+    """Dense store x family matrices with a CSR grouping per dimension
+
+    ``totals`` is the (group_sales, group_promotions) pair of an index built
+    earlier (e.g. from a snapshot); they are computed when it is None.
+    """
+
+    def __init__(self, keys, sales, onpromotion, dates, observed, is_holiday, totals=None):
+        self.keys = keys.reset_index(drop=True)
+        self.sales = sales
+        self.onpromotion = onpromotion
+        self.dates = pd.DatetimeIndex(dates)
+        self.observed = observed
+        self.is_holiday = is_holiday
+        self.groupings = {dim: Grouping(self.keys[dim].to_numpy()) for dim in DIMENSIONS}
+        if totals is None:
+            totals = ({dim: g.totals(sales) for dim, g in self.groupings.items()},
+                      {dim: g.totals(onpromotion) for dim, g in self.groupings.items()})
+        self.group_sales, self.group_promotions = totals
+
+    def options(self, dim):
+        """Sorted labels of a dimension"""
+        return self.groupings[dim].labels.tolist()
+
+    def rows(self, selection):
+        """Sorted matrix rows of a selection (every row when it is empty)"""
+        selection = dict(normalize(selection))
+        rows = None
+        for dim, labels in selection.items():
+            grouping = self.groupings[dim]
+            dim_rows = grouping.rows(grouping.codes(labels))
+            rows = dim_rows if rows is None else np.intersect1d(rows, dim_rows, assume_unique=True)
+        return np.arange(len(self.keys)) if rows is None else rows
+
+    def totals(self, selection):
+        """Dense daily (sales, onpromotion) sums of the selected series"""
+        selection = dict(normalize(selection))
+        if not selection:
+            return self.sales.sum(axis=0), self.onpromotion.sum(axis=0)
+        if len(selection) == 1:
+            # One dimension: add up its precomputed group totals
+            (dim, labels), = selection.items()
+            codes = self.groupings[dim].codes(labels)
+            return self.group_sales[dim][codes].sum(axis=0), self.group_promotions[dim][codes].sum(axis=0)
+        rows = self.rows(selection)
+        return self.sales[rows].sum(axis=0), self.onpromotion[rows].sum(axis=0)
+
+    def series(self, selection):
+        """Daily frame (date, sales, onpromotion, is_holiday) of a selection, like the daily cube"""
+        sales, onpromotion = self.totals(selection)
+        return pd.DataFrame({
+            'date': self.dates[self.observed],
+            'sales': sales[self.observed],
+            'onpromotion': onpromotion[self.observed].astype('int32'),
+            'is_holiday': self.is_holiday[self.observed],
+        })
+
+
+def build_index(data_path=DATA_PATH, cache_dir=None):
+    """DrilldownIndex of the store_family cube with the stores' attributes"""
+    cube_df = rollups.load_rollup(
+        'store_family', columns=['date', 'store_nbr', 'family', 'sales', 'onpromotion'],
+        data_path=data_path, cache_dir=cache_dir
+    )
+    dates = pd.date_range(cube_df['date'].min(), cube_df['date'].max(), freq='D')
+    keys = (cube_df[['store_nbr', 'family']].drop_duplicates()
+            .sort_values(['store_nbr', 'family']).reset_index(drop=True))
+    keys['family'] = keys['family'].astype(str)
+    stores_df = ingest.load_stores(columns=['store_nbr'] + list(STORE_ATTRIBUTES),
+                                   data_path=data_path, cache_dir=cache_dir).set_index('store_nbr')
+    for column in STORE_ATTRIBUTES:
+        attribute = stores_df[column].reindex(keys['store_nbr'].to_numpy())
+        keys[column] = attribute.astype(str).to_numpy() if column != 'cluster' else attribute.to_numpy()
+
+    row = pd.MultiIndex.from_frame(keys[['store_nbr', 'family']]).get_indexer(
+        pd.MultiIndex.from_arrays([cube_df['store_nbr'], cube_df['family'].astype(str)])
+    )
+    col = dates.get_indexer(cube_df['date'])
+    sales = np.zeros((len(keys), len(dates)), dtype=np.float64)
+    sales[row, col] = cube_df['sales'].to_numpy(dtype=np.float64)
+    onpromotion = np.zeros((len(keys), len(dates)), dtype=np.int64)
+    onpromotion[row, col] = cube_df['onpromotion'].to_numpy()
+
+    daily_df = rollups.load_rollup('daily', columns=['date', 'is_holiday'], data_path=data_path,
+                                   cache_dir=cache_dir)
+    day = dates.get_indexer(daily_df['date'])
+    observed = np.zeros(len(dates), dtype=bool)
+    observed[day] = True
+    is_holiday = np.zeros(len(dates), dtype=bool)
+    is_holiday[day] = daily_df['is_holiday'].to_numpy(dtype=bool)
+    return DrilldownIndex(keys, sales, onpromotion, dates, observed, is_holiday)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Daily sales of a store/family/region selection')
+    parser.add_argument('--store', type=int, nargs='+', default=None)
+    parser.add_argument('--family', nargs='+', default=None)
+    parser.add_argument('--city', nargs='+', default=None)
+    parser.add_argument('--state', nargs='+', default=None)
+    parser.add_argument('--type', nargs='+', default=None)
+    parser.add_argument('--cluster', type=int, nargs='+', default=None)
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index = build_index(args.data_path, args.cache_dir)
+    print(f"✅ Indexed {len(index.keys):,} series x {len(index.dates):,} days "
+          f"in {time.perf_counter() - started:.2f}s")
+    selection = {'store_nbr': args.store, 'family': args.family, 'city': args.city,
+                 'state': args.state, 'type': args.type, 'cluster': args.cluster}
+    started = time.perf_counter()
+    daily_df = index.series(selection)
+    print(f"   {len(index.rows(selection)):,} series selected, daily series in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms")
+    print(f"   Total sales {daily_df['sales'].sum():,.0f} over {len(daily_df):,} days")
+    print(daily_df.tail(7).to_string(index=False))
@@ -0,0 +1,199 @@
+"""Calendar, lag and rolling features for many series at once.
+
+``build_features`` turns a (series x day) sales matrix into one contiguous
+float32 array of shape (series, day, feature), computed with array shifts
+and cumulative sums instead of per-column ``.shift()``/``.rolling()``. Lag
+and rolling features at day t only use sales up to t-1, so they are
+known at forecast time.
+
+Multi-step forecasts use the same features recursively: ``LagState`` holds
+the last ``max_lag`` days of every series, emits the feature rows of the
+next day and is pushed each day's forecasts, updating the rolling sums in
+O(series) per step. Training (``build_features``) and forecasting
+(``LagState``) share the column layout from ``feature_names``.
+
+``seasonal_features`` adds the weekly and yearly components of
+``decomposition.decompose``; they are known in advance for the forecast
+days and are passed to ``recursive_forecast`` as ``known`` columns.
+"""
+import numpy as np
+import pandas as pd
+
+from retail_forecast import decomposition
+
+LAGS = (1, 7, 30, 365)
+WINDOWS = (7, 30)
+
+CALENDAR_FEATURES = [
+    'year', 'month', 'day', 'day_of_week', 'day_of_year', 'week_of_year', 'quarter',
+    'day_of_week_sin', 'day_of_week_cos', 'month_sin', 'month_cos',
+]
+
+
+def calendar_features(dates):
+    """Calendar and cyclical features known in advance for any date"""
+    dates = pd.DatetimeIndex(dates)
+    dow = dates.dayofweek.to_numpy()
+    month = dates.month.to_numpy()
+    return np.column_stack([
+        dates.year, month, dates.day, dow, dates.dayofyear,
+        dates.isocalendar().week.to_numpy(dtype=np.int64), dates.quarter,
+        np.sin(2 * np.pi * dow / 7), np.cos(2 * np.pi * dow / 7),
+        np.sin(2 * np.pi * month / 12), np.cos(2 * np.pi * month / 12),
+    ]).astype(np.float32)
+
+
+def feature_names(lags=LAGS, windows=WINDOWS):
+    return (CALENDAR_FEATURES + [f'lag_{lag}' for lag in lags]
+            + [f'rolling_mean_{w}' for w in windows] + [f'rolling_std_{w}' for w in windows])
+
+
+def history_needed(lags=LAGS, windows=WINDOWS):
+    """Days of history needed to compute every lag/rolling feature"""
+    return max(max(lags, default=0), max(windows, default=0))
+
+
+def _window_stats(values, window):
+    """Mean and sample std of the `window` days before each day, from cumulative sums"""
+    n, t = values.shape
+    # Centre each series so the running sum of squares keeps its precision
+    offset = values.mean(axis=1, keepdims=True) if t else np.zeros((n, 1))
+    centred = values - offset
+    csum = np.zeros((n, t + 1))
+    csum2 = np.zeros((n, t + 1))
+    np.cumsum(centred, axis=1, out=csum[:, 1:])
+    np.cumsum(centred ** 2, axis=1, out=csum2[:, 1:])
+    end = np.arange(t)
+    start = np.maximum(end - window, 0)
+    count = (end - start).astype(np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        total = csum[:, end] - csum[:, start]
+        total2 = csum2[:, end] - csum2[:, start]
+        mean = total / count
+        var = (total2 - total * mean) / (count - 1)
+    mean[:, count == 0] = np.nan
+    var[:, count < 2] = np.nan
+    return mean + offset, np.sqrt(np.maximum(var, 0))
+
+
+def build_features(values, dates, lags=LAGS, windows=WINDOWS):
+    """(series, day, feature) float32 array; lag/rolling cells without enough history are NaN"""
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    n, t = values.shape
+    n_calendar = len(CALENDAR_FEATURES)
+    X = np.empty((n, t, len(feature_names(lags, windows))), dtype=np.float32)
+    X[:, :, :n_calendar] = calendar_features(dates)[None]
+
+    col = n_calendar
+    for lag in lags:
+        X[:, :lag, col] = np.nan
+        X[:, lag:, col] = values[:, :t - lag]
+        col += 1
+    stats = [_window_stats(values, window) for window in windows]
+    for mean, _ in stats:
+        X[:, :, col] = mean
+        col += 1
+    for _, std in stats:
+        X[:, :, col] = std
+        col += 1
+    return X
+
+
+def seasonal_feature_names(periods=decomposition.PERIODS):
+    return [f'seasonal_{period:g}' for period in sorted(periods)]
+
+
+def seasonal_features(values, dates, horizon=0, periods=decomposition.PERIODS):
+    """(series, day, period) float32 seasonal components of the history
+
+    With a horizon, returns (history, future) where future holds the
+    components of the `horizon` days after the history.
+    """
+    result = decomposition.decompose(values, dates, periods=periods)
+    history = np.stack([result.seasonal[period] for period in result.periods], axis=2).astype(np.float32)
+    if not horizon:
+        return history
+    return history, result.future_seasonal(horizon).astype(np.float32)
+
+
+def training_rows(X, y):
+    """Flatten (series, day, feature) to 2-D and drop rows with missing features"""
+    X = X.reshape(-1, X.shape[-1])
+    y = np.asarray(y, dtype=np.float64).reshape(-1)
+    keep = ~np.isnan(X).any(axis=1)
+    return X[keep], y[keep]
+
+
+class LagState:
+    """Ring buffer of recent values for recursive multi-step features"""
+
+    def __init__(self, history, last_date, lags=LAGS, windows=WINDOWS):
+        history = np.atleast_2d(np.asarray(history, dtype=np.float64))
+        self.lags, self.windows = tuple(lags), tuple(windows)
+        self.size = history_needed(lags, windows)
+        if history.shape[1] < self.size:
+            pad = np.full((history.shape[0], self.size - history.shape[1]), np.nan)
+            history = np.hstack([pad, history])
+        # Oldest value at column pos, newest at pos - 1
+        self.buffer = np.array(history[:, -self.size:], order='C')
+        self.pos = 0
+        self.date = pd.Timestamp(last_date)
+        recent = [self.buffer[:, self.size - w:] for w in self.windows]
+        self.sums = [np.nansum(r, axis=1) for r in recent]
+        self.sums2 = [np.nansum(r ** 2, axis=1) for r in recent]
+        self.counts = [np.sum(~np.isnan(r), axis=1).astype(np.float64) for r in recent]
+
+    def _ago(self, days):
+        """Values from `days` days before the next day"""
+        return self.buffer[:, (self.pos - days) % self.size]
+
+    def features(self):
+        """Feature rows (series, feature) for the day after the buffer"""
+        n = len(self.buffer)
+        next_date = self.date + pd.Timedelta(days=1)
+        X = np.empty((n, len(feature_names(self.lags, self.windows))), dtype=np.float32)
+        X[:, :len(CALENDAR_FEATURES)] = calendar_features([next_date])
+        col = len(CALENDAR_FEATURES)
+        for lag in self.lags:
+            X[:, col] = self._ago(lag)
+            col += 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for s, c in zip(self.sums, self.counts):
+                X[:, col] = s / c
+                col += 1
+            for s2, s, c in zip(self.sums2, self.sums, self.counts):
+                X[:, col] = np.sqrt(np.maximum((s2 - s * s / c) / (c - 1), 0))
+                col += 1
+        return X
+
+    def push(self, values):
+        """Append one day of values (e.g. forecasts) to every series"""
+        values = np.asarray(values, dtype=np.float64)
+        for i, w in enumerate(self.windows):
+            dropped = self._ago(w)
+            valid = ~np.isnan(dropped)
+            self.sums[i] += values - np.where(valid, dropped, 0)
+            self.sums2[i] += values ** 2 - np.where(valid, dropped ** 2, 0)
+            self.counts[i] += 1 - valid
+        self.buffer[:, self.pos] = values
+        self.pos = (self.pos + 1) % self.size
+        self.date += pd.Timedelta(days=1)
+
+
+def recursive_forecast(predict, history, last_date, horizon, lags=LAGS, windows=WINDOWS, known=None):
+    """Forecast horizon days, feeding each day's forecast back into the lags
+
+    predict maps a (series, feature) float32 array to one value per series.
+    known optionally holds (series, horizon, k) features known in advance
+    (e.g. ``seasonal_features``), appended to each day's rows. Returns
+    (series, horizon).
+    """
+    state = LagState(history, last_date, lags, windows)
+    forecasts = np.empty((len(state.buffer), horizon))
+    for step in range(horizon):
+        X = state.features()
+        if known is not None:
+            X = np.hstack([X, known[:, step]])
+        forecasts[:, step] = predict(X)
+        state.push(forecasts[:, step])
+    return forecasts
@@ -0,0 +1,233 @@
+"""One gradient-boosted model for every store x family series.
+
+Instead of one model per series, a single
+``HistGradientBoostingRegressor`` is trained on the rows of all
+(store_nbr, family) series at once. Besides the calendar, lag and rolling
+features of ``features.build_features`` each row carries the series'
+store, family, store type and cluster as categorical features, so short
+or sparse series borrow the patterns of similar ones. Given a
+``holiday_calendar.EventCalendar``, rows also get the day-off, work-day and
+event flags of their store's city, state and country, which are known for
+the forecast days too.
+
+Sales are modelled as ``log1p(sales)``, which puts series of very
+different size on one scale; forecasts are transformed back and clipped
+at zero. Days before a series' first sale (stores that had not opened
+yet) are left out of training, and series that never sold forecast 0.
+
+Forecasts are recursive: ``features.recursive_forecast`` builds the
+feature rows of every series for the next day, the model predicts them
+in one call and the predictions are pushed into the lag state, so a
+90-day horizon is 90 vectorized predictions over all series.
+
+Usage::
+
+    python -m retail_forecast.global_model --horizon 90 --output global.parquet
+    python -m retail_forecast.global_model --holdout 28
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import baselines, features, holiday_calendar, ingest
+from retail_forecast.config import DATA_PATH
+from retail_forecast.hierarchy import load_bottom_series
+
+STATIC_FEATURES = ('store_nbr', 'family', 'type', 'cluster')
+HOLIDAY_FEATURES = ('is_holiday', 'is_work_day', 'is_event')
+STORE_COLUMNS = ['store_nbr', 'city', 'state', 'type', 'cluster']
+
+# Days of targets per series the model is trained on
+TRAIN_DAYS = 730
+
+# HistGradientBoosting bins categories; larger ones are used as numeric codes
+MAX_CATEGORIES = 255
+
+
+def store_attributes(keys, stores_df):
+    """Frame of the store attributes (and family) aligned with the rows of keys"""
+    attributes = keys[['store_nbr', 'family']].copy()
+    stores_df = stores_df.set_index('store_nbr')
+    for column in stores_df.columns:
+        attributes[column] = stores_df[column].reindex(attributes['store_nbr'].to_numpy()).to_numpy()
+    return attributes
+
+
+def encode_static(attributes, categories):
+    """(series, len(STATIC_FEATURES)) float32 category codes; unseen values are NaN"""
+    codes = np.empty((len(attributes), len(STATIC_FEATURES)), dtype=np.float32)
+    for i, column in enumerate(STATIC_FEATURES):
+        codes[:, i] = pd.Categorical(attributes[column].astype(str), categories=categories[column]).codes
+    codes[codes < 0] = np.nan
+    return codes
+
+
+class GlobalModel:
+    """HistGradientBoosting over the rows of all series, forecast recursively for all at once"""
+    name = 'Global GBM'
+
+    def __init__(self, max_iter=300, learning_rate=0.05, max_leaf_nodes=63, min_samples_leaf=50,
+                 random_state=42, train_days=TRAIN_DAYS, lags=features.LAGS, windows=features.WINDOWS):
+        self.params = {
+            'max_iter': max_iter,
+            'learning_rate': learning_rate,
+            'max_leaf_nodes': max_leaf_nodes,
+            'min_samples_leaf': min_samples_leaf,
+            'random_state': random_state,
+        }
+        self.train_days = train_days
+        self.lags, self.windows = tuple(lags), tuple(windows)
+        self.fitted = None
+        self.calendar = None
+
+    @property
+    def feature_names(self):
+        names = features.feature_names(self.lags, self.windows) + list(STATIC_FEATURES)
+        return names + list(HOLIDAY_FEATURES) if self.calendar is not None else names
+
+    def known_features(self, dates):
+        """(series, day, feature) static codes and holiday flags, known for any dates"""
+        dates = pd.DatetimeIndex(dates)
+        static = np.broadcast_to(self.static[:, None, :], (len(self.static), len(dates), self.static.shape[1]))
+        if self.calendar is None:
+            return static
+        regional, local = self.holiday_columns
+        flags = holiday_calendar.flag_columns(self.calendar.store_flags(dates, regional[:, None], local[:, None]))
+        return np.concatenate([static, np.stack([flags[c] for c in HOLIDAY_FEATURES], axis=2)], axis=2)
+
+    def training_set(self, values, dates):
+        """Training rows (X, y) of the last train_days days of every started series"""
+        needed = features.history_needed(self.lags, self.windows)
+        days = min(self.train_days, values.shape[1])
+        lo = max(values.shape[1] - days - needed, 0)
+        X = features.build_features(self.history[:, lo:], dates[lo:], self.lags, self.windows)
+        X = X[:, -days:]
+        known = self.known_features(dates[-days:])
+        # A series is in the training set from its first sale on
+        day = np.arange(values.shape[1] - days, values.shape[1])
+        started = day[None, :] >= self.first_sale[:, None]
+        rows, cols = np.nonzero(started)
+        X = np.hstack([X[rows, cols], known[rows, cols]])
+        return X, self.history[:, -days:][rows, cols]
+
+    def fit(self, values, keys, dates, stores_df, calendar=None):
+        """Fit on a (series x day) sales matrix with its keys and the stores table
+
+        With a calendar, stores_df also needs the city and state of each store.
+        """
+        from sklearn.ensemble import HistGradientBoostingRegressor
+
+        values = np.maximum(np.asarray(values, dtype=np.float64), 0)
+        self.keys = keys.reset_index(drop=True)
+        self.dates = pd.DatetimeIndex(dates)
+        attributes = store_attributes(self.keys, stores_df)
+        self.categories = {column: pd.Index(attributes[column].astype(str).unique()).sort_values()
+                           for column in STATIC_FEATURES}
+        self.static = encode_static(attributes, self.categories)
+        self.calendar = calendar
+        if calendar is not None:
+            self.holiday_columns = calendar.store_columns(attributes)
+        sold = values > 0
+        self.first_sale = np.where(sold.any(axis=1), sold.argmax(axis=1), values.shape[1])
+        self.history = np.log1p(values)
+
+        X, y = self.training_set(values, self.dates)
+        categorical = np.zeros(X.shape[1], dtype=bool)
+        first = len(features.feature_names(self.lags, self.windows))
+        categorical[first:first + len(STATIC_FEATURES)] = [len(self.categories[column]) <= MAX_CATEGORIES
+                                                           for column in STATIC_FEATURES]
+        self.fitted = HistGradientBoostingRegressor(categorical_features=categorical, early_stopping=False,
+                                                    **self.params)
+        self.fitted.fit(X, y)
+        self.n_rows = len(y)
+        return self.compact()
+
+    def compact(self):
+        """Drop the history the forecasts no longer need"""
+        self.history = self.history[:, -features.history_needed(self.lags, self.windows):]
+        return self
+
+    def future_dates(self, horizon):
+        return pd.date_range(self.dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+
+    def predict(self, horizon):
+        """(series, horizon) forecasts of every series"""
+        known = self.known_features(self.future_dates(horizon))
+        forecasts = features.recursive_forecast(
+            self.fitted.predict, self.history, self.dates[-1], horizon, self.lags, self.windows, known
+        )
+        forecasts = np.maximum(np.expm1(forecasts), 0)
+        forecasts[self.first_sale >= len(self.dates)] = 0
+        return forecasts
+
+    def forecast_frame(self, forecasts):
+        """Long frame of store_nbr, family, date, forecast"""
+        horizon = forecasts.shape[1]
+        forecasts_df = self.keys.loc[self.keys.index.repeat(horizon)].reset_index(drop=True)
+        forecasts_df['date'] = np.tile(self.future_dates(horizon).values, len(self.keys))
+        forecasts_df['forecast'] = forecasts.ravel()
+        return forecasts_df
+
+
+def fit_global(horizon=90, start=None, data_path=DATA_PATH, cache_dir=None, **params):
+    """Fit the global model on every store x family series; returns (model, forecasts)"""
+    values, keys, dates = load_bottom_series(start=start, data_path=data_path, cache_dir=cache_dir)
+    stores_df = ingest.load_stores(columns=STORE_COLUMNS, data_path=data_path, cache_dir=cache_dir)
+    calendar = holiday_calendar.load_calendar(data_path, cache_dir)
+    model = GlobalModel(**params).fit(values, keys, dates, stores_df, calendar)
+    return model, model.predict(horizon)
+
+
+def holdout_scores(values, keys, dates, stores_df, horizon, calendar=None, **params):
+    """MAE, RMSE and WAPE of the global model and the baselines on the last `horizon` days"""
+    train, actual = values[:, :-horizon], values[:, -horizon:]
+    started = time.perf_counter()
+    model = GlobalModel(**params).fit(train, keys, dates[:-horizon], stores_df, calendar)
+    fitted = time.perf_counter()
+    predictions = {model.name: model.predict(horizon)}
+    predict_seconds = time.perf_counter() - fitted
+    for method in baselines.METHODS:
+        predictions[method] = baselines.forecast(train, method, horizon)
+    rows = []
+    for name, forecasts in predictions.items():
+        scores = baselines.fold_scores(actual[:, None], forecasts[:, None])
+        rows.append({'model': name, **{metric: float(score[0]) for metric, score in scores.items()}})
+    timings = {'rows': model.n_rows, 'fit_seconds': fitted - started, 'predict_seconds': predict_seconds}
+    return pd.DataFrame(rows), timings
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fit one gradient-boosted model on every store x family series')
+    parser.add_argument('--horizon', type=int, default=90)
+    parser.add_argument('--holdout', type=int, default=None,
+                        help='score the last HOLDOUT days against the baselines instead of forecasting')
+    parser.add_argument('--train-days', type=int, default=TRAIN_DAYS)
+    parser.add_argument('--max-iter', type=int, default=300)
+    parser.add_argument('--start', default=None, help='only use history from this date')
+    parser.add_argument('--output', default=None, help='write the forecasts to this Parquet file')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    params = {'train_days': args.train_days, 'max_iter': args.max_iter}
+    if args.holdout:
+        values, keys, dates = load_bottom_series(start=args.start, data_path=args.data_path,
+                                                 cache_dir=args.cache_dir)
+        stores_df = ingest.load_stores(columns=STORE_COLUMNS, data_path=args.data_path, cache_dir=args.cache_dir)
+        calendar = holiday_calendar.load_calendar(args.data_path, args.cache_dir)
+        scores, timings = holdout_scores(values, keys, dates, stores_df, args.holdout, calendar, **params)
+        print(f"✅ {len(keys):,} series, {timings['rows']:,} training rows: fit {timings['fit_seconds']:.1f}s, "
+              f"{args.holdout}-day forecast of every series {timings['predict_seconds']:.2f}s")
+        print(scores.to_string(index=False, formatters={'MAE': '{:,.2f}'.format, 'RMSE': '{:,.2f}'.format,
+                                                        'WAPE': '{:.1f}%'.format}))
+    else:
+        started = time.perf_counter()
+        model, forecasts = fit_global(args.horizon, args.start, args.data_path, args.cache_dir, **params)
+        print(f"✅ Forecasted {len(model.keys):,} series x {args.horizon} days with one model "
+              f"({model.n_rows:,} training rows) in {time.perf_counter() - started:.1f}s")
+        if args.output:
+            model.forecast_frame(forecasts).to_parquet(args.output, index=False)
+            print(f"   Forecasts written to {args.output}")
@@ -0,0 +1,307 @@
+"""Store x family forecasting with process-pool fan-out and reconciliation.
+
+Every (store_nbr, family) series from the ``store_family`` rollup gets its
+own model. Series are split into chunks and fitted across a
+``ProcessPoolExecutor``; the bottom-level forecasts are then reconciled so
+that stores, families and the national total (the daily series shown in the
+dashboard) all add up:
+
+- ``bottom_up``: aggregate the bottom forecasts
+- ``mint``: MinT with a shrunk residual covariance (Wickramasuriya et al.,
+  2019); base models are fitted at every level of the hierarchy
+
+The ``profile`` model is vectorized across series and skips the pool.
+
+Usage::
+
+    python -m retail_forecast.hierarchy --horizon 30 --workers 8
+"""
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import rollups
+from retail_forecast.config import DATA_PATH
+from retail_forecast.profile_forecast import SeasonalProfileForecaster
+
+POOL_MODELS = ('ets', 'seasonal_naive')
+MODELS = POOL_MODELS + ('profile',)
+METHODS = ('bottom_up', 'mint')
+SEASON = 7
+
+
+def load_bottom_series(start=None, end=None, data_path=DATA_PATH, cache_dir=None):
+    """Dense (series x day) sales matrix from the store_family cube
+
+    Returns (values, keys, dates) where keys is a frame of store_nbr/family
+    aligned with the rows of values. Missing days are filled with 0.
+    """
+    cube_df = rollups.load_rollup(
+        'store_family', columns=['date', 'store_nbr', 'family', 'sales'],
+        start=start, end=end, data_path=data_path, cache_dir=cache_dir
+    )
+    dates = pd.date_range(cube_df['date'].min(), cube_df['date'].max(), freq='D')
+    keys = (cube_df[['store_nbr', 'family']].drop_duplicates()
+            .sort_values(['store_nbr', 'family']).reset_index(drop=True))
+    keys['family'] = keys['family'].astype(str)
+
+    row = pd.MultiIndex.from_frame(keys).get_indexer(
+        pd.MultiIndex.from_arrays([cube_df['store_nbr'], cube_df['family'].astype(str)])
+    )
+    col = dates.get_indexer(cube_df['date'])
+    values = np.zeros((len(keys), len(dates)), dtype=np.float64)
+    values[row, col] = cube_df['sales'].to_numpy(dtype=np.float64)
+    return values, keys, dates
+
+
+def summing_matrix(keys):
+    """Sparse S mapping bottom series to [total, stores, families, bottom]
+
+    Returns (S, levels) where levels is a frame describing each row of S.
+    """
+    # Imported here: modules that only load the bottom series skip scipy
+    from scipy import sparse
+
+    n = len(keys)
+    stores = np.sort(keys['store_nbr'].unique())
+    families = np.sort(keys['family'].unique())
+    store_idx = np.searchsorted(stores, keys['store_nbr'].to_numpy())
+    family_idx = np.searchsorted(families, keys['family'].to_numpy())
+    cols = np.arange(n)
+
+    blocks = [
+        sparse.csr_matrix(np.ones((1, n))),
+        sparse.csr_matrix((np.ones(n), (store_idx, cols)), shape=(len(stores), n)),
+        sparse.csr_matrix((np.ones(n), (family_idx, cols)), shape=(len(families), n)),
+        sparse.identity(n, format='csr'),
+    ]
+    levels = pd.concat([
+        pd.DataFrame({'level': 'total', 'store_nbr': [np.nan], 'family': [None]}),
+        pd.DataFrame({'level': 'store', 'store_nbr': stores, 'family': None}),
+        pd.DataFrame({'level': 'family', 'store_nbr': np.nan, 'family': families}),
+        pd.DataFrame({'level': 'store_family', 'store_nbr': keys['store_nbr'], 'family': keys['family']}),
+    ], ignore_index=True)
+    return sparse.vstack(blocks, format='csr'), levels
+
+
+def fit_forecast(y, horizon, model='ets'):
+    """Fit one series; returns (forecast, in-sample residuals)"""
+    y = np.asarray(y, dtype=np.float64)
+    # Stores that opened late have leading zeros; fit on the active span only
+    active = np.flatnonzero(y)
+    if len(active) == 0:
+        return np.zeros(horizon), np.zeros_like(y)
+    start = active[0]
+    history = y[start:]
+
+    if model == 'ets' and len(history) >= 4 * SEASON:
+        from statsmodels.tsa.holtwinters import ExponentialSmoothing
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            fitted = ExponentialSmoothing(
+                history, trend='add', damped_trend=True,
+                seasonal='add', seasonal_periods=SEASON,
+                initialization_method='estimated'
+            ).fit()
+        forecast = fitted.forecast(horizon)
+        residuals = np.zeros_like(y)
+        residuals[start:] = history - fitted.fittedvalues
+    else:
+        # Seasonal naive: repeat the last observed week
+        last_season = history[-SEASON:] if len(history) >= SEASON else np.full(SEASON, history[-1])
+        forecast = np.resize(last_season, horizon)
+        residuals = np.zeros_like(y)
+        if len(history) > SEASON:
+            residuals[start + SEASON:] = history[SEASON:] - history[:-SEASON]
+    return np.maximum(forecast, 0), residuals
+
+
+def fit_chunk(chunk_id, values, horizon, model):
+    """Worker entry point: fit every row of values"""
+    forecasts = np.zeros((len(values), horizon))
+    residuals = np.zeros_like(values)
+    seconds = np.zeros(len(values))
+    errors = [None] * len(values)
+    for i, y in enumerate(values):
+        started = time.perf_counter()
+        try:
+            forecasts[i], residuals[i] = fit_forecast(y, horizon, model)
+        except Exception as e:
+            # Keep going with the cheap fallback and report the failure
+            errors[i] = f'{type(e).__name__}: {e}'
+            forecasts[i], residuals[i] = fit_forecast(y, horizon, 'seasonal_naive')
+        seconds[i] = time.perf_counter() - started
+    return chunk_id, forecasts, residuals, seconds, errors
+
+
+def print_progress(done, total, elapsed):
+    rate = done / elapsed if elapsed > 0 else 0
+    print(f"   {done:,}/{total:,} series fitted ({rate:,.1f} series/s)", flush=True)
+
+
+def fit_many(values, horizon, model='ets', workers=None, chunk_size=64, progress=print_progress):
+    """Fit every row of values across a process pool
+
+    Returns (forecasts, residuals, seconds, errors) aligned with the rows.
+    progress(done, total, elapsed) is called as chunks complete.
+    """
+    if model not in POOL_MODELS:
+        raise ValueError(f"Unknown model '{model}', expected one of {POOL_MODELS}")
+    n = len(values)
+    forecasts = np.zeros((n, horizon))
+    residuals = np.zeros_like(values, dtype=np.float64)
+    seconds = np.zeros(n)
+    errors = [None] * n
+    chunks = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+    started = time.perf_counter()
+    done = 0
+    workers = workers or os.cpu_count()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(fit_chunk, i, values[lo:hi], horizon, model)
+            for i, (lo, hi) in enumerate(chunks)
+        ]
+        for future in as_completed(futures):
+            chunk_id, chunk_forecasts, chunk_residuals, chunk_seconds, chunk_errors = future.result()
+            lo, hi = chunks[chunk_id]
+            forecasts[lo:hi] = chunk_forecasts
+            residuals[lo:hi] = chunk_residuals
+            seconds[lo:hi] = chunk_seconds
+            errors[lo:hi] = chunk_errors
+            done += hi - lo
+            if progress is not None:
+                progress(done, n, time.perf_counter() - started)
+    return forecasts, residuals, seconds, errors
+
+
+def fit_profile(values, dates, horizon):
+    """Vectorized seasonal-profile fit of every row at once"""
+    started = time.perf_counter()
+    model = SeasonalProfileForecaster().fit(values, dates)
+    _, forecasts = model.predict(horizon)
+    residuals = values - model.fitted_values()
+    seconds = np.full(len(values), (time.perf_counter() - started) / max(len(values), 1))
+    return forecasts, residuals, seconds, [None] * len(values)
+
+
+def shrunk_covariance(residuals):
+    """Schafer-Strimmer shrinkage of the residual covariance towards its diagonal
+
+    residuals has shape (series, time).
+    """
+    x = residuals.T
+    t = x.shape[0]
+    covm = x.T @ x / t
+    variances = np.maximum(np.diag(covm), 1e-12)
+    std = np.sqrt(variances)
+    corm = covm / np.outer(std, std)
+    xs = x / std
+    v = (1 / (t * (t - 1))) * ((xs ** 2).T @ (xs ** 2) - (xs.T @ xs) ** 2 / t)
+    np.fill_diagonal(v, 0)
+    d = corm ** 2
+    np.fill_diagonal(d, 0)
+    lam = float(np.clip(v.sum() / d.sum(), 0, 1)) if d.sum() > 0 else 1.0
+    shrunk = (1 - lam) * covm
+    shrunk[np.diag_indices_from(shrunk)] = variances
+    return shrunk, lam
+
+
+def reconcile_mint(S, base_forecasts, residuals):
+    """MinT-shrink reconciliation of base forecasts for every level"""
+    W, _ = shrunk_covariance(residuals)
+    S_dense = S.toarray()
+    Winv_S = np.linalg.solve(W, S_dense)
+    G = np.linalg.solve(S_dense.T @ Winv_S, Winv_S.T)
+    bottom = G @ base_forecasts
+    # Negative bottom-level sales make no sense; clipping keeps totals coherent
+    return np.maximum(bottom, 0)
+
+
+def forecast_hierarchy(horizon=30, model='ets', method='bottom_up', workers=None, chunk_size=64,
+                       start=None, progress=print_progress, data_path=DATA_PATH, cache_dir=None):
+    """Forecast every store x family series and reconcile up the hierarchy
+
+    Returns a dict with:
+
+    - ``forecasts``: long frame (level, store_nbr, family, date, forecast)
+    - ``timings``: per-bottom-series fit seconds and error message
+    - ``summary``: totals for reporting
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}")
+    started = time.perf_counter()
+    values, keys, dates = load_bottom_series(start=start, data_path=data_path, cache_dir=cache_dir)
+    S, levels = summing_matrix(keys)
+    n_bottom = len(keys)
+
+    def fit(series):
+        if model == 'profile':
+            return fit_profile(series, dates, horizon)
+        return fit_many(series, horizon, model, workers, chunk_size, progress)
+
+    if method == 'bottom_up':
+        base, _, seconds, errors = fit(values)
+        bottom = base
+    else:
+        base, residuals, all_seconds, all_errors = fit(S @ values)
+        bottom = reconcile_mint(S, base, residuals)
+        seconds, errors = all_seconds[-n_bottom:], all_errors[-n_bottom:]
+
+    reconciled = S @ bottom
+    future_dates = pd.date_range(dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+    forecasts = levels.loc[levels.index.repeat(horizon)].reset_index(drop=True)
+    forecasts['date'] = np.tile(future_dates.values, len(levels))
+    forecasts['forecast'] = reconciled.ravel()
+
+    timings = keys.copy()
+    timings['fit_seconds'] = seconds
+    timings['error'] = errors
+    elapsed = time.perf_counter() - started
+    return {
+        'forecasts': forecasts,
+        'timings': timings,
+        'summary': {
+            'series': n_bottom,
+            'horizon': horizon,
+            'model': model,
+            'method': method,
+            'failed': int(timings['error'].notna().sum()),
+            'fit_seconds_total': float(np.sum(seconds)),
+            'wall_seconds': elapsed,
+        },
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Forecast every store x family series')
+    parser.add_argument('--horizon', type=int, default=30)
+    parser.add_argument('--model', choices=MODELS, default='ets')
+    parser.add_argument('--method', choices=METHODS, default='bottom_up')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--chunk-size', type=int, default=64)
+    parser.add_argument('--start', default=None, help='only use history from this date')
+    parser.add_argument('--output', default=None, help='write forecasts to this Parquet file')
+    args = parser.parse_args()
+
+    result = forecast_hierarchy(
+        horizon=args.horizon, model=args.model, method=args.method,
+        workers=args.workers, chunk_size=args.chunk_size, start=args.start
+    )
+    summary = result['summary']
+    print(f"✅ Forecasted {summary['series']:,} series x {summary['horizon']} days "
+          f"({summary['model']}, {summary['method']}) in {summary['wall_seconds']:.1f}s")
+    print(f"   Total fit time: {summary['fit_seconds_total']:.1f}s, failures: {summary['failed']}")
+    slowest = result['timings'].nlargest(5, 'fit_seconds')
+    print("   Slowest series:")
+    print(slowest.to_string(index=False))
+    if args.output:
+        result['forecasts'].to_parquet(args.output, index=False)
+        print(f"   Forecasts written to {args.output}")
@@ -0,0 +1,170 @@
+"""Dense date x locale holiday/event calendar with integer-offset lookups.
+
+``holidays_events.csv`` lists national, regional (state) and local (city)
+days with these conventions:
+
+- a ``transferred`` holiday is a normal day; the ``Transfer`` row on
+  another date is the day off
+- ``Bridge`` days are extra days off joining a holiday to a weekend,
+  ``Additional`` days extend a holiday, and a ``Work Day`` is a weekend
+  day worked to make up for a bridge
+- ``Event`` rows (e.g. Black Friday, a football World Cup) are not days off
+
+``EventCalendar`` turns the file into a (day, locale) uint8 matrix with one
+bit per kind. Column 0 is the national calendar, followed by one column per
+state and city, plus an all-zero column for stores without local events.
+A lookup converts dates to integer day offsets from the first day and
+indexes the matrix, so flagging millions of rows is a few array gathers
+instead of a ``DataFrame.merge``. The flags of a store's rows combine the
+national column with the columns of its state and city.
+
+Usage::
+
+    python -m retail_forecast.holiday_calendar
+"""
+import numpy as np
+import pandas as pd
+
+from retail_forecast import ingest
+from retail_forecast.config import DATA_PATH
+
+# Holiday-file type -> kind
+HOLIDAY_KINDS = {
+    'Holiday': 'holiday',
+    'Transfer': 'holiday',
+    'Additional': 'additional',
+    'Bridge': 'bridge',
+    'Work Day': 'work_day',
+    'Event': 'event',
+}
+# Kind -> bit of the calendar matrix
+KIND_BITS = {'holiday': 1, 'additional': 2, 'bridge': 4, 'work_day': 8, 'event': 16}
+DAY_OFF = KIND_BITS['holiday'] | KIND_BITS['additional'] | KIND_BITS['bridge']
+
+NATIONAL = 'National'
+DAY = np.timedelta64(1, 'D')
+
+
+def clean_events(holidays_df):
+    """Event rows that fall on their date: date, kind, locale, locale_name, description
+
+    Transferred holidays are dropped (their Transfer row is the day off) and
+    the file's types are mapped to HOLIDAY_KINDS.
+    """
+    events = holidays_df[~holidays_df['transferred'].astype(bool)
+                         & holidays_df['type'].isin(list(HOLIDAY_KINDS))]
+    return pd.DataFrame({
+        'date': pd.to_datetime(events['date']).to_numpy(),
+        'kind': events['type'].astype(str).map(HOLIDAY_KINDS).to_numpy(),
+        'locale': events['locale'].astype(str).to_numpy(),
+        'locale_name': events['locale_name'].astype(str).to_numpy(),
+        'description': events['description'].astype(str).to_numpy(),
+    })
+
+
+def load_events(data_path=DATA_PATH, cache_dir=None):
+    """clean_events of the ingest cache's holidays"""
+    return clean_events(ingest.load_holidays(data_path=data_path, cache_dir=cache_dir))
+
+
+def locale_key(locale, name):
+    return NATIONAL if locale == NATIONAL else f'{locale}:{name}'
+
+
+class EventCalendar:
+    """uint8 (day, locale) matrix of kind bits from the first to the last event day"""
+
+    def __init__(self, events):
+        keys = [locale_key(locale, name) for locale, name in zip(events['locale'], events['locale_name'])]
+        self.locales = pd.Index([NATIONAL] + sorted(set(keys) - {NATIONAL}))
+        dates = pd.DatetimeIndex(events['date'])
+        self.origin = dates.min().to_datetime64() if len(dates) else np.datetime64('2000-01-01', 'ns')
+        n_days = int((dates.max().to_datetime64() - self.origin) // DAY) + 1 if len(dates) else 0
+        # One extra all-zero column for locales without events
+        self.matrix = np.zeros((n_days, len(self.locales) + 1), dtype=np.uint8)
+        self.none = len(self.locales)
+        bits = np.array([KIND_BITS[kind] for kind in events['kind']], dtype=np.uint8)
+        np.bitwise_or.at(self.matrix, (self.offsets(dates), self.locales.get_indexer(keys)), bits)
+
+    @property
+    def dates(self):
+        return pd.date_range(self.origin, periods=len(self.matrix), freq='D')
+
+    def offsets(self, dates):
+        """Integer day offsets of dates from the first calendar day"""
+        values = pd.DatetimeIndex(dates).to_numpy().astype('datetime64[ns]')
+        return ((values - self.origin) // DAY).astype(np.int64)
+
+    def locale_codes(self, locale, names):
+        """Matrix columns of the names of one locale level; names without events get the zero column"""
+        codes = self.locales.get_indexer([locale_key(locale, name) for name in names])
+        return np.where(codes >= 0, codes, self.none)
+
+    def store_columns(self, stores_df):
+        """(regional, local) matrix columns of each store of stores_df"""
+        return (self.locale_codes('Regional', stores_df['state'].astype(str)),
+                self.locale_codes('Local', stores_df['city'].astype(str)))
+
+    def _gather(self, offsets, *columns):
+        """OR of the kind bits at (offset, column) for each column array; 0 outside the calendar"""
+        inside = (offsets >= 0) & (offsets < len(self.matrix))
+        rows = np.where(inside, offsets, 0)
+        flags = np.zeros(np.broadcast_shapes(offsets.shape, *(np.shape(c) for c in columns)), dtype=np.uint8)
+        for codes in columns:
+            flags |= self.matrix[rows, codes]
+        flags[~np.broadcast_to(inside, flags.shape)] = 0
+        return flags
+
+    def national(self, dates):
+        """Kind bits of the national calendar on each date"""
+        return self._gather(self.offsets(dates), 0)
+
+    def store_flags(self, dates, regional, local):
+        """Kind bits of each row from the national calendar and its store's state and city columns"""
+        return self._gather(self.offsets(dates), 0, regional, local)
+
+    def store_matrix(self, dates, stores_df):
+        """(day, store) kind bits of every store of stores_df on each date"""
+        regional, local = self.store_columns(stores_df)
+        return self._gather(self.offsets(dates)[:, None], 0, regional[None, :], local[None, :])
+
+
+def flag_columns(flags):
+    """Bool columns of kind bits: is_holiday (a day off), is_work_day, is_event"""
+    return {
+        'is_holiday': (flags & DAY_OFF) > 0,
+        'is_work_day': (flags & KIND_BITS['work_day']) > 0,
+        'is_event': (flags & KIND_BITS['event']) > 0,
+    }
+
+
+def load_calendar(data_path=DATA_PATH, cache_dir=None):
+    return EventCalendar(load_events(data_path, cache_dir))
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Build the holiday/event calendar and flag every train row')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    calendar = load_calendar(args.data_path, args.cache_dir)
+    print(f"✅ Calendar of {len(calendar.matrix):,} days x {len(calendar.locales)} locales "
+          f"in {(time.perf_counter() - started) * 1000:.1f} ms")
+    national = flag_columns(calendar.national(calendar.dates))
+    print(f"   National: {national['is_holiday'].sum()} days off, {national['is_work_day'].sum()} work days, "
+          f"{national['is_event'].sum()} event days")
+
+    train_df = ingest.load_train(columns=['date', 'store_nbr'], data_path=args.data_path, cache_dir=args.cache_dir)
+    stores_df = ingest.load_stores(data_path=args.data_path, cache_dir=args.cache_dir)
+    started = time.perf_counter()
+    positions = pd.Index(stores_df['store_nbr']).get_indexer(train_df['store_nbr'])
+    regional, local = calendar.store_columns(stores_df)
+    flags = calendar.store_flags(train_df['date'], regional[positions], local[positions])
+    rows = flag_columns(flags)
+    print(f"   Flagged {len(train_df):,} rows in {(time.perf_counter() - started) * 1000:.0f} ms: "
+          f"{rows['is_holiday'].mean():.1%} on a local day off, {rows['is_event'].mean():.1%} on an event")
@@ -0,0 +1,146 @@
+"""Append new days of sales to the ingest cache and rollups.
+
+A delta file holds new ``date, store_nbr, family, sales, onpromotion`` rows.
+Only the year partitions those dates fall in are rewritten (raw rows and
+every rollup cube), and only their version stamps are bumped, so cached
+views keyed on ``rollups.data_version`` for other years stay valid. Rows
+for a (date, store_nbr, family) that already exists replace the old row.
+
+Appended rows live in the cache for the current ``train.csv``; once the CSV
+itself is replaced the cache is rebuilt from it.
+
+Usage::
+
+    python -m retail_forecast.incremental new_days.csv
+"""
+import os
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from retail_forecast import holiday_calendar, ingest, rollups
+from retail_forecast.config import DATA_PATH
+
+DELTA_COLUMNS = ['date', 'store_nbr', 'family', 'sales', 'onpromotion']
+KEYS = ['date', 'store_nbr', 'family']
+
+
+def read_delta(path):
+    """Read a CSV or Parquet delta file"""
+    if path.endswith('.parquet'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path, parse_dates=['date'])
+
+
+def validate_delta(delta_df):
+    """Check columns/keys and apply the ingest dtypes"""
+    missing = [col for col in DELTA_COLUMNS if col not in delta_df.columns]
+    if missing:
+        raise ValueError(f"Delta is missing columns: {missing}")
+    delta_df = delta_df[DELTA_COLUMNS].copy()
+    delta_df['date'] = pd.to_datetime(delta_df['date'])
+    delta_df = delta_df.astype({col: ingest.TRAIN_DTYPES[col] for col in DELTA_COLUMNS[1:]})
+    if delta_df[DELTA_COLUMNS].isna().any().any():
+        raise ValueError("Delta contains missing values")
+    if delta_df.duplicated(KEYS).any():
+        raise ValueError("Delta has duplicate (date, store_nbr, family) rows")
+    return delta_df
+
+
+@contextmanager
+def _lock(path, timeout=600):
+    """Cross-process lock so two appends never rewrite the same partitions"""
+    lock_file = os.path.join(path, '.append.lock')
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            if time.time() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_file}")
+            time.sleep(0.2)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_file)
+
+
+def append_sales(delta, data_path=DATA_PATH, cache_dir=None):
+    """Fold a delta (path or DataFrame) into the cache; returns a summary dict"""
+    delta_df = validate_delta(read_delta(delta) if isinstance(delta, str) else delta)
+    if delta_df.empty:
+        return {'rows': 0, 'replaced': 0, 'years': []}
+
+    base = ingest.ensure_cache(data_path, cache_dir)
+    rollup_dir = rollups.build_rollups(data_path, cache_dir)
+    calendar = holiday_calendar.load_calendar(data_path, cache_dir)
+
+    with _lock(base):
+        manifest = ingest.read_manifest(base)
+        rollup_manifest = rollups.read_manifest(rollup_dir)
+        next_id = int(ingest.load_train(columns=['id'], data_path=data_path, cache_dir=cache_dir)['id'].max()) + 1
+
+        years = sorted(int(y) for y in delta_df['date'].dt.year.unique())
+        replaced = 0
+        for year in years:
+            year_delta = delta_df[delta_df['date'].dt.year == year]
+            year_delta = year_delta.assign(id=range(next_id, next_id + len(year_delta)))
+            year_delta = year_delta.astype({'id': 'int32'})
+            next_id += len(year_delta)
+
+            existing = ingest.load_train(
+                start=f'{year}-01-01', end=f'{year}-12-31',
+                data_path=data_path, cache_dir=cache_dir
+            )
+            # Rows for the same (date, store, family) are superseded by the delta
+            overlap = existing.set_index(KEYS).index.isin(year_delta.set_index(KEYS).index)
+            replaced += int(overlap.sum())
+            year_df = pd.concat([existing[~overlap], year_delta[existing.columns]], ignore_index=True)
+            year_df['family'] = year_df['family'].astype('category')
+            year_df = year_df.sort_values(KEYS).reset_index(drop=True)
+            ingest.write_partition(os.path.join(base, 'train'), year, year_df)
+
+            for name, cube_df in rollups.aggregate(year_df, calendar).items():
+                ingest.write_partition(os.path.join(rollup_dir, name), year, cube_df)
+            rollup_manifest['versions'][str(year)] = str(time.time_ns())
+
+        manifest['rows'] = ds.dataset(os.path.join(base, 'train'), partitioning='hive').count_rows()
+        manifest['date_min'] = min(manifest['date_min'], delta_df['date'].min().strftime('%Y-%m-%d'))
+        manifest['date_max'] = max(manifest['date_max'], delta_df['date'].max().strftime('%Y-%m-%d'))
+        manifest['years'] = sorted(set(manifest['years']) | set(years))
+        manifest.setdefault('appends', []).append({
+            'at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'rows': len(delta_df),
+            'replaced': replaced,
+            'date_min': delta_df['date'].min().strftime('%Y-%m-%d'),
+            'date_max': delta_df['date'].max().strftime('%Y-%m-%d'),
+        })
+        ingest.write_manifest(base, manifest)
+
+        rollup_manifest['rows'] = {
+            name: ds.dataset(os.path.join(rollup_dir, name), partitioning='hive').count_rows()
+            for name in rollups.CUBES
+        }
+        rollups.write_manifest(rollup_dir, rollup_manifest)
+
+    return {'rows': len(delta_df), 'replaced': replaced, 'years': years}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Append new days of sales to the cache')
+    parser.add_argument('delta', help='CSV or Parquet file with date, store_nbr, family, sales, onpromotion')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    started = time.time()
+    summary = append_sales(args.delta, args.data_path, args.cache_dir)
+    print(f"✅ Appended {summary['rows']:,} rows ({summary['replaced']:,} replaced) "
+          f"in {time.time() - started:.1f}s")
+    print(f"   Updated years: {summary['years']}")
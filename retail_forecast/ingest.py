@@ -0,0 +1,198 @@
+"""Convert the raw Kaggle CSVs into a typed, date-partitioned Parquet cache.
+
+The CSVs are parsed once; every later load reads only the Parquet columns
+(and year partitions) it asks for. A cache directory is keyed by the mtime
+and size of the source files, so editing a CSV triggers a rebuild.
+
+Build the cache ahead of time with::
+
+    python -m retail_forecast.ingest
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from retail_forecast.config import DATA_PATH, INGEST_CHUNKSIZE, cache_dir_for
+
+SOURCE_FILES = ('train.csv', 'stores.csv', 'holidays_events.csv')
+
+TRAIN_DTYPES = {
+    'id': 'int32',
+    'store_nbr': 'int16',
+    'family': 'category',
+    'sales': 'float64',
+    'onpromotion': 'int32',
+}
+
+STORES_DTYPES = {
+    'store_nbr': 'int16',
+    'city': 'category',
+    'state': 'category',
+    'type': 'category',
+    'cluster': 'int16',
+}
+
+MANIFEST = 'manifest.json'
+
+
+def source_fingerprint(data_path=DATA_PATH):
+    """Hash the name, mtime and size of every source CSV"""
+    digest = hashlib.sha1()
+    for name in SOURCE_FILES:
+        stat = os.stat(os.path.join(data_path, name))
+        digest.update(f'{name}:{stat.st_mtime_ns}:{stat.st_size};'.encode())
+    return digest.hexdigest()[:16]
+
+
+def cache_path(fingerprint, cache_dir=None):
+    cache_dir = cache_dir or cache_dir_for()
+    return os.path.join(cache_dir, f'ingest-{fingerprint}')
+
+
+def read_manifest(path):
+    with open(os.path.join(path, MANIFEST)) as f:
+        return json.load(f)
+
+
+def write_manifest(path, manifest):
+    with open(os.path.join(path, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, default=str)
+
+
+def build_cache(data_path=DATA_PATH, cache_dir=None, force=False, chunksize=None):
+    """Parse the CSVs into Parquet under cache_dir and return the cache path
+
+    With chunksize, train.csv is streamed in chunks and the rollups are
+    built in the same pass (see ``retail_forecast.streaming``).
+    """
+    if chunksize:
+        from retail_forecast.streaming import build_streaming
+
+        return build_streaming(data_path, cache_dir, chunksize, force)
+    cache_dir = cache_dir or cache_dir_for(data_path)
+    fingerprint = source_fingerprint(data_path)
+    target = cache_path(fingerprint, cache_dir)
+    if not force and os.path.exists(os.path.join(target, MANIFEST)):
+        return target
+
+    started = time.time()
+    tmp = f'{target}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    train_df = pd.read_csv(
+        os.path.join(data_path, 'train.csv'),
+        dtype=TRAIN_DTYPES,
+        parse_dates=['date']
+    )
+    train_df['year'] = train_df['date'].dt.year.astype('int16')
+    train_df.to_parquet(os.path.join(tmp, 'train'), partition_cols=['year'], index=False)
+
+    stores_df = pd.read_csv(os.path.join(data_path, 'stores.csv'), dtype=STORES_DTYPES)
+    stores_df.to_parquet(os.path.join(tmp, 'stores.parquet'), index=False)
+
+    holidays_df = pd.read_csv(os.path.join(data_path, 'holidays_events.csv'), parse_dates=['date'])
+    holidays_df.to_parquet(os.path.join(tmp, 'holidays.parquet'), index=False)
+
+    write_manifest(tmp, {
+        'fingerprint': fingerprint,
+        'data_path': os.path.abspath(data_path),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'build_seconds': round(time.time() - started, 2),
+        'rows': len(train_df),
+        'date_min': train_df['date'].min().strftime('%Y-%m-%d'),
+        'date_max': train_df['date'].max().strftime('%Y-%m-%d'),
+        'years': sorted(int(y) for y in train_df['year'].unique()),
+    })
+
+    if os.path.exists(target):
+        # Forced rebuild: swap out the old copy
+        shutil.rmtree(target)
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        # Another process finished the same build first; keep theirs
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    remove_stale(cache_dir, keep=target)
+    return target
+
+
+def write_partition(dataset_path, year, frame):
+    """Replace the files of one year partition with frame (without a year column)"""
+    part_dir = os.path.join(dataset_path, f'year={year}')
+    os.makedirs(part_dir, exist_ok=True)
+    old_files = os.listdir(part_dir)
+    tmp = os.path.join(part_dir, f'.part-{os.getpid()}-{time.time_ns()}.tmp')
+    frame.drop(columns='year', errors='ignore').to_parquet(tmp, index=False)
+    for name in old_files:
+        os.remove(os.path.join(part_dir, name))
+    # Dot-files are ignored by the dataset reader until renamed
+    os.replace(tmp, os.path.join(part_dir, f'part-{time.time_ns()}.parquet'))
+
+
+def remove_stale(cache_dir, keep):
+    """Drop caches built from older versions of the source files"""
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if name.startswith('ingest-') and path != keep and '.tmp-' not in name:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def ensure_cache(data_path=DATA_PATH, cache_dir=None):
+    """Return the cache path for the current source files, building it if needed"""
+    return build_cache(data_path, cache_dir, chunksize=INGEST_CHUNKSIZE)
+
+
+def load_train(columns=None, start=None, end=None, data_path=DATA_PATH, cache_dir=None):
+    """Load row-level sales, reading only the requested columns and date range"""
+    path = ensure_cache(data_path, cache_dir)
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        filters.append(('year', '>=', start.year))
+        filters.append(('date', '>=', start))
+    if end is not None:
+        end = pd.Timestamp(end)
+        filters.append(('year', '<=', end.year))
+        filters.append(('date', '<=', end))
+    train_df = pd.read_parquet(
+        os.path.join(path, 'train'),
+        columns=list(columns) if columns is not None else None,
+        filters=filters or None
+    )
+    if columns is None or 'year' not in columns:
+        train_df = train_df.drop(columns='year', errors='ignore')
+    return train_df
+
+
+def load_stores(columns=None, data_path=DATA_PATH, cache_dir=None):
+    path = ensure_cache(data_path, cache_dir)
+    return pd.read_parquet(os.path.join(path, 'stores.parquet'), columns=columns)
+
+
+def load_holidays(columns=None, data_path=DATA_PATH, cache_dir=None):
+    path = ensure_cache(data_path, cache_dir)
+    return pd.read_parquet(os.path.join(path, 'holidays.parquet'), columns=columns)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the Parquet ingest cache')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--force', action='store_true', help='rebuild even if the cache is current')
+    parser.add_argument('--chunksize', type=int, default=INGEST_CHUNKSIZE,
+                        help='stream train.csv in chunks of this many rows')
+    args = parser.parse_args()
+
+    path = build_cache(args.data_path, args.cache_dir, force=args.force, chunksize=args.chunksize)
+    manifest = read_manifest(path)
+    print(f"✅ Ingest cache ready: {path}")
+    print(f"   Rows: {manifest['rows']:,} ({manifest['date_min']} to {manifest['date_max']})")
+    print(f"   Build time: {manifest['build_seconds']}s")
@@ -0,0 +1,252 @@
+"""Prediction intervals from backtest residuals (split-conformal quantiles).
+
+Forecast errors are made scale-free by dividing them by the series level
+(mean of the ``SCALE_WINDOW`` days before the forecast origin). For each
+horizon step, the conformal lower/upper quantiles of these scaled errors
+form a small table. Applying the table to any number of series is one
+broadcast::
+
+    lower[s, h] = max(forecast[s, h] + q_lo[h] * scale[s], 0)
+    upper[s, h] = forecast[s, h] + q_hi[h] * scale[s]
+
+Two sources of errors:
+
+- ``backtest_table``: the per-fold errors saved by ``retail_forecast.backtest``
+  for one model of the national series
+- ``profile_table``: a vectorized rolling-origin backtest of the seasonal
+  profile over every row of a (series x day) matrix, pooled across series
+
+Tables are cached as Parquet under ``<cache>/intervals/<data version>/``,
+keyed by the model and the backtest run they came from.
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import backtest, rollups
+from retail_forecast.config import DATA_PATH, cache_dir_for
+from retail_forecast.profile_forecast import SeasonalProfileForecaster
+from retail_forecast.registry import fingerprint_id
+
+COVERAGES = (0.8, 0.95)
+SCALE_WINDOW = 28
+
+
+def level_scale(values, ends, window=SCALE_WINDOW):
+    """Mean of the `window` days before each end index; (series, len(ends))"""
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    ends = np.asarray(ends)
+    csum = np.zeros((values.shape[0], values.shape[1] + 1))
+    np.cumsum(values, axis=1, out=csum[:, 1:])
+    starts = np.maximum(ends - window, 0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scale = (csum[:, ends] - csum[:, starts]) / (ends - starts)
+    # Closed or new series have no level; keep their errors in sales units
+    return np.where(scale > 0, scale, 1.0)
+
+
+def conformal_bounds(scores, coverage):
+    """Lower/upper split-conformal quantiles of scores along axis 0
+
+    Uses the finite-sample corrected levels ceil((n + 1)(1 - a/2)) / n, so
+    the interval covers at least `coverage` of exchangeable future errors.
+    With too few samples for that level the extreme scores are used.
+    """
+    n = len(scores)
+    tail = (1 - coverage) / 2
+    upper_level = min(np.ceil((n + 1) * (1 - tail)) / n, 1.0)
+    lower_level = max(np.floor((n + 1) * tail) / n, 0.0)
+    lower = np.nanquantile(scores, lower_level, axis=0, method='lower')
+    upper = np.nanquantile(scores, upper_level, axis=0, method='higher')
+    return lower, upper
+
+
+def quantile_table(scores, coverages=COVERAGES):
+    """Frame of step, coverage, lower, upper, samples from (samples, steps) scaled errors"""
+    scores = np.asarray(scores, dtype=np.float64)
+    frames = []
+    for coverage in coverages:
+        lower, upper = conformal_bounds(scores, coverage)
+        frames.append(pd.DataFrame({
+            'step': np.arange(1, scores.shape[1] + 1),
+            'coverage': coverage,
+            'lower': lower,
+            'upper': upper,
+            'samples': np.sum(~np.isnan(scores), axis=0),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def table_bounds(table, coverage, horizon):
+    """(lower, upper) scaled-error arrays for steps 1..horizon
+
+    Steps past the end of the table reuse its last step, widened by
+    sqrt(step / last step).
+    """
+    rows = table[np.isclose(table['coverage'], coverage)].sort_values('step')
+    if rows.empty:
+        raise ValueError(f"No {coverage:.0%} interval in table, have {sorted(table['coverage'].unique())}")
+    lower = rows['lower'].to_numpy()
+    upper = rows['upper'].to_numpy()
+    if horizon > len(rows):
+        growth = np.sqrt(np.arange(len(rows) + 1, horizon + 1) / len(rows))
+        lower = np.concatenate([lower, lower[-1] * growth])
+        upper = np.concatenate([upper, upper[-1] * growth])
+    return lower[:horizon], upper[:horizon]
+
+
+def apply_intervals(forecasts, scale, lower, upper):
+    """Interval bounds for (series, horizon) forecasts, clipped at zero sales"""
+    forecasts = np.atleast_2d(forecasts)
+    scale = np.asarray(scale, dtype=np.float64).reshape(-1, 1)
+    h = forecasts.shape[1]
+    return (np.maximum(forecasts + lower[None, :h] * scale, 0),
+            forecasts + upper[None, :h] * scale)
+
+
+def intervals(forecasts, history, table, coverage=0.95):
+    """(lower, upper) for forecasts made at the end of history (series x day)"""
+    forecasts = np.atleast_2d(forecasts)
+    history = np.atleast_2d(history)
+    scale = level_scale(history, [history.shape[1]])[:, 0]
+    lower, upper = table_bounds(table, coverage, forecasts.shape[1])
+    return apply_intervals(forecasts, scale, lower, upper)
+
+
+def _cached(path, build):
+    if os.path.exists(path):
+        return pd.read_parquet(path)
+    table = build()
+    if table is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        table.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+    return table
+
+
+def _table_path(version, key, data_path=DATA_PATH, cache_dir=None):
+    root = os.path.join(cache_dir or cache_dir_for(data_path), 'intervals', fingerprint_id(version))
+    return os.path.join(root, hashlib.sha1(key.encode()).hexdigest()[:16] + '.parquet')
+
+
+def backtest_scores(errors, y, dates):
+    """(folds, steps) scaled errors of one model's backtest errors frame"""
+    wide_actual = errors.pivot(index='cutoff', columns='step', values='actual')
+    wide_forecast = errors.pivot(index='cutoff', columns='step', values='forecast')
+    cutoffs = pd.DatetimeIndex(dates).get_indexer(wide_actual.index)
+    scale = level_scale(y, cutoffs)[0]
+    return (wide_actual.to_numpy() - wide_forecast.to_numpy()) / scale[:, None]
+
+
+def backtest_table(model, version=None, coverages=COVERAGES, data_path=DATA_PATH, cache_dir=None):
+    """Quantile table from the saved backtest of a national model; None without one"""
+    version = version or rollups.data_version(data_path=data_path, cache_dir=cache_dir)
+    run = backtest.load_backtest(version, data_path, cache_dir)
+    if run is None:
+        return None
+    _, errors, meta = run
+    errors = errors[errors['model'] == model]
+    if errors.empty:
+        return None
+
+    def build():
+        daily_df = rollups.load_daily_series(data_path, cache_dir)
+        scores = backtest_scores(errors, daily_df['sales'].to_numpy(), daily_df['date'])
+        return quantile_table(scores, coverages)
+
+    key = f"backtest:{model}:{meta['saved_at']}:{coverages}"
+    return _cached(_table_path(version, key, data_path, cache_dir), build)
+
+
+def profile_scores(values, dates, horizon, folds=26, step=7):
+    """(folds * series, horizon) scaled errors of the seasonal profile
+
+    The profile is refitted at every cutoff for all rows at once.
+    """
+    values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+    dates = pd.DatetimeIndex(dates)
+    folds = min(folds, (values.shape[1] - 3 * horizon) // step + 1)
+    pairs = backtest.make_cutoffs(values.shape[1], horizon, folds, step)
+    cutoffs = [cutoff for _, cutoff in pairs]
+    scale = level_scale(values, cutoffs)
+    scores = np.empty((len(cutoffs), values.shape[0], horizon))
+    for i, cutoff in enumerate(cutoffs):
+        model = SeasonalProfileForecaster().fit(values[:, :cutoff], dates[:cutoff])
+        _, forecasts = model.predict(horizon)
+        scores[i] = (values[:, cutoff:cutoff + horizon] - forecasts) / scale[:, i:i + 1]
+    return scores.reshape(-1, horizon)
+
+
+def profile_table(values, dates, horizon=90, version=None, level='daily', folds=26, step=7,
+                  coverages=COVERAGES, data_path=DATA_PATH, cache_dir=None):
+    """Quantile table of the seasonal profile over the rows of values, cached per version"""
+    def build():
+        return quantile_table(profile_scores(values, dates, horizon, folds, step), coverages)
+
+    if version is None:
+        return build()
+    # The digest of the values and the date span tell apart filtered or windowed inputs of one level
+    dates = pd.DatetimeIndex(dates)
+    digest = hashlib.sha1(np.ascontiguousarray(values, dtype=np.float64).tobytes()).hexdigest()[:16]
+    key = (f'profile:{level}:{len(values)}:{digest}:{dates[0]:%Y%m%d}-{dates[-1]:%Y%m%d}:'
+           f'{horizon}:{folds}:{step}:{coverages}')
+    return _cached(_table_path(version, key, data_path, cache_dir), build)
+
+
+def daily_table(model, horizon=90, version=None, data_path=DATA_PATH, cache_dir=None):
+    """Interval table for a model of the national daily series; None when no errors exist
+
+    The seasonal profile is cheap to refit, so it is backtested here over
+    weekly cutoffs (many more windows than a saved run has); other models
+    use their saved backtest errors.
+    """
+    version = version or rollups.data_version(data_path=data_path, cache_dir=cache_dir)
+    if model == 'Seasonal Profile':
+        daily_df = rollups.load_daily_series(data_path, cache_dir)
+        return profile_table(daily_df['sales'].to_numpy(), daily_df['date'], horizon, version,
+                             data_path=data_path, cache_dir=cache_dir)
+    return backtest_table(model, version, data_path=data_path, cache_dir=cache_dir)
+
+
+def coverage_report(scores, table, coverage):
+    """Share of errors inside the interval at each step (check on held-out scores)"""
+    lower, upper = table_bounds(table, coverage, scores.shape[1])
+    inside = (scores >= lower[None, :]) & (scores <= upper[None, :])
+    return inside.mean(axis=0)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from retail_forecast.hierarchy import load_bottom_series
+
+    parser = argparse.ArgumentParser(description='Build and check prediction-interval tables')
+    parser.add_argument('--horizon', type=int, default=28)
+    parser.add_argument('--folds', type=int, default=26)
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    values, keys, dates = load_bottom_series(data_path=args.data_path, cache_dir=args.cache_dir)
+    started = time.perf_counter()
+    scores = profile_scores(values, dates, args.horizon, args.folds)
+    # Calibrate on the older folds, check coverage on the newest ones
+    split = len(scores) - len(scores) // 4
+    split -= split % len(values)
+    table = quantile_table(scores[:split])
+    build_seconds = time.perf_counter() - started
+    print(f"✅ Interval table from {split:,} windows of {len(values):,} series in {build_seconds:.2f}s")
+    for coverage in COVERAGES:
+        covered = coverage_report(scores[split:], table, coverage)
+        print(f"   {coverage:.0%} interval: held-out coverage {covered.mean():.1%} "
+              f"(steps {covered.min():.1%} to {covered.max():.1%})")
+
+    started = time.perf_counter()
+    _, forecasts = SeasonalProfileForecaster().fit(values, dates).predict(args.horizon)
+    lower, upper = intervals(forecasts, values, table)
+    print(f"   Intervals for {len(values):,} series x {args.horizon} days in "
+          f"{(time.perf_counter() - started) * 1000:.1f} ms (including the point forecasts)")
@@ -0,0 +1,14 @@
+"""Forecast accuracy metrics used by the notebook, the registry and backtests."""
+import numpy as np
+
+
+def calculate_metrics(y_true, y_pred):
+    """MAE, RMSE and MAPE (%) of a forecast"""
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    errors = y_true - y_pred
+    return {
+        'MAE': float(np.mean(np.abs(errors))),
+        'RMSE': float(np.sqrt(np.mean(errors ** 2))),
+        'MAPE': float(np.mean(np.abs(errors / (y_true + 1e-8))) * 100),
+    }
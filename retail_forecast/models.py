@@ -0,0 +1,267 @@
+"""The notebook's model zoo behind one fit/predict interface.
+
+Every model is fitted on a daily series (values + dates) and forecasts the
+days that follow it::
+
+    model = make_model('SARIMA').fit(y, dates)
+    forecast = model.predict(90)
+
+Models are plain picklable objects so the registry can store them fitted.
+"""
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import baselines, features
+from retail_forecast.profile_forecast import SeasonalProfileForecaster
+
+try:
+    from prophet import Prophet
+    PROPHET_AVAILABLE = True
+except ImportError:
+    PROPHET_AVAILABLE = False
+
+
+class ForecastModel:
+    """Base class: stores the training dates, subclasses do the fitting"""
+    name = None
+
+    def __init__(self, **params):
+        self.params = params
+
+    def fit(self, y, dates):
+        self.y = np.asarray(y, dtype=np.float64)
+        self.dates = pd.DatetimeIndex(dates)
+        self._fit()
+        return self
+
+    def future_dates(self, horizon):
+        return pd.date_range(self.dates[-1] + pd.Timedelta(days=1), periods=horizon, freq='D')
+
+    def _fit(self):
+        pass
+
+    def predict(self, horizon):
+        raise NotImplementedError
+
+    def compact(self):
+        """Drop training data not needed by predict() before pickling"""
+        self.dates = self.dates[-1:]
+        return self
+
+
+class NaiveModel(ForecastModel):
+    name = 'Naive'
+
+    def predict(self, horizon):
+        return baselines.forecast(self.y, 'naive', horizon)
+
+    def compact(self):
+        self.y = self.y[-1:]
+        return super().compact()
+
+
+class SeasonalNaiveModel(ForecastModel):
+    name = 'Seasonal Naive'
+
+    def __init__(self, season=7):
+        super().__init__(season=season)
+
+    def predict(self, horizon):
+        return baselines.forecast(self.y, 'seasonal_naive', horizon, **self.params)
+
+    def compact(self):
+        self.y = self.y[-self.params['season']:]
+        return super().compact()
+
+
+class MovingAverageModel(ForecastModel):
+    name = 'Moving Average'
+
+    def __init__(self, window=30):
+        super().__init__(window=window)
+
+    def predict(self, horizon):
+        return baselines.forecast(self.y, 'moving_average', horizon, **self.params)
+
+    def compact(self):
+        self.y = self.y[-self.params['window']:]
+        return super().compact()
+
+
+class EwmaModel(ForecastModel):
+    name = 'EWMA'
+
+    def __init__(self, span=30):
+        super().__init__(span=span)
+
+    def _fit(self):
+        self.level = baselines.ewma_levels(self.y, self.params['span'])[0, -1]
+
+    def predict(self, horizon):
+        return np.full(horizon, self.level)
+
+    def compact(self):
+        self.y = self.y[-1:]
+        return super().compact()
+
+
+class ArimaModel(ForecastModel):
+    name = 'ARIMA'
+
+    def __init__(self, order=(2, 1, 2)):
+        super().__init__(order=tuple(order))
+
+    def _build(self):
+        from statsmodels.tsa.arima.model import ARIMA
+
+        return ARIMA(self.y, order=self.params['order'])
+
+    def _fit(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.fitted = self._build().fit()
+
+    def results(self):
+        if self.fitted is None:
+            # Re-run the Kalman filter with the stored parameters (no optimisation)
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                self.fitted = self._build().filter(self.fitted_params)
+        return self.fitted
+
+    def predict(self, horizon):
+        return np.asarray(self.results().forecast(steps=horizon))
+
+    def compact(self):
+        # Pickled statsmodels results are huge (per-step filter output);
+        # keep only the parameters and rebuild the filter on first predict
+        self.fitted_params = np.asarray(self.fitted.params)
+        self.fitted = None
+        return super().compact()
+
+
+class SarimaModel(ArimaModel):
+    name = 'SARIMA'
+
+    def __init__(self, order=(1, 1, 1), seasonal_order=(1, 1, 1, 7), maxiter=50):
+        ForecastModel.__init__(
+            self, order=tuple(order), seasonal_order=tuple(seasonal_order), maxiter=maxiter
+        )
+
+    def _build(self):
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        return SARIMAX(self.y, order=self.params['order'], seasonal_order=self.params['seasonal_order'])
+
+    def _fit(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.fitted = self._build().fit(disp=False, maxiter=self.params['maxiter'])
+
+
+class ProphetModel(ForecastModel):
+    name = 'Prophet'
+
+    def __init__(self, holidays=None, seasonality_mode='multiplicative'):
+        super().__init__(seasonality_mode=seasonality_mode)
+        self.holidays = holidays
+
+    def _fit(self):
+        if not PROPHET_AVAILABLE:
+            raise ImportError("Prophet not available. Install with: pip install prophet")
+        self.fitted = Prophet(
+            yearly_seasonality=True,
+            weekly_seasonality=True,
+            daily_seasonality=False,
+            holidays=self.holidays,
+            seasonality_mode=self.params['seasonality_mode'],
+            interval_width=0.95
+        )
+        self.fitted.fit(pd.DataFrame({'ds': self.dates, 'y': self.y}))
+
+    def predict(self, horizon):
+        future = pd.DataFrame({'ds': self.future_dates(horizon)})
+        return self.fitted.predict(future)['yhat'].to_numpy()
+
+
+class RandomForestModel(ForecastModel):
+    """Random Forest on calendar, lag, rolling and seasonal-component features, forecast recursively"""
+    name = 'Random Forest'
+
+    def __init__(self, n_estimators=100, max_depth=10, random_state=42, n_jobs=-1,
+                 lags=features.LAGS, windows=features.WINDOWS, seasonal=True):
+        super().__init__(n_estimators=n_estimators, max_depth=max_depth,
+                         random_state=random_state, n_jobs=n_jobs,
+                         lags=tuple(lags), windows=tuple(windows), seasonal=seasonal)
+
+    def fit(self, y, dates, X=None):
+        """X optionally holds precomputed features.build_features rows for dates"""
+        self._X = X
+        return super().fit(y, dates)
+
+    def _fit(self):
+        from sklearn.ensemble import RandomForestRegressor
+
+        lags, windows = self.params['lags'], self.params['windows']
+        X = self._X if self._X is not None else features.build_features(self.y, self.dates, lags, windows)[0]
+        self._X = None
+        self.future_seasonal = None
+        if self.params.get('seasonal'):
+            # Components come from the training window only, so folds never see later days
+            seasonal, self.future_seasonal = features.seasonal_features(self.y, self.dates, horizon=728)
+            X = np.concatenate([X, seasonal[0]], axis=1)
+        X, y = features.training_rows(X, self.y)
+        forest_params = {k: v for k, v in self.params.items() if k not in ('lags', 'windows', 'seasonal')}
+        self.fitted = RandomForestRegressor(**forest_params)
+        self.fitted.fit(X, y)
+
+    def predict(self, horizon):
+        known = None
+        if getattr(self, 'future_seasonal', None) is not None:
+            # Two years of components are kept; longer horizons repeat them
+            known = self.future_seasonal[:, np.arange(horizon) % self.future_seasonal.shape[1]]
+        return features.recursive_forecast(
+            self.fitted.predict, self.y, self.dates[-1], horizon,
+            self.params['lags'], self.params['windows'], known
+        )[0]
+
+    def compact(self):
+        self.y = self.y[-features.history_needed(self.params['lags'], self.params['windows']):]
+        return super().compact()
+
+
+class ProfileModel(ForecastModel):
+    name = 'Seasonal Profile'
+
+    def __init__(self, level_window=30, trend_window=365):
+        super().__init__(level_window=level_window, trend_window=trend_window)
+
+    def _fit(self):
+        self.fitted = SeasonalProfileForecaster(**self.params).fit(self.y, self.dates)
+
+    def predict(self, horizon):
+        return self.fitted.predict(horizon)[1][0]
+
+    def compact(self):
+        self.y = self.y[-1:]
+        self.fitted._in_sample = None
+        return super().compact()
+
+
+MODELS = {
+    model.name: model
+    for model in (NaiveModel, SeasonalNaiveModel, MovingAverageModel, EwmaModel, ArimaModel,
+                  SarimaModel, ProphetModel, RandomForestModel, ProfileModel)
+}
+
+
+def available_models():
+    return [name for name in MODELS if name != 'Prophet' or PROPHET_AVAILABLE]
+
+
+def make_model(name, **params):
+    if name not in MODELS:
+        raise ValueError(f"Unknown model '{name}', expected one of {list(MODELS)}")
+    return MODELS[name](**params)
@@ -0,0 +1,381 @@
+"""SARIMA/ARIMA order search with warm starts, AIC pruning and a result cache.
+
+Instead of fixing ``ARIMA(2,1,2)`` and ``SARIMA(1,1,1)(1,1,1,7)``, candidate
+(p,d,q)(P,D,Q,s) orders are explored stepwise in waves:
+
+1. fit a few seed orders
+2. the next wave is the untried grid neighbours (one of p,q,P,Q,d,D moved
+   by 1) of the ``beam`` best orders so far; everything else is pruned
+3. stop once a wave no longer improves the best AIC
+
+Each fit starts from the parameters of an already-fitted neighbour nested
+in it (matched by name, the extra lag starts at 0), which usually converges
+in a fraction of the iterations. Fits within a wave run on a
+process pool for one series; with many series each worker searches whole
+series instead. Every fitted candidate is cached in a JSON file per series
+fingerprint, so re-runs (or wider grids) only fit orders not seen before;
+fits are only reused with the same ``maxiter``.
+
+Usage::
+
+    python -m retail_forecast.order_search --model SARIMA
+    python -m retail_forecast.order_search --level store_family --workers 8
+"""
+import hashlib
+import json
+import os
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import rollups
+from retail_forecast.config import DATA_PATH, cache_dir_for
+
+LEVELS = ('total', 'store_family')
+SEARCH_MODELS = ('ARIMA', 'SARIMA')
+# Series with a shorter active span are left to the default orders
+MIN_HISTORY = 60
+
+
+def make_grid(model='SARIMA', max_p=3, max_q=3, d=(0, 1), max_P=1, max_Q=1, D=(0, 1), season=7):
+    """Bounds of the search space"""
+    if model == 'ARIMA':
+        max_P, max_Q, D, season = 0, 0, (0,), 0
+    return {'max_p': max_p, 'max_q': max_q, 'd': list(d),
+            'max_P': max_P, 'max_Q': max_Q, 'D': list(D), 'season': season}
+
+
+def in_grid(order, grid):
+    p, d, q, P, D, Q = order
+    return (0 <= p <= grid['max_p'] and 0 <= q <= grid['max_q'] and d in grid['d']
+            and 0 <= P <= grid['max_P'] and 0 <= Q <= grid['max_Q'] and D in grid['D'])
+
+
+def seed_orders(grid):
+    """Starting points of the stepwise search (as in auto.arima)"""
+    seeds = []
+    for d in grid['d']:
+        for D in grid['D']:
+            for order in ((2, d, 2, 1, D, 1), (0, d, 0, 0, D, 0), (1, d, 0, 1, D, 0), (0, d, 1, 0, D, 1)):
+                order = (min(order[0], grid['max_p']), d, min(order[2], grid['max_q']),
+                         min(order[3], grid['max_P']), D, min(order[5], grid['max_Q']))
+                if order not in seeds:
+                    seeds.append(order)
+    return seeds
+
+
+def neighbours(order, grid):
+    out = []
+    for i in range(6):
+        for step in (-1, 1):
+            candidate = list(order)
+            candidate[i] += step
+            candidate = tuple(candidate)
+            if in_grid(candidate, grid):
+                out.append(candidate)
+    return out
+
+
+def order_key(order):
+    p, d, q, P, D, Q = order
+    return f'{p},{d},{q},{P},{D},{Q}'
+
+
+def series_fingerprint(y):
+    """Content hash of a series, the cache key for its search results"""
+    y = np.ascontiguousarray(y, dtype=np.float64)
+    return hashlib.sha1(y.tobytes()).hexdigest()[:16]
+
+
+def warm_start(order, fitted):
+    """Params of the best already-fitted order nested in this one (one lag fewer)
+
+    Its parameters with the extra lag at 0 are a valid point of this
+    model's likelihood; dropping a lag from a larger model is not.
+    """
+    smaller = []
+    for i in (0, 2, 3, 5):
+        if order[i] > 0:
+            other = list(order)
+            other[i] -= 1
+            result = fitted.get(order_key(other))
+            if result and result.get('params') and np.isfinite(result['aic']):
+                smaller.append(result)
+    if not smaller:
+        return None
+    return min(smaller, key=lambda result: result['aic'])['params']
+
+
+def fit_order(y, order, season, start_params=None, maxiter=50):
+    """Fit one SARIMAX order; returns {'aic', 'params', 'iterations', 'seconds'}"""
+    from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+    p, d, q, P, D, Q = order
+    started = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        model = SARIMAX(y, order=(p, d, q), seasonal_order=(P, D, Q, season) if season else (0, 0, 0, 0))
+        start = None
+        if start_params is not None:
+            # New lags start at 0; sigma2 and shared lags come from the neighbour
+            start = np.array([start_params.get(name, 0.0) for name in model.param_names])
+        try:
+            fitted = model.fit(start_params=start, disp=False, maxiter=maxiter)
+            if start is not None and not np.isfinite(fitted.aic):
+                # A bad warm start should not knock the order out of the race
+                fitted = model.fit(disp=False, maxiter=maxiter)
+        except Exception as e:
+            return {'aic': float('inf'), 'params': None, 'iterations': 0,
+                    'seconds': time.perf_counter() - started, 'error': f'{type(e).__name__}: {e}'}
+    aic = float(fitted.aic) if np.isfinite(fitted.aic) else float('inf')
+    return {
+        'aic': aic,
+        'params': dict(zip(model.param_names, map(float, fitted.params))),
+        'iterations': int(fitted.mle_retvals.get('iterations', 0)) if fitted.mle_retvals else 0,
+        'seconds': time.perf_counter() - started,
+    }
+
+
+def _fit_task(y, order, season, start_params, maxiter):
+    return order, fit_order(y, order, season, start_params, maxiter)
+
+
+def search_orders(y, grid=None, beam=3, maxiter=50, pool=None, known=None, progress=None):
+    """Stepwise AIC search over grid; returns (best_order, fitted) where fitted maps order keys to results
+
+    known holds results from earlier runs (they are not refitted). With a
+    pool, the fits of each wave run in parallel.
+    """
+    grid = grid or make_grid()
+    y = np.asarray(y, dtype=np.float64)
+    # Stores that opened late have leading zeros; search on the active span
+    active = np.flatnonzero(y)
+    y = y[active[0]:] if len(active) else y
+    if len(active) == 0 or len(y) < MIN_HISTORY:
+        return None, {}
+    fitted = dict(known or {})
+    wave = [order for order in seed_orders(grid)]
+    best_aic = float('inf')
+
+    while wave:
+        todo = [order for order in wave if order_key(order) not in fitted]
+        tasks = [(y, order, grid['season'], warm_start(order, fitted), maxiter) for order in todo]
+        if pool is not None and len(tasks) > 1:
+            results = pool.map(_fit_task, *zip(*tasks))
+        else:
+            results = (_fit_task(*task) for task in tasks)
+        for order, result in results:
+            fitted[order_key(order)] = result
+        if progress is not None:
+            progress(len(fitted), min(result['aic'] for result in fitted.values()))
+
+        ranked = sorted((result['aic'], key) for key, result in fitted.items())
+        if not ranked or ranked[0][0] >= best_aic:
+            break
+        best_aic = ranked[0][0]
+        # Prune: only the beam best orders are expanded
+        wave = []
+        for _, key in ranked[:beam]:
+            for order in neighbours(tuple(int(v) for v in key.split(',')), grid):
+                if order_key(order) not in fitted and order not in wave:
+                    wave.append(order)
+
+    finite = {key: result for key, result in fitted.items() if np.isfinite(result['aic'])}
+    if not finite:
+        return None, fitted
+    best = min(finite, key=lambda key: finite[key]['aic'])
+    return tuple(int(v) for v in best.split(',')), fitted
+
+
+class OrderCache:
+    """JSON file of fitted candidates per (series fingerprint, season), tagged with their maxiter"""
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(cache_dir_for(), 'orders')
+
+    def path(self, fingerprint, season):
+        return os.path.join(self.root, f'{fingerprint}-s{season}.json')
+
+    def load(self, fingerprint, season):
+        path = self.path(fingerprint, season)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def save(self, fingerprint, season, entry):
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(fingerprint, season)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
+
+
+def reusable_fits(entry, maxiter):
+    """Fitted candidates of a cache entry made with the same maxiter, else {}"""
+    return entry.get('fitted', {}) if entry.get('maxiter') == maxiter else {}
+
+
+def cached_search(entry, grid, beam, maxiter):
+    """Best order of a cache entry searched with the same grid, beam and maxiter, else None"""
+    if entry.get('grid') == grid and entry.get('beam') == beam and entry.get('maxiter') == maxiter:
+        return entry['best']
+    return None
+
+
+def best_order(y, grid=None, beam=3, maxiter=50, pool=None, cache=None, force=False):
+    """Cached order search for one series; returns a summary dict
+
+    force ignores the cache entirely (no cached result, no cached fits).
+    """
+    grid = grid or make_grid()
+    cache = cache or OrderCache()
+    fingerprint = series_fingerprint(y)
+    entry = {} if force else cache.load(fingerprint, grid['season'])
+    best = cached_search(entry, grid, beam, maxiter)
+    if best is not None:
+        return best
+
+    started = time.perf_counter()
+    order, fitted = search_orders(y, grid, beam, maxiter, pool, known=reusable_fits(entry, maxiter))
+    best = {
+        'order': list(order[:3]) if order else None,
+        'seasonal_order': list(order[3:]) + [grid['season']] if order else None,
+        'aic': fitted[order_key(order)]['aic'] if order else None,
+        'candidates': len(fitted),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
+    cache.save(fingerprint, grid['season'],
+               {'grid': grid, 'beam': beam, 'maxiter': maxiter, 'best': best, 'fitted': fitted})
+    return best
+
+
+def cached_best(y, season, cache=None):
+    """Search result for y if one is cached, else None (never searches)"""
+    entry = (cache or OrderCache()).load(series_fingerprint(y), season)
+    return entry.get('best')
+
+
+def searched_params(name, y, data_path=DATA_PATH, cache_dir=None, season=7):
+    """ARIMA/SARIMA constructor params from a cached search of y with this SARIMA season, else {}"""
+    if name not in SEARCH_MODELS:
+        return {}
+    cache = OrderCache(os.path.join(cache_dir or cache_dir_for(data_path), 'orders'))
+    best = cached_best(y, season if name == 'SARIMA' else 0, cache)
+    if not best or best['order'] is None:
+        return {}
+    if name == 'ARIMA':
+        return {'order': tuple(best['order'])}
+    return {'order': tuple(best['order']), 'seasonal_order': tuple(best['seasonal_order'])}
+
+
+def holdout_params(name, y, split, data_path=DATA_PATH, cache_dir=None, season=7):
+    """searched_params for a fit on y[:split], never from a search that saw the days after split
+
+    When y itself was searched, y[:split] is searched the same way (same
+    grid, beam and maxiter; cached like any search).
+    """
+    if name not in SEARCH_MODELS:
+        return {}
+    cache = OrderCache(os.path.join(cache_dir or cache_dir_for(data_path), 'orders'))
+    entry = cache.load(series_fingerprint(y), season if name == 'SARIMA' else 0)
+    if entry.get('best'):
+        best_order(y[:split], entry['grid'], entry['beam'], entry['maxiter'], cache=cache)
+    return searched_params(name, y[:split], data_path, cache_dir, season)
+
+
+def _search_chunk(chunk_id, values, grid, beam, maxiter, cache_root, force):
+    cache = OrderCache(cache_root)
+    return chunk_id, [best_order(y, grid, beam, maxiter, None, cache, force) for y in values]
+
+
+def search_many(values, grid=None, beam=3, maxiter=50, workers=None, chunk_size=8, cache=None, force=False):
+    """Order search for every row of values, one series per worker at a time
+
+    Series already searched with the same grid, beam and maxiter are
+    answered from the cache without touching the pool.
+    """
+    grid = grid or make_grid()
+    cache = cache or OrderCache()
+    results = [None] * len(values)
+    todo = []
+    for i, y in enumerate(values):
+        entry = {} if force else cache.load(series_fingerprint(y), grid['season'])
+        results[i] = cached_search(entry, grid, beam, maxiter)
+        if results[i] is None:
+            todo.append(i)
+    print(f"   {len(values) - len(todo):,} series cached, {len(todo):,} to search", flush=True)
+
+    chunks = [todo[lo:lo + chunk_size] for lo in range(0, len(todo), chunk_size)]
+    started = time.perf_counter()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_search_chunk, i, values[rows], grid, beam, maxiter, cache.root, force)
+            for i, rows in enumerate(chunks)
+        ]
+        for future in as_completed(futures):
+            chunk_id, chunk_results = future.result()
+            for i, result in zip(chunks[chunk_id], chunk_results):
+                results[i] = result
+            done += len(chunk_results)
+            elapsed = time.perf_counter() - started
+            print(f"   {done:,}/{len(todo):,} series searched ({done / elapsed:,.2f} series/s)", flush=True)
+    return results
+
+
+def load_series(level='total', data_path=DATA_PATH, cache_dir=None):
+    """(values, keys) for a hierarchy level; values has one row per series"""
+    if level == 'total':
+        daily_df = rollups.load_daily_series(data_path, cache_dir)
+        return daily_df['sales'].to_numpy()[None, :], pd.DataFrame({'series': ['total']})
+    if level == 'store_family':
+        from retail_forecast.hierarchy import load_bottom_series
+
+        values, keys, _ = load_bottom_series(data_path=data_path, cache_dir=cache_dir)
+        return values, keys
+    raise ValueError(f"Unknown level '{level}', expected one of {LEVELS}")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Search SARIMA/ARIMA orders by AIC')
+    parser.add_argument('--model', choices=SEARCH_MODELS, default='SARIMA')
+    parser.add_argument('--level', choices=LEVELS, default='total')
+    parser.add_argument('--max-p', type=int, default=3)
+    parser.add_argument('--max-q', type=int, default=3)
+    parser.add_argument('--d', type=int, nargs='+', default=[0, 1])
+    parser.add_argument('--max-P', type=int, default=1)
+    parser.add_argument('--max-Q', type=int, default=1)
+    parser.add_argument('--D', type=int, nargs='+', default=[0, 1])
+    parser.add_argument('--season', type=int, default=7)
+    parser.add_argument('--beam', type=int, default=3, help='orders expanded per wave')
+    parser.add_argument('--maxiter', type=int, default=50)
+    parser.add_argument('--limit', type=int, default=None, help='only search the first N series')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--force', action='store_true', help='ignore cached searches')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    grid = make_grid(args.model, args.max_p, args.max_q, args.d, args.max_P, args.max_Q, args.D, args.season)
+    cache = OrderCache(os.path.join(args.cache_dir or cache_dir_for(args.data_path), 'orders'))
+    values, keys = load_series(args.level, args.data_path, args.cache_dir)
+    if args.limit:
+        values, keys = values[:args.limit], keys.iloc[:args.limit]
+
+    started = time.time()
+    if len(values) == 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = [best_order(values[0], grid, args.beam, args.maxiter, pool, cache, args.force)]
+    else:
+        results = search_many(values, grid, args.beam, args.maxiter, args.workers, cache=cache, force=args.force)
+
+    table = keys.reset_index(drop=True).join(pd.DataFrame(results))
+    print(f"\n✅ Order search for {len(values):,} series in {time.time() - started:.1f}s")
+    print(table.head(20).to_string(index=False))
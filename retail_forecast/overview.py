@@ -0,0 +1,47 @@
+"""Charts of the dashboard's Overview page.
+
+They live outside ``dashboard.py`` so the offline snapshot build (see
+``snapshot``) can render the Overview of the full data ahead of time: a
+new dashboard replica then serves its first page from those PNGs without
+importing matplotlib.
+"""
+import pandas as pd
+
+from retail_forecast.render_cache import minmax_downsample, pyplot
+
+
+def daily_trend(daily_sales):
+    """Daily sales line, thinned to the min/max of each bucket so spikes survive"""
+    plt = pyplot()
+    shown = daily_sales.iloc[minmax_downsample(daily_sales['date'], daily_sales['sales'])]
+    fig, ax = plt.subplots(figsize=(14, 6))
+    ax.plot(shown['date'], shown['sales'], linewidth=1, alpha=0.7, color='steelblue')
+    ax.set_title('Daily Sales Over Time', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Total Sales ($)', fontsize=12)
+    ax.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    return fig
+
+
+def monthly_trend(daily_sales):
+    """Monthly sales totals"""
+    plt = pyplot()
+    monthly_sales = daily_sales.set_index('date').resample(pd.offsets.MonthEnd())['sales'].sum().reset_index()
+    fig, ax = plt.subplots(figsize=(14, 6))
+    ax.plot(monthly_sales['date'], monthly_sales['sales'], marker='o', linewidth=2, markersize=6, color='coral')
+    ax.set_title('Monthly Sales Trend', fontsize=16, fontweight='bold')
+    ax.set_xlabel('Date', fontsize=12)
+    ax.set_ylabel('Monthly Sales ($)', fontsize=12)
+    ax.grid(True, alpha=0.3)
+    plt.xticks(rotation=45)
+    plt.tight_layout()
+    return fig
+
+
+# Chart key name -> draw(daily_sales), in page order
+CHARTS = {
+    'daily_trend': daily_trend,
+    'monthly_trend': monthly_trend,
+}
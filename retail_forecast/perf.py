@@ -0,0 +1,328 @@
+"""Lightweight timing of hot paths: wall time, RSS and cache hits.
+
+Wrap a block or a function to record a span::
+
+    with perf.span('groupby'):
+        ...
+
+    @perf.timed('load_data', cached=True)
+    @st.cache_data
+    def load_data(...):
+        perf.miss()        # only runs when the cache missed
+        ...
+
+Each span records its wall time, the change in resident memory and in peak
+RSS, and, for ``cached`` spans, whether the call was a hit (no ``miss()``
+inside it) or a miss. Spans of one Streamlit rerun are grouped with
+``start_rerun``/``finish_rerun``. The process-wide ``RECORDER`` keeps the
+last reruns and a rolling window of samples per span name, for the
+dashboard's Performance page.
+
+Exports:
+
+- ``to_prometheus()``: Prometheus text format, served on
+  ``RETAIL_PERF_PORT`` by ``serve_metrics`` when it is set
+- every finished span appended as one JSON line to ``RETAIL_PERF_JSONL``
+"""
+import json
+import os
+import resource
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from functools import wraps
+
+import numpy as np
+
+from retail_forecast.config import PERF_JSONL, PERF_PORT
+
+WINDOW = 500
+RERUNS = 50
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss():
+    """Resident set size in bytes (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return peak_rss()
+
+
+def peak_rss():
+    """Peak resident set size of the process in bytes"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Span:
+    """One timed block; fields are filled in when it closes"""
+    __slots__ = ('name', 'labels', 'cached', 'missed', 'started', 'seconds', 'rss_delta',
+                 'peak_rss_delta', 'rerun', '_rss', '_peak', '_clock')
+
+    def __init__(self, name, labels, cached):
+        self.name = name
+        self.labels = labels
+        self.cached = cached
+        self.missed = False
+        self.seconds = None
+        self.rerun = None
+
+    @property
+    def cache(self):
+        """'hit', 'miss' or None for spans that are not cached calls"""
+        if not self.cached:
+            return None
+        return 'miss' if self.missed else 'hit'
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'labels': self.labels,
+            'started': round(self.started, 6),
+            'seconds': round(self.seconds, 6),
+            'rss_delta_mb': round(self.rss_delta / 2 ** 20, 3),
+            'peak_rss_delta_mb': round(self.peak_rss_delta / 2 ** 20, 3),
+            'cache': self.cache,
+            'rerun': self.rerun,
+        }
+
+
+class Recorder:
+    """Thread-safe store of recent spans, reruns and per-name samples"""
+
+    def __init__(self, window=WINDOW, reruns=RERUNS, jsonl_path=PERF_JSONL):
+        self.window = window
+        self.jsonl_path = jsonl_path
+        self.reruns = deque(maxlen=reruns)
+        self.samples = {}
+        self.hits = {}
+        self.misses = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_rerun = 0
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def begin(self, name, cached=False, **labels):
+        span = Span(name, labels, cached)
+        span.rerun = getattr(self._local, 'rerun', None)
+        span._rss, span._peak = current_rss(), peak_rss()
+        self._stack().append(span)
+        span.started = time.time()
+        span._clock = time.perf_counter()
+        return span
+
+    def end(self, span):
+        span.seconds = time.perf_counter() - span._clock
+        span.rss_delta = current_rss() - span._rss
+        span.peak_rss_delta = peak_rss() - span._peak
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+        self._record(span)
+        return span
+
+    def _record(self, span):
+        with self._lock:
+            samples = self.samples.get(span.name)
+            if samples is None:
+                samples = self.samples[span.name] = deque(maxlen=self.window)
+            samples.append((span.seconds, span.rss_delta))
+            if span.cached:
+                counts = self.misses if span.missed else self.hits
+                counts[span.name] = counts.get(span.name, 0) + 1
+            rerun = getattr(self._local, 'current', None)
+            if rerun is not None:
+                rerun['spans'].append(span.to_dict())
+        if self.jsonl_path:
+            line = json.dumps(span.to_dict())
+            with self._lock, open(self.jsonl_path, 'a') as f:
+                f.write(line + '\n')
+
+    def miss(self):
+        """Mark the innermost open span on this thread as a cache miss"""
+        stack = self._stack()
+        if stack:
+            stack[-1].missed = True
+
+    def start_rerun(self, page=None):
+        """Group the following spans of this thread (one Streamlit script run)"""
+        self.finish_rerun()
+        with self._lock:
+            self._next_rerun += 1
+            rerun_id = self._next_rerun
+        self._local.rerun = rerun_id
+        self._local.current = {'id': rerun_id, 'page': page, 'started': time.time(),
+                               'clock': time.perf_counter(), 'spans': []}
+        return rerun_id
+
+    def finish_rerun(self):
+        rerun = getattr(self._local, 'current', None)
+        if rerun is None:
+            return None
+        rerun['seconds'] = time.perf_counter() - rerun.pop('clock')
+        self._local.current = None
+        self._local.rerun = None
+        with self._lock:
+            self.reruns.append(rerun)
+        return rerun
+
+    def summary(self):
+        """Rolling count/mean/percentiles, RSS delta and hit rate per span name"""
+        with self._lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+            hits, misses = dict(self.hits), dict(self.misses)
+        rows = []
+        for name, values in samples.items():
+            seconds = np.array([s for s, _ in values])
+            rss = np.array([r for _, r in values])
+            p50, p90, p99 = np.percentile(seconds, [50, 90, 99])
+            calls = hits.get(name, 0) + misses.get(name, 0)
+            rows.append({
+                'name': name,
+                'count': len(seconds),
+                'mean_ms': float(seconds.mean() * 1000),
+                'p50_ms': float(p50 * 1000),
+                'p90_ms': float(p90 * 1000),
+                'p99_ms': float(p99 * 1000),
+                'max_ms': float(seconds.max() * 1000),
+                'mean_rss_delta_mb': float(rss.mean() / 2 ** 20),
+                'hit_rate': hits.get(name, 0) / calls if calls else None,
+            })
+        return sorted(rows, key=lambda row: -row['p90_ms'])
+
+    def recent_reruns(self):
+        with self._lock:
+            return list(self.reruns)
+
+    def clear(self):
+        with self._lock:
+            self.reruns.clear()
+            self.samples.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def to_prometheus(self, prefix='retail'):
+        """Prometheus text exposition of the rolling summaries and cache counters"""
+        lines = [
+            f'# HELP {prefix}_span_seconds Wall time of instrumented spans (rolling window)',
+            f'# TYPE {prefix}_span_seconds summary',
+        ]
+        summary = self.summary()
+        for row in summary:
+            name = _escape(row['name'])
+            for column, quantile in (('p50_ms', 0.5), ('p90_ms', 0.9), ('p99_ms', 0.99)):
+                lines.append(f'{prefix}_span_seconds{{name="{name}",quantile="{quantile}"}} '
+                             f'{row[column] / 1000:.6f}')
+            lines.append(f'{prefix}_span_seconds_count{{name="{name}"}} {row["count"]}')
+            lines.append(f'{prefix}_span_seconds_sum{{name="{name}"}} {row["mean_ms"] * row["count"] / 1000:.6f}')
+        lines += [
+            f'# HELP {prefix}_cache_requests_total Cached calls by result',
+            f'# TYPE {prefix}_cache_requests_total counter',
+        ]
+        with self._lock:
+            counters = [('hit', dict(self.hits)), ('miss', dict(self.misses))]
+        for result, counts in counters:
+            for name, count in sorted(counts.items()):
+                lines.append(f'{prefix}_cache_requests_total{{name="{_escape(name)}",result="{result}"}} {count}')
+        lines += [
+            f'# HELP {prefix}_resident_memory_bytes Resident set size of the process',
+            f'# TYPE {prefix}_resident_memory_bytes gauge',
+            f'{prefix}_resident_memory_bytes {current_rss()}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+RECORDER = Recorder()
+
+
+@contextmanager
+def span(name, cached=False, recorder=None, **labels):
+    """Time the enclosed block"""
+    recorder = recorder or RECORDER
+    current = recorder.begin(name, cached, **labels)
+    try:
+        yield current
+    finally:
+        recorder.end(current)
+
+
+def timed(name=None, cached=False, recorder=None):
+    """Decorator form of span(); put it above st.cache_* to count hits and misses"""
+    def decorate(func):
+        span_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name, cached, recorder):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def begin(name, cached=False, **labels):
+    """Open a span that is closed with end(); for blocks too long to indent"""
+    return RECORDER.begin(name, cached, **labels)
+
+
+def end(open_span):
+    return RECORDER.end(open_span)
+
+
+def miss(recorder=None):
+    (recorder or RECORDER).miss()
+
+
+def start_rerun(page=None, recorder=None):
+    return (recorder or RECORDER).start_rerun(page)
+
+
+def finish_rerun(recorder=None):
+    return (recorder or RECORDER).finish_rerun()
+
+
+_server = None
+
+
+def serve_metrics(port=PERF_PORT, recorder=None):
+    """Serve to_prometheus() on http://127.0.0.1:<port>/metrics from a daemon thread (once)"""
+    global _server
+    if _server is not None or not port:
+        return _server
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    recorder = recorder or RECORDER
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') != '/metrics':
+                self.send_error(404)
+                return
+            body = recorder.to_prometheus().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    try:
+        _server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+    except OSError:
+        # Another process (e.g. a second Streamlit worker) already serves the port
+        return None
+    threading.Thread(target=_server.serve_forever, daemon=True, name='perf-metrics').start()
+    return _server
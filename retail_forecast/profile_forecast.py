@@ -0,0 +1,86 @@
+"""Vectorized weekday x month seasonal-profile forecaster.
+
+Weekday and month factors are learned once from history and kept as arrays,
+so forecasting any horizon for any number of series is a single broadcast:
+
+    forecast[s, h] = level[s] * (1 + drift[s] * h) * weekday[s, dow[h]] * month[s, month[h]]
+
+``values`` may be a single series (1-D) or a (series x day) matrix such as
+the one returned by ``hierarchy.load_bottom_series``.
+"""
+import numpy as np
+import pandas as pd
+
+
+def _one_hot(codes, n):
+    return np.eye(n)[codes]
+
+
+def _group_means(values, codes, n):
+    """Per-series mean of values grouped by codes; values is (series x day)"""
+    onehot = _one_hot(codes, n)
+    counts = onehot.sum(axis=0)
+    sums = values @ onehot
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+
+def _normalize(factors):
+    """Scale factors so they average to 1 per series (all-zero rows become 1)"""
+    mean = factors.mean(axis=1, keepdims=True)
+    return np.divide(factors, mean, out=np.ones_like(factors), where=mean > 0)
+
+
+class SeasonalProfileForecaster:
+    """Level + linear drift scaled by learned weekday and month factors"""
+
+    def __init__(self, level_window=30, trend_window=365):
+        self.level_window = level_window
+        self.trend_window = trend_window
+
+    def fit(self, values, dates):
+        values = np.atleast_2d(np.asarray(values, dtype=np.float64))
+        dates = pd.DatetimeIndex(dates)
+        if values.shape[1] != len(dates):
+            raise ValueError("values and dates must have the same number of days")
+        dow = dates.dayofweek.to_numpy()
+        month = dates.month.to_numpy() - 1
+        year_codes, years = pd.factorize(dates.year)
+
+        # Divide out each year's mean so growth across years doesn't leak
+        # into the month factors
+        year_mean = _group_means(values, year_codes, len(years))[:, year_codes]
+        ratio = np.divide(values, year_mean, out=np.zeros_like(values), where=year_mean > 0)
+
+        self.weekday_factors = _normalize(_group_means(ratio, dow, 7))
+        weekday = self.weekday_factors[:, dow]
+        deweek = np.divide(ratio, weekday, out=np.zeros_like(ratio), where=weekday > 0)
+        self.month_factors = _normalize(_group_means(deweek, month, 12))
+
+        seasonal = self.weekday_factors[:, dow] * self.month_factors[:, month]
+        deseasonalized = np.divide(values, seasonal, out=np.zeros_like(values), where=seasonal > 0)
+
+        self.level = deseasonalized[:, -self.level_window:].mean(axis=1)
+        lag = min(self.trend_window, max(values.shape[1] - self.level_window, 0))
+        if lag > 0:
+            earlier = deseasonalized[:, -self.level_window - lag:-lag].mean(axis=1)
+            growth = np.divide(self.level - earlier, earlier, out=np.zeros_like(earlier), where=earlier > 0)
+            self.drift = growth / lag
+        else:
+            self.drift = np.zeros_like(self.level)
+
+        self.last_date = dates[-1]
+        self._in_sample = year_mean * seasonal
+        return self
+
+    def predict(self, horizon):
+        """Forecast the next horizon days; returns (dates, forecasts[series, horizon])"""
+        future_dates = pd.date_range(self.last_date + pd.Timedelta(days=1), periods=horizon, freq='D')
+        steps = np.arange(1, horizon + 1)
+        base = self.level[:, None] * (1 + self.drift[:, None] * steps)
+        seasonal = (self.weekday_factors[:, future_dates.dayofweek.to_numpy()]
+                    * self.month_factors[:, future_dates.month.to_numpy() - 1])
+        return future_dates, np.maximum(base * seasonal, 0)
+
+    def fitted_values(self):
+        """In-sample fit (yearly mean x seasonal factors), for residual checks"""
+        return self._in_sample
@@ -0,0 +1,111 @@
+"""On-disk registry of fitted models, their hyperparameters and backtest metrics.
+
+Entries live under ``<cache>/models/<fingerprint>/<model>/<start>_<end>/``
+with a pickled model and a ``meta.json``. The fingerprint identifies the
+data version (see ``rollups.data_version``) and start/end the training
+window, so a page view can load a stored model instead of refitting it.
+
+Fit and register the notebook's models with::
+
+    python -m retail_forecast.train
+"""
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import time
+
+import pandas as pd
+
+from retail_forecast.config import cache_dir_for
+
+
+def _slug(text):
+    return ''.join(ch if ch.isalnum() else '-' for ch in text.lower()).strip('-')
+
+
+def fingerprint_id(fingerprint):
+    """Short, filesystem-safe id for a data fingerprint"""
+    return hashlib.sha1(fingerprint.encode()).hexdigest()[:16]
+
+
+class ModelRegistry:
+    """Store and look up fitted models by data fingerprint and training window"""
+
+    def __init__(self, root=None):
+        self.root = root or os.path.join(cache_dir_for(), 'models')
+
+    def entry_path(self, name, fingerprint, train_start, train_end):
+        window = f"{pd.Timestamp(train_start):%Y%m%d}_{pd.Timestamp(train_end):%Y%m%d}"
+        return os.path.join(self.root, fingerprint_id(fingerprint), _slug(name), window)
+
+    def save(self, name, model, fingerprint, train_start, train_end, metrics=None, **extra):
+        """Pickle a fitted model with its metadata; returns the entry path"""
+        path = self.entry_path(name, fingerprint, train_start, train_end)
+        tmp = f'{path}.tmp-{os.getpid()}'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        with open(os.path.join(tmp, 'model.pkl'), 'wb') as f:
+            pickle.dump(model, f, protocol=pickle.HIGHEST_PROTOCOL)
+        meta = {
+            'name': name,
+            'fingerprint': fingerprint,
+            'train_start': pd.Timestamp(train_start).strftime('%Y-%m-%d'),
+            'train_end': pd.Timestamp(train_end).strftime('%Y-%m-%d'),
+            'params': getattr(model, 'params', {}),
+            'metrics': metrics or {},
+            'saved_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **extra,
+        }
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(meta, f, indent=2, default=str)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        return path
+
+    def entries(self, fingerprint=None):
+        """Metadata of every entry (optionally for one fingerprint) as a frame"""
+        rows = []
+        roots = [fingerprint_id(fingerprint)] if fingerprint else (
+            os.listdir(self.root) if os.path.isdir(self.root) else []
+        )
+        for fp_dir in roots:
+            base = os.path.join(self.root, fp_dir)
+            if not os.path.isdir(base):
+                continue
+            for model_dir in os.listdir(base):
+                for window in os.listdir(os.path.join(base, model_dir)):
+                    path = os.path.join(base, model_dir, window)
+                    meta_file = os.path.join(path, 'meta.json')
+                    if '.tmp-' in window or not os.path.exists(meta_file):
+                        continue
+                    with open(meta_file) as f:
+                        meta = json.load(f)
+                    meta['path'] = path
+                    rows.append(meta)
+        if not rows:
+            return pd.DataFrame(columns=['name', 'fingerprint', 'train_start', 'train_end',
+                                         'params', 'metrics', 'saved_at', 'path'])
+        return pd.DataFrame(rows)
+
+    def latest(self, fingerprint=None):
+        """Newest entry per model name (for one fingerprint, else across all)"""
+        entries = self.entries(fingerprint)
+        if entries.empty:
+            return entries
+        entries = entries.sort_values(['train_end', 'saved_at'])
+        return entries.groupby('name').tail(1).set_index('name')
+
+    def metrics_table(self, fingerprint=None):
+        """MAE/RMSE/MAPE of the newest entry per model, best first"""
+        latest = self.latest(fingerprint)
+        if latest.empty:
+            return pd.DataFrame(columns=['MAE', 'RMSE', 'MAPE'])
+        table = pd.DataFrame(latest['metrics'].tolist(), index=latest.index)
+        return table[['MAE', 'RMSE', 'MAPE']].sort_values('MAE')
+
+    def load(self, path):
+        """Unpickle the model stored at an entry path"""
+        with open(os.path.join(path, 'model.pkl'), 'rb') as f:
+            return pickle.load(f)
@@ -0,0 +1,130 @@
+"""LRU cache of rendered chart PNGs for the dashboard.
+
+Streamlit reruns the whole script on every interaction, which used to
+redraw and re-encode every matplotlib figure. Charts are now rendered once
+per key, e.g. ``('forecast', data_version, model, forecast_days)``, and the
+PNG bytes are served from memory until the key changes. The cache evicts
+least recently used charts once it holds more than ``max_bytes``.
+
+Long daily series are thinned with ``minmax_downsample`` before plotting:
+each bucket keeps its lowest and highest point, so spikes and dips survive
+while a few hundred points are drawn instead of every day.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+# st.image shrinks wider images to this width, decoding and re-encoding the
+# PNG on every call, so charts are rendered no wider than it
+MAX_WIDTH = 2 * 730
+
+
+def pyplot():
+    """matplotlib.pyplot on the non-interactive backend, imported on first use
+
+    Importing matplotlib takes most of a second, so charts served from the
+    cache never pay for it.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def figure_to_png(fig, dpi=150, max_width=MAX_WIDTH):
+    """Encode a matplotlib figure as PNG bytes, at most max_width pixels wide"""
+    if max_width:
+        dpi = min(dpi, max_width / fig.get_figwidth())
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=dpi, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def minmax_downsample(x, y, buckets=400):
+    """Indices of the min and max point of each of `buckets` equal slices, in order
+
+    Returns all indices when the series is already short enough.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= 2 * buckets:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    # Pad the ragged buckets to a rectangle so argmin/argmax run once
+    width = int(np.diff(edges).max())
+    idx = edges[:-1, None] + np.arange(width)[None, :]
+    valid = idx < edges[1:, None]
+    idx = np.minimum(idx, n - 1)
+    values = y[idx]
+    lows = idx[np.arange(buckets), np.where(valid, values, np.inf).argmin(axis=1)]
+    highs = idx[np.arange(buckets), np.where(valid, values, -np.inf).argmax(axis=1)]
+    keep = np.union1d(np.concatenate([lows, highs]), [0, n - 1])
+    return keep
+
+
+class RenderCache:
+    """Byte-limited LRU of rendered charts, safe to share across sessions"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            png = self._items.get(key)
+            if png is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._bytes -= len(self._items.pop(key))
+            self._items[key] = png
+            self._bytes += len(png)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def render(self, key, draw, dpi=150):
+        """PNG for key, calling draw() -> Figure only on a miss"""
+        png = self.get(key)
+        if png is not None:
+            return png
+        fig = draw()
+        try:
+            png = figure_to_png(fig, dpi)
+        finally:
+            pyplot().close(fig)
+        self.put(key, png)
+        return png
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'items': len(self._items),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
@@ -0,0 +1,203 @@
+"""Pre-aggregated daily sales cubes persisted next to the ingest cache.
+
+Pages only ever need daily totals, so the row-level frame is aggregated once
+into four cubes and the dashboard/notebook read those instead:
+
+- ``daily``: date -> sales, onpromotion, is_holiday (a national day off,
+  see ``holiday_calendar``)
+- ``store``: (date, store_nbr) -> sales, onpromotion
+- ``family``: (date, family) -> sales, onpromotion
+- ``store_family``: (date, store_nbr, family) -> sales, onpromotion
+
+Cubes use compact dtypes (category family, int16 store, float32 sales,
+int32 promotions) and are partitioned by year like the ingest cache. The
+manifest keeps a version stamp per year partition so callers can key their
+caches on only the years they read (see ``data_version``). It also records
+``ROLLUP_FORMAT``; cubes of an older format are rebuilt, which gives every
+partition a new stamp.
+"""
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from retail_forecast import holiday_calendar, ingest
+from retail_forecast.config import DATA_PATH
+
+CUBES = {
+    'daily': ['date'],
+    'store': ['date', 'store_nbr'],
+    'family': ['date', 'family'],
+    'store_family': ['date', 'store_nbr', 'family'],
+}
+
+ROLLUP_DIR = 'rollups'
+# Bump when the cubes' contents change meaning without the CSVs changing
+# (2: the daily is_holiday flag is a national day off)
+ROLLUP_FORMAT = 2
+
+
+def rollup_path(data_path=DATA_PATH, cache_dir=None):
+    return os.path.join(ingest.ensure_cache(data_path, cache_dir), ROLLUP_DIR)
+
+
+def read_manifest(path):
+    with open(os.path.join(path, 'manifest.json')) as f:
+        return json.load(f)
+
+
+def write_manifest(path, manifest):
+    with open(os.path.join(path, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def national_days_off(calendar, dates):
+    """Whether each date is a national day off in a holiday_calendar.EventCalendar"""
+    return holiday_calendar.flag_columns(calendar.national(dates))['is_holiday']
+
+
+def compact(cube_df):
+    """Apply the rollup dtypes in place and return the frame"""
+    cube_df['sales'] = cube_df['sales'].astype('float32')
+    cube_df['onpromotion'] = cube_df['onpromotion'].astype('int32')
+    if 'store_nbr' in cube_df:
+        cube_df['store_nbr'] = cube_df['store_nbr'].astype('int16')
+    if 'family' in cube_df:
+        cube_df['family'] = cube_df['family'].astype('category')
+    return cube_df
+
+
+def aggregate(train_df, calendar):
+    """Aggregate row-level sales into every cube; calendar flags the daily cube's days off"""
+    cubes = {}
+    for name, keys in CUBES.items():
+        # Sum in float64, store as float32
+        cube_df = (train_df.groupby(keys, observed=True)[['sales', 'onpromotion']]
+                   .sum()
+                   .reset_index())
+        cubes[name] = compact(cube_df)
+    cubes['daily']['is_holiday'] = national_days_off(calendar, cubes['daily']['date'])
+    return cubes
+
+
+def _write_cube(cube_df, path):
+    cube_df = cube_df.assign(year=cube_df['date'].dt.year.astype('int16'))
+    cube_df.to_parquet(path, partition_cols=['year'], index=False)
+
+
+def build_rollups(data_path=DATA_PATH, cache_dir=None, force=False):
+    """Build every cube from the ingest cache and return the rollup folder"""
+    base = ingest.ensure_cache(data_path, cache_dir)
+    target = os.path.join(base, ROLLUP_DIR)
+    if not force and os.path.exists(os.path.join(target, 'manifest.json')):
+        if read_manifest(target).get('format') == ROLLUP_FORMAT:
+            return target
+
+    started = time.time()
+    calendar = holiday_calendar.load_calendar(data_path, cache_dir)
+    tmp = f'{target}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    # One year partition at a time keeps peak memory to a year of rows
+    rows = dict.fromkeys(CUBES, 0)
+    years = ingest.read_manifest(base)['years']
+    for year in years:
+        train_df = ingest.load_train(
+            columns=['date', 'store_nbr', 'family', 'sales', 'onpromotion'],
+            start=f'{year}-01-01', end=f'{year}-12-31', data_path=data_path, cache_dir=cache_dir
+        )
+        cubes = aggregate(train_df, calendar)
+        del train_df
+        for name, cube_df in cubes.items():
+            _write_cube(cube_df, os.path.join(tmp, name))
+            rows[name] += len(cube_df)
+    stamp = str(time.time_ns())
+    write_manifest(tmp, {
+        'format': ROLLUP_FORMAT,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'build_seconds': round(time.time() - started, 2),
+        'rows': rows,
+        'versions': {str(year): stamp for year in years},
+    })
+
+    shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    return target
+
+
+def partition_versions(data_path=DATA_PATH, cache_dir=None):
+    """Map of year -> version stamp of the rollup partitions"""
+    versions = read_manifest(build_rollups(data_path, cache_dir))['versions']
+    return {int(year): stamp for year, stamp in versions.items()}
+
+
+def data_version(years=None, data_path=DATA_PATH, cache_dir=None):
+    """Cache key covering the given years (all years when None)
+
+    The key only changes when one of those year partitions is rewritten, so
+    views over old dates survive an append of new days.
+    """
+    versions = partition_versions(data_path, cache_dir)
+    if years is None:
+        years = sorted(versions)
+    fingerprint = ingest.source_fingerprint(data_path)
+    return fingerprint + ':' + ','.join(f'{year}@{versions.get(year, "-")}' for year in years)
+
+
+def load_rollup(cube, columns=None, start=None, end=None, data_path=DATA_PATH, cache_dir=None):
+    """Load one cube, optionally restricted to columns and a date range"""
+    if cube not in CUBES:
+        raise ValueError(f"Unknown rollup '{cube}', expected one of {sorted(CUBES)}")
+    path = os.path.join(build_rollups(data_path, cache_dir), cube)
+    filters = []
+    if start is not None:
+        start = pd.Timestamp(start)
+        filters += [('year', '>=', start.year), ('date', '>=', start)]
+    if end is not None:
+        end = pd.Timestamp(end)
+        filters += [('year', '<=', end.year), ('date', '<=', end)]
+    cube_df = pd.read_parquet(
+        path,
+        columns=list(columns) if columns is not None else None,
+        filters=filters or None
+    )
+    cube_df = cube_df.drop(columns='year', errors='ignore')
+    keys = [key for key in CUBES[cube] if key in cube_df]
+    return cube_df.sort_values(keys).reset_index(drop=True)
+
+
+def load_daily_series(data_path=DATA_PATH, cache_dir=None):
+    """Daily totals on a complete date range, gaps filled like the notebook
+
+    Missing days (e.g. stores closed on Dec 25) are interpolated for sales
+    and treated as no promotion / no holiday.
+    """
+    daily_df = load_rollup('daily', data_path=data_path, cache_dir=cache_dir).set_index('date')
+    dates = pd.date_range(daily_df.index.min(), daily_df.index.max(), freq='D')
+    daily_df = daily_df.reindex(dates)
+    daily_df['sales'] = daily_df['sales'].astype('float64').interpolate(method='time').ffill().bfill()
+    daily_df['onpromotion'] = daily_df['onpromotion'].fillna(0).astype('int32')
+    daily_df['is_holiday'] = daily_df['is_holiday'].fillna(False).astype(bool)
+    return daily_df.rename_axis('date').reset_index()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the daily/store/family rollup cubes')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--force', action='store_true', help='rebuild even if the rollups are current')
+    args = parser.parse_args()
+
+    path = build_rollups(args.data_path, args.cache_dir, force=args.force)
+    manifest = read_manifest(path)
+    print(f"✅ Rollups ready: {path}")
+    for name, rows in manifest['rows'].items():
+        print(f"   {name}: {rows:,} rows")
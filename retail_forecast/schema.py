@@ -0,0 +1,190 @@
+"""Typed, memory-compact row-level frame (train rows + store attributes + holiday flag).
+
+The original ``load_data()`` merged stores and holidays onto every row and
+kept ``family``/``city``/``state``/``type`` as object strings, the holiday
+flag as object, and ids, stores and promotions as int64. ``load_merged``
+builds the same frame at load time with:
+
+- categorical ``family``, ``city``, ``state``, ``type`` (sorted categories)
+- integers downcast to the smallest type that holds them, ``sales`` as float32
+- bool ``is_holiday``, ``is_work_day`` and ``is_event`` flags of each row's
+  store: national days plus those of its state and city, looked up in the
+  ``holiday_calendar`` matrix by day offset instead of merged
+- no ``id`` column by default (rows are identified by the index)
+- a sorted (date, store_nbr, family) MultiIndex
+
+Store attributes are gathered by store position instead of a merge, so no
+intermediate row-sized frames are created. ``sales`` is float32 for storage;
+upcast before summing many rows (the rollup cubes already do).
+
+Compare the footprint with the original frame::
+
+    python -m retail_forecast.schema
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import holiday_calendar, ingest
+from retail_forecast.config import DATA_PATH
+
+# Column -> kind; kinds are applied by apply_schema
+SCHEMA = {
+    'id': 'integer',
+    'date': 'datetime',
+    'store_nbr': 'integer',
+    'family': 'category',
+    'sales': 'float32',
+    'onpromotion': 'integer',
+    'city': 'category',
+    'state': 'category',
+    'type': 'category',
+    'cluster': 'integer',
+    'is_holiday': 'bool',
+    'is_work_day': 'bool',
+    'is_event': 'bool',
+}
+
+INDEX = ['date', 'store_nbr', 'family']
+STORE_COLUMNS = ['city', 'state', 'type', 'cluster']
+HOLIDAY_COLUMNS = ['is_holiday', 'is_work_day', 'is_event']
+
+
+def _categorical(values):
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        categories = values.cat.categories
+        if categories.is_monotonic_increasing:
+            return values.cat.remove_unused_categories()
+        return values.cat.reorder_categories(categories.sort_values()).cat.remove_unused_categories()
+    return values.astype(pd.CategoricalDtype(pd.Index(values.dropna().unique()).sort_values()))
+
+
+def apply_schema(df, schema=SCHEMA):
+    """Cast the frame's columns by kind; columns not in schema are left alone"""
+    out = {}
+    for column in df.columns:
+        kind = schema.get(column)
+        values = df[column]
+        if kind == 'category':
+            values = _categorical(values)
+        elif kind == 'integer':
+            values = pd.to_numeric(values, downcast='integer')
+        elif kind == 'float32':
+            values = values.astype('float32')
+        elif kind == 'bool':
+            values = values.fillna(False).astype(bool)
+        elif kind == 'datetime':
+            values = pd.to_datetime(values)
+        out[column] = values
+    return pd.DataFrame(out, index=df.index)
+
+
+def _take_store_column(stores_df, positions, column):
+    """Store attribute of every row from its store position (-1 for unknown stores)"""
+    values = stores_df[column]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()[positions]
+        codes[positions < 0] = -1
+        return pd.Categorical.from_codes(codes, dtype=values.dtype)
+    taken = values.to_numpy()[positions]
+    if (positions < 0).any():
+        taken = np.where(positions < 0, np.nan, taken)
+    return taken
+
+
+def load_merged(columns=None, start=None, end=None, keep_id=False, index=True,
+                data_path=DATA_PATH, cache_dir=None):
+    """Row-level sales with store attributes and holiday flag, in compact dtypes
+
+    columns may name any of the train, store and holiday flag columns.
+    """
+    columns = list(columns) if columns is not None else [c for c in SCHEMA if keep_id or c != 'id']
+    train_columns = [c for c in ['id', 'date', 'store_nbr', 'family', 'sales', 'onpromotion']
+                     if c in columns or c in INDEX]
+    train_df = ingest.load_train(columns=train_columns, start=start, end=end,
+                                 data_path=data_path, cache_dir=cache_dir)
+
+    store_columns = [c for c in STORE_COLUMNS if c in columns]
+    holiday_columns = [c for c in HOLIDAY_COLUMNS if c in columns]
+    if store_columns or holiday_columns:
+        stores_df = apply_schema(ingest.load_stores(data_path=data_path, cache_dir=cache_dir))
+        positions = pd.Index(stores_df['store_nbr']).get_indexer(train_df['store_nbr'])
+        for column in store_columns:
+            train_df[column] = _take_store_column(stores_df, positions, column)
+    if holiday_columns:
+        calendar = holiday_calendar.load_calendar(data_path, cache_dir)
+        regional, local = calendar.store_columns(stores_df)
+        # Position -1 (unknown store) picks the appended all-zero column: national days only
+        regional = np.append(regional, calendar.none)[positions]
+        local = np.append(local, calendar.none)[positions]
+        flags = holiday_calendar.flag_columns(calendar.store_flags(train_df['date'], regional, local))
+        for column in holiday_columns:
+            train_df[column] = flags[column]
+
+    train_df = apply_schema(train_df)
+    if index:
+        train_df = train_df.set_index(INDEX).sort_index()
+        keep = [c for c in columns if c not in INDEX]
+    else:
+        train_df = train_df.sort_values(INDEX, ignore_index=True)
+        keep = list(dict.fromkeys(INDEX + columns))
+    return train_df[keep]
+
+
+def memory_report(df):
+    """Per-column (and index level) dtype and deep memory, largest first"""
+    rows = []
+    if isinstance(df.index, pd.MultiIndex):
+        for level, codes, name in zip(df.index.levels, df.index.codes, df.index.names):
+            rows.append({'column': f'index:{name}', 'dtype': f'{level.dtype} (codes {codes.dtype})',
+                         'bytes': level.memory_usage(deep=True) + codes.nbytes})
+    elif not isinstance(df.index, pd.RangeIndex):
+        rows.append({'column': f'index:{df.index.name}', 'dtype': str(df.index.dtype),
+                     'bytes': df.index.memory_usage(deep=True)})
+    for column in df.columns:
+        rows.append({'column': column, 'dtype': str(df[column].dtype),
+                     'bytes': int(df[column].memory_usage(index=False, deep=True))})
+    report = pd.DataFrame(rows)
+    report['MB'] = report['bytes'] / 2 ** 20
+    report['share'] = report['bytes'] / report['bytes'].sum()
+    report['bytes_per_row'] = report['bytes'] / max(len(df), 1)
+    return report.sort_values('bytes', ascending=False).reset_index(drop=True)
+
+
+def original_merged(data_path=DATA_PATH):
+    """The frame the original dashboard load_data() built, for comparison"""
+    train_df = pd.read_csv(os.path.join(data_path, 'train.csv'))
+    stores_df = pd.read_csv(os.path.join(data_path, 'stores.csv'))
+    holidays_df = pd.read_csv(os.path.join(data_path, 'holidays_events.csv'))
+    train_df['date'] = pd.to_datetime(train_df['date'])
+    holidays_df['date'] = pd.to_datetime(holidays_df['date'])
+    train_df = train_df.merge(stores_df, on='store_nbr', how='left')
+    holidays_df['is_holiday'] = True
+    holidays_df = holidays_df[['date', 'is_holiday']].drop_duplicates()
+    train_df = train_df.merge(holidays_df, on='date', how='left')
+    train_df['is_holiday'] = train_df['is_holiday'].astype(object).fillna(False)
+    return train_df
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Memory of the compact vs the original merged frame')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--keep-id', action='store_true')
+    args = parser.parse_args()
+
+    original = memory_report(original_merged(args.data_path))
+    compact_df = load_merged(keep_id=args.keep_id, data_path=args.data_path, cache_dir=args.cache_dir)
+    compact = memory_report(compact_df)
+    print("Original frame:")
+    print(original.to_string(index=False, formatters={'MB': '{:,.1f}'.format, 'share': '{:.0%}'.format,
+                                                      'bytes_per_row': '{:,.1f}'.format}))
+    print("\nCompact frame:")
+    print(compact.to_string(index=False, formatters={'MB': '{:,.1f}'.format, 'share': '{:.0%}'.format,
+                                                     'bytes_per_row': '{:,.1f}'.format}))
+    ratio = original['bytes'].sum() / compact['bytes'].sum()
+    print(f"\n✅ {len(compact_df):,} rows: {original['MB'].sum():,.1f} MB -> {compact['MB'].sum():,.1f} MB "
+          f"({ratio:.1f}x smaller)")
@@ -0,0 +1,114 @@
+"""Weekday, month, day-of-month and promotion profiles of the daily series.
+
+The Seasonal Analysis and Business Insights pages show the same averages.
+They are computed together in one pass with ``np.bincount`` over integer
+calendar codes (no string day names, no groupby), and returned as an
+immutable ``SeasonalStats`` with read-only arrays. The caller's frame is
+never modified, so the result can be cached once per data version and
+shared by every session.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+DAY_NAMES = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+_FIELDS = [
+    'weekday_mean', 'weekday_days',        # (7,) Monday first
+    'month_mean', 'month_days',            # (12,) January first
+    'day_of_month_mean', 'day_of_month_days',  # (31,) day 1 first
+    'promo_mean', 'promo_days',            # (2,) without, with promotion
+    'recent_avg', 'earlier_avg',           # last / first 365 days
+]
+
+
+def _frozen(array):
+    array = np.asarray(array)
+    array.flags.writeable = False
+    return array
+
+
+def _profile(codes, sales, size):
+    """Mean sales and day count per code (NaN where a code has no days)"""
+    days = np.bincount(codes, minlength=size)
+    totals = np.bincount(codes, weights=sales, minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = totals / days
+    return _frozen(means), _frozen(days)
+
+
+class SeasonalStats(namedtuple('SeasonalStats', _FIELDS)):
+    """Immutable seasonal profile of daily sales"""
+    __slots__ = ()
+
+    @property
+    def weekly(self):
+        return pd.Series(self.weekday_mean, index=list(DAY_NAMES))
+
+    @property
+    def monthly(self):
+        return pd.Series(self.month_mean, index=pd.RangeIndex(1, 13, name='month'))
+
+    @property
+    def day_of_month(self):
+        return pd.Series(self.day_of_month_mean, index=pd.RangeIndex(1, 32, name='day_of_month'))
+
+    @property
+    def best_day(self):
+        return DAY_NAMES[int(np.nanargmax(self.weekday_mean))]
+
+    @property
+    def worst_day(self):
+        return DAY_NAMES[int(np.nanargmin(self.weekday_mean))]
+
+    @property
+    def best_month(self):
+        """Month number (1-12) with the highest average sales"""
+        return int(np.nanargmax(self.month_mean)) + 1
+
+    @property
+    def worst_month(self):
+        return int(np.nanargmin(self.month_mean)) + 1
+
+    @property
+    def seasonal_variation(self):
+        """Spread of the monthly means as % of their average"""
+        return float((np.nanmax(self.month_mean) - np.nanmin(self.month_mean)) / np.nanmean(self.month_mean) * 100)
+
+    @property
+    def has_promo_split(self):
+        """True when there are days both with and without promotions"""
+        return bool(np.all(self.promo_days > 0))
+
+    @property
+    def promo_lift(self):
+        """% sales lift on promotion days (0 without both kinds of days)"""
+        if not self.has_promo_split:
+            return 0.0
+        return float((self.promo_mean[1] - self.promo_mean[0]) / self.promo_mean[0] * 100)
+
+    @property
+    def trend_pct(self):
+        """% change between the first and the last 365 days"""
+        if self.earlier_avg <= 0:
+            return 0.0
+        return float((self.recent_avg - self.earlier_avg) / self.earlier_avg * 100)
+
+
+def compute_seasonal_stats(dates, sales, onpromotion):
+    """Every profile of a daily series in one pass"""
+    dates = pd.DatetimeIndex(dates)
+    sales = np.asarray(sales, dtype=np.float64)
+    promo = (np.asarray(onpromotion) > 0).astype(np.int64)
+
+    weekday_mean, weekday_days = _profile(dates.dayofweek.to_numpy(), sales, 7)
+    month_mean, month_days = _profile(dates.month.to_numpy() - 1, sales, 12)
+    dom_mean, dom_days = _profile(dates.day.to_numpy() - 1, sales, 31)
+    promo_mean, promo_days = _profile(promo, sales, 2)
+    return SeasonalStats(
+        weekday_mean, weekday_days, month_mean, month_days, dom_mean, dom_days,
+        promo_mean, promo_days,
+        float(sales[-365:].mean()), float(sales[:365].mean()),
+    )
@@ -0,0 +1,409 @@
+"""Forecast-serving HTTP API (plain ASGI, no web framework).
+
+Downstream systems (replenishment, staffing) fetch forecasts over HTTP::
+
+    GET  /forecast?store=1&family=GROCERY%20I&horizon=28[&model=Seasonal%20Profile]
+    POST /forecast/batch   {"requests": [{"store": 1, "family": "DAIRY", "horizon": 14}, ...]}
+    GET  /health
+
+``store`` and ``family`` are optional: leaving one out sums over it, so
+``/forecast?horizon=30`` forecasts the national daily total like the
+dashboard. Series come from the ``store_family`` rollup and models from
+``models.make_model``; for the national total, a model registered for the
+current data version is served from the registry instead of refitted.
+
+Fitted models are kept in a byte-limited LRU (``RETAIL_SERVICE_CACHE_MB``),
+so a cached series only costs a ``predict``. Fits run on a thread pool and
+concurrent requests for the same uncached series share one fit. The data
+version is re-checked every ``refresh_seconds``; a new version drops the
+series matrix and every cached model.
+
+Serve with uvicorn (optional dependency)::
+
+    python -m retail_forecast.service --port 8000
+
+or exercise the app in-process, without a server::
+
+    python -m retail_forecast.service --bench 500
+"""
+import asyncio
+import json
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+import numpy as np
+
+from retail_forecast import rollups
+from retail_forecast.config import DATA_PATH, SERVICE_CACHE_MB, cache_dir_for
+from retail_forecast.hierarchy import load_bottom_series
+from retail_forecast.models import available_models, make_model
+from retail_forecast.registry import ModelRegistry
+
+try:
+    import uvicorn
+    UVICORN_AVAILABLE = True
+except ImportError:
+    UVICORN_AVAILABLE = False
+
+DEFAULT_MODEL = 'Seasonal Profile'
+MAX_HORIZON = 365
+MAX_BATCH = 1000
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class ModelCache:
+    """Byte-limited LRU of fitted models; sizes are their pickled length"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, key, model):
+        size = len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._bytes -= self._items.pop(key)[1]
+            self._items[key] = (model, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'items': len(self._items),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class ForecastService:
+    """Series lookup, model cache and request coalescing behind the HTTP routes"""
+
+    def __init__(self, data_path=DATA_PATH, cache_dir=None, cache_bytes=SERVICE_CACHE_MB * 1024 * 1024,
+                 workers=4, refresh_seconds=30):
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+        self.refresh_seconds = refresh_seconds
+        self.models = ModelCache(cache_bytes)
+        self.registry = ModelRegistry(os.path.join(cache_dir or cache_dir_for(data_path), 'models'))
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fit')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self.version = None
+        self.started_at = time.time()
+        self.fits = 0
+        self.coalesced = 0
+
+    def load(self):
+        """Load the series matrix if the data version changed"""
+        version = rollups.data_version(data_path=self.data_path, cache_dir=self.cache_dir)
+        if version != self.version:
+            values, keys, dates = load_bottom_series(data_path=self.data_path, cache_dir=self.cache_dir)
+            with self._lock:
+                self.values, self.keys, self.dates = values, keys, dates
+                self.store_rows = {int(s): rows for s, rows in keys.groupby('store_nbr').indices.items()}
+                self.family_rows = dict(keys.groupby('family').indices.items())
+                self.version = version
+                self.models.clear()
+        self._checked_at = time.monotonic()
+
+    def current(self):
+        """(version, values, dates, store_rows, family_rows) of one load, read together"""
+        with self._lock:
+            return self.version, self.values, self.dates, self.store_rows, self.family_rows
+
+    def due(self):
+        """True when the data version should be (re)checked"""
+        return self.version is None or time.monotonic() - self._checked_at > self.refresh_seconds
+
+    def series(self, store=None, family=None, data=None):
+        """Daily sales of one store x family (or their sum when one is None) in data (default: current())"""
+        _, values, _, store_rows, family_rows = data or self.current()
+        rows = np.arange(len(values))
+        if store is not None:
+            if store not in store_rows:
+                raise HTTPError(404, f'Unknown store {store}')
+            rows = np.intersect1d(rows, store_rows[store])
+        if family is not None:
+            if family not in family_rows:
+                raise HTTPError(404, f"Unknown family '{family}'")
+            rows = np.intersect1d(rows, family_rows[family])
+        if len(rows) == 0:
+            raise HTTPError(404, f"No series for store {store} and family '{family}'")
+        return values[rows].sum(axis=0)
+
+    def _fit(self, data, model_name, store, family):
+        version, _, dates, _, _ = data
+        if store is None and family is None:
+            registered = self.registry.latest(version)
+            if model_name in registered.index:
+                return self.registry.load(registered.loc[model_name, 'path'])
+        y = self.series(store, family, data)
+        # Stores that opened late have leading zeros; fit on the active span only
+        active = np.flatnonzero(y)
+        start = active[0] if len(active) else len(y) - 1
+        model = make_model(model_name).fit(y[start:], dates[start:])
+        self.fits += 1
+        return model.compact()
+
+    async def model(self, model_name, store, family):
+        """(fitted model, was cached, data version); one fit per key however many requests wait on it"""
+        # One snapshot for the key and the fit, so a reload meanwhile cannot
+        # cache a model of the new data under the old version
+        data = self.current()
+        version = data[0]
+        key = (version, model_name, store, family)
+        model = self.models.get(key)
+        if model is not None:
+            return model, True, version
+        task = self._inflight.get(key)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = loop.run_in_executor(self.executor, self._fit, data, model_name, store, family)
+            self._inflight[key] = task
+            try:
+                model = await task
+            finally:
+                del self._inflight[key]
+            if version == self.version:
+                self.models.put(key, model)
+            return model, False, version
+        self.coalesced += 1
+        return await task, False, version
+
+    async def forecast(self, store=None, family=None, horizon=30, model_name=DEFAULT_MODEL):
+        if model_name not in available_models():
+            raise HTTPError(400, f"Unknown model '{model_name}', expected one of {available_models()}")
+        if not 1 <= horizon <= MAX_HORIZON:
+            raise HTTPError(400, f'horizon must be between 1 and {MAX_HORIZON}')
+        model, cached, version = await self.model(model_name, store, family)
+        forecast = np.maximum(np.asarray(model.predict(horizon), dtype=np.float64), 0)
+        return {
+            'store': store,
+            'family': family,
+            'model': model_name,
+            'horizon': horizon,
+            'data_version': version,
+            'cached': cached,
+            'dates': [f'{day:%Y-%m-%d}' for day in model.future_dates(horizon)],
+            'forecast': np.round(forecast, 2).tolist(),
+        }
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'data_version': self.version,
+            'series': len(self.keys),
+            'last_date': f'{self.dates[-1]:%Y-%m-%d}',
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'fits': self.fits,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight),
+            'model_cache': self.models.stats(),
+        }
+
+
+def _parse_request(params):
+    """(store, family, horizon, model) from query or JSON parameters"""
+    try:
+        store = params.get('store')
+        store = int(store) if store not in (None, '') else None
+        horizon = int(params.get('horizon') or 30)
+    except (TypeError, ValueError):
+        raise HTTPError(400, 'store and horizon must be integers')
+    family = params.get('family') or None
+    return store, family, horizon, params.get('model') or DEFAULT_MODEL
+
+
+async def _read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def _send_json(send, status, payload):
+    body = json.dumps(payload).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def create_app(service=None):
+    """ASGI application serving the forecast routes"""
+    service = service or ForecastService()
+
+    async def batch(body):
+        try:
+            requests = json.loads(body or b'{}').get('requests')
+        except (ValueError, AttributeError):
+            raise HTTPError(400, 'body must be a JSON object')
+        if not isinstance(requests, list) or not requests:
+            raise HTTPError(400, "body needs a non-empty 'requests' list")
+        if len(requests) > MAX_BATCH:
+            raise HTTPError(400, f'at most {MAX_BATCH} requests per batch')
+        for i, params in enumerate(requests):
+            if not isinstance(params, dict):
+                raise HTTPError(400, f'requests[{i}] must be a JSON object')
+
+        async def one(params):
+            try:
+                store, family, horizon, model_name = _parse_request(params)
+                return await service.forecast(store, family, horizon, model_name)
+            except HTTPError as e:
+                return {'error': e.message, 'status': e.status, 'request': params}
+
+        return {'results': await asyncio.gather(*(one(params) for params in requests))}
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await asyncio.get_running_loop().run_in_executor(None, service.load)
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    service.executor.shutdown(wait=False)
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        method, path = scope['method'], scope['path'].rstrip('/')
+        try:
+            if service.due():
+                await asyncio.get_running_loop().run_in_executor(None, service.load)
+            if path == '/health' and method == 'GET':
+                await _send_json(send, 200, service.health())
+            elif path == '/forecast' and method == 'GET':
+                query = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()}
+                store, family, horizon, model_name = _parse_request(query)
+                await _send_json(send, 200, await service.forecast(store, family, horizon, model_name))
+            elif path == '/forecast/batch' and method == 'POST':
+                await _send_json(send, 200, await batch(await _read_body(receive)))
+            elif path in ('/health', '/forecast', '/forecast/batch'):
+                raise HTTPError(405, f'{method} not allowed on {path}')
+            else:
+                raise HTTPError(404, f'No route {path}')
+        except HTTPError as e:
+            await _send_json(send, e.status, {'error': e.message})
+        except Exception as e:
+            await _send_json(send, 500, {'error': f'{type(e).__name__}: {e}'})
+
+    app.service = service
+    return app
+
+
+async def call(app, method, path, body=None):
+    """Invoke the ASGI app in-process; returns (status, decoded JSON)"""
+    path, _, query = path.partition('?')
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(), 'headers': []}
+    payload = json.dumps(body).encode() if body is not None else b''
+    sent = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+
+async def _bench(app, n, horizon):
+    """Warm a sample of series, then time n GET requests against the cache"""
+    service = app.service
+    await call(app, 'GET', '/health')
+    keys = service.keys.sample(min(20, len(service.keys)), random_state=0)
+    paths = [f'/forecast?store={row.store_nbr}&family={row.family}&horizon={horizon}'.replace(' ', '%20')
+             for row in keys.itertuples()]
+
+    # Every series requested three times at once: one fit each, the rest coalesced
+    started = time.perf_counter()
+    await asyncio.gather(*(call(app, 'GET', path) for path in paths * 3))
+    cold_seconds = time.perf_counter() - started
+
+    latencies = []
+    for i in range(n):
+        started = time.perf_counter()
+        status, _ = await call(app, 'GET', paths[i % len(paths)])
+        latencies.append((time.perf_counter() - started) * 1000)
+        if status != 200:
+            raise RuntimeError(f'GET {paths[i % len(paths)]} returned {status}')
+    return len(paths) * 3, cold_seconds, np.percentile(latencies, [50, 99])
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve forecasts over HTTP')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=4, help='threads fitting uncached series')
+    parser.add_argument('--cache-mb', type=int, default=SERVICE_CACHE_MB)
+    parser.add_argument('--bench', type=int, default=0, metavar='N',
+                        help='time N cached requests in-process instead of serving')
+    parser.add_argument('--horizon', type=int, default=28, help='horizon used by --bench')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    app = create_app(ForecastService(args.data_path, args.cache_dir, args.cache_mb * 1024 * 1024, args.workers))
+    if args.bench:
+        cold_requests, cold_seconds, (p50, p99) = asyncio.run(_bench(app, args.bench, args.horizon))
+        stats = app.service.health()
+        print(f"✅ {args.bench:,} cached requests: p50 {p50:.2f} ms, p99 {p99:.2f} ms")
+        print(f"   Cold: {stats['fits']} fits for {cold_requests} requests in {cold_seconds:.2f}s "
+              f"({stats['coalesced']} coalesced)")
+        print(f"   Model cache: {stats['model_cache']['items']} models, "
+              f"{stats['model_cache']['bytes'] / 1024:,.0f} KB")
+    elif not UVICORN_AVAILABLE:
+        raise SystemExit("uvicorn is not installed: pip install uvicorn (or use --bench)")
+    else:
+        uvicorn.run(app, host=args.host, port=args.port)
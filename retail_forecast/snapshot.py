@@ -0,0 +1,302 @@
+"""Prebuilt, memory-mapped data snapshot for fast dashboard startup.
+
+A fresh dashboard process used to block its first session on reading the
+daily cube, pivoting the store_family cube into the drill-down index and
+computing the seasonal profiles, then on importing matplotlib to draw the
+Overview. ``build_snapshot`` does all of that offline and writes the
+results to ``<cache>/snapshots/<version id>/``:
+
+- ``daily/*.npy``: date, sales, onpromotion, is_holiday of the daily cube
+- ``drilldown/*.npy`` + ``keys.parquet``: the (series x day) matrices,
+  per-dimension group totals and series keys of ``drilldown.DrilldownIndex``
+- ``seasonal/*.npy``: the profile arrays of ``seasonal_stats``
+- ``decomposition/*.npz``: the daily and store_family decompositions
+- ``intervals/*.parquet``: the conformal interval table of the seasonal
+  profile, the Forecasts page's default model
+- ``charts/*.png``: the Overview charts of the unfiltered data
+- ``stores.parquet`` and ``meta.json`` (data version, partitions, files)
+
+``load_snapshot`` maps the ``.npy`` arrays read-only with ``np.load(...,
+mmap_mode='r')``, so opening a snapshot costs a few milliseconds and
+pages are read from the OS page cache on demand. Snapshots are written to
+a temporary directory and renamed into place, so a reader never sees a
+half-written one.
+
+The dashboard uses the snapshot matching the current data version, or
+with ``RETAIL_SNAPSHOT`` set, the newest snapshot at that path without
+touching the CSVs or the ingest cache at all. ``check_snapshot`` (and
+``--check``, exit status 0/1) tells whether a replica is ready to serve;
+without ``--snapshot`` it requires the snapshot of the current data version.
+
+Usage::
+
+    python -m retail_forecast.snapshot
+    python -m retail_forecast.snapshot --check --snapshot /srv/snapshots
+"""
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from retail_forecast import decomposition, drilldown, ingest, overview, rollups
+from retail_forecast.config import DATA_PATH, cache_dir_for
+from retail_forecast.registry import fingerprint_id
+from retail_forecast.render_cache import figure_to_png, pyplot
+from retail_forecast.seasonal_stats import SeasonalStats, compute_seasonal_stats
+
+SNAPSHOT_DIR = 'snapshots'
+META = 'meta.json'
+KEEP = 2
+
+DAILY_COLUMNS = ('date', 'sales', 'onpromotion', 'is_holiday')
+MATRICES = ('dates', 'sales', 'onpromotion', 'observed', 'is_holiday')
+LEVELS = ('daily', 'store_family')
+# Models whose national interval table is stored, by file name
+INTERVAL_MODELS = {'Seasonal Profile': 'seasonal_profile'}
+
+
+def snapshot_root(data_path=DATA_PATH, cache_dir=None):
+    return os.path.join(cache_dir or cache_dir_for(data_path), SNAPSHOT_DIR)
+
+
+def read_meta(path):
+    with open(os.path.join(path, META)) as f:
+        return json.load(f)
+
+
+def _save(path, name, array):
+    np.save(os.path.join(path, name + '.npy'), np.ascontiguousarray(array))
+    return name + '.npy'
+
+
+def build_snapshot(data_path=DATA_PATH, cache_dir=None, root=None, force=False):
+    """Write the snapshot of the current data version; returns its path"""
+    started = time.time()
+    root = root or snapshot_root(data_path, cache_dir)
+    partitions = sorted(rollups.partition_versions(data_path, cache_dir).items())
+    version = rollups.data_version(data_path=data_path, cache_dir=cache_dir)
+    target = os.path.join(root, fingerprint_id(version))
+    if os.path.exists(os.path.join(target, META)) and not force:
+        return target
+
+    tmp = f'{target}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    files = []
+    for folder in ('daily', 'drilldown', 'seasonal', 'decomposition', 'intervals', 'charts'):
+        os.makedirs(os.path.join(tmp, folder))
+
+    daily_df = rollups.load_rollup('daily', data_path=data_path, cache_dir=cache_dir)
+    daily_df['sales'] = daily_df['sales'].astype('float64')
+    for column in DAILY_COLUMNS:
+        files.append('daily/' + _save(os.path.join(tmp, 'daily'), column, daily_df[column].to_numpy()))
+
+    index = drilldown.build_index(data_path, cache_dir)
+    index.keys.to_parquet(os.path.join(tmp, 'drilldown', 'keys.parquet'), index=False)
+    files.append('drilldown/keys.parquet')
+    matrices = {
+        'dates': index.dates.to_numpy(),
+        'sales': index.sales,
+        # Daily promotion counts of one series fit easily in int32
+        'onpromotion': index.onpromotion.astype(np.int32),
+        'observed': index.observed,
+        'is_holiday': index.is_holiday,
+    }
+    for name in MATRICES:
+        files.append('drilldown/' + _save(os.path.join(tmp, 'drilldown'), name, matrices[name]))
+    for dim in drilldown.DIMENSIONS:
+        files.append('drilldown/' + _save(os.path.join(tmp, 'drilldown'), f'group_sales.{dim}',
+                                          index.group_sales[dim]))
+        files.append('drilldown/' + _save(os.path.join(tmp, 'drilldown'), f'group_promotions.{dim}',
+                                          index.group_promotions[dim]))
+
+    stats = compute_seasonal_stats(daily_df['date'], daily_df['sales'], daily_df['onpromotion'])
+    seasonal = {}
+    for field, value in stats._asdict().items():
+        if np.ndim(value):
+            files.append('seasonal/' + _save(os.path.join(tmp, 'seasonal'), field, value))
+        else:
+            seasonal[field] = value
+
+    for level in LEVELS:
+        decomposition.load_decomposition(level, version, data_path, cache_dir).save(
+            os.path.join(tmp, 'decomposition', level + '.npz'), version)
+        files.append(f'decomposition/{level}.npz')
+
+    # Imported here: intervals pulls in the backtest and model modules
+    from retail_forecast import intervals
+
+    for model, name in INTERVAL_MODELS.items():
+        intervals.daily_table(model, version=version, data_path=data_path, cache_dir=cache_dir).to_parquet(
+            os.path.join(tmp, 'intervals', name + '.parquet'), index=False)
+        files.append(f'intervals/{name}.parquet')
+
+    for name, draw in overview.CHARTS.items():
+        fig = draw(daily_df)
+        with open(os.path.join(tmp, 'charts', name + '.png'), 'wb') as f:
+            f.write(figure_to_png(fig))
+        pyplot().close(fig)
+        files.append(f'charts/{name}.png')
+
+    ingest.load_stores(data_path=data_path, cache_dir=cache_dir).to_parquet(
+        os.path.join(tmp, 'stores.parquet'), index=False)
+    files.append('stores.parquet')
+
+    meta = {
+        'version': version,
+        'fingerprint': ingest.source_fingerprint(data_path),
+        'partitions': partitions,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'build_seconds': round(time.time() - started, 2),
+        'days': len(daily_df),
+        'series': len(index.keys),
+        'seasonal': seasonal,
+        'charts': list(overview.CHARTS),
+        'files': files,
+    }
+    with open(os.path.join(tmp, META), 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    remove_stale(root, keep=target)
+    return target
+
+
+def remove_stale(root, keep):
+    """Drop all but the KEEP newest snapshots (always keeping `keep`)"""
+    snapshots = sorted(list_snapshots(root), key=os.path.getmtime, reverse=True)
+    for path in [path for path in snapshots if path != keep][KEEP - 1:]:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def list_snapshots(root):
+    """Complete snapshot directories under root"""
+    if not os.path.isdir(root):
+        return []
+    paths = [os.path.join(root, name) for name in os.listdir(root) if '.tmp-' not in name]
+    return [path for path in paths if os.path.exists(os.path.join(path, META))]
+
+
+def find_snapshot(path, version=None):
+    """The snapshot at path, or under it the one of `version` (the newest when None)
+
+    Returns None when there is no such snapshot.
+    """
+    if os.path.exists(os.path.join(path, META)):
+        return path if version is None or read_meta(path)['version'] == version else None
+    if version is not None:
+        target = os.path.join(path, fingerprint_id(version))
+        return target if os.path.exists(os.path.join(target, META)) else None
+    snapshots = list_snapshots(path)
+    return max(snapshots, key=lambda p: read_meta(p)['built_at']) if snapshots else None
+
+
+class Snapshot:
+    """Read-only view of a snapshot directory; arrays are memory-mapped"""
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = read_meta(path)
+        self.version = self.meta['version']
+        self.fingerprint = self.meta['fingerprint']
+        self.partitions = tuple((int(year), stamp) for year, stamp in self.meta['partitions'])
+
+        daily = {column: self._array('daily', column) for column in DAILY_COLUMNS}
+        self.daily = pd.DataFrame(daily)
+        self.stores = pd.read_parquet(os.path.join(path, 'stores.parquet'))
+
+        keys = pd.read_parquet(os.path.join(path, 'drilldown', 'keys.parquet'))
+        matrices = {name: self._array('drilldown', name) for name in MATRICES}
+        totals = tuple({dim: self._array('drilldown', f'{kind}.{dim}') for dim in drilldown.DIMENSIONS}
+                       for kind in ('group_sales', 'group_promotions'))
+        self.drilldown = drilldown.DrilldownIndex(keys, matrices['sales'], matrices['onpromotion'],
+                                                  matrices['dates'], matrices['observed'], matrices['is_holiday'],
+                                                  totals)
+
+        self.seasonal = SeasonalStats(**{
+            field: self.meta['seasonal'][field] if field in self.meta['seasonal'] else self._array('seasonal', field)
+            for field in SeasonalStats._fields
+        })
+
+    def _array(self, folder, name):
+        return np.load(os.path.join(self.path, folder, name + '.npy'), mmap_mode='r')
+
+    def charts(self):
+        """Map of Overview chart name -> PNG bytes"""
+        charts = {}
+        for name in self.meta['charts']:
+            with open(os.path.join(self.path, 'charts', name + '.png'), 'rb') as f:
+                charts[name] = f.read()
+        return charts
+
+    def interval_table(self, model):
+        """Interval table of a national model (see intervals.daily_table); None when not stored"""
+        if model not in INTERVAL_MODELS:
+            return None
+        return pd.read_parquet(os.path.join(self.path, 'intervals', INTERVAL_MODELS[model] + '.parquet'))
+
+    def decomposition(self, level):
+        """decomposition.Decomposition of a level, as of the snapshot's data version"""
+        result = decomposition.Decomposition.load(os.path.join(self.path, 'decomposition', level + '.npz'))
+        result.version = self.version
+        return result
+
+
+def load_snapshot(path, version=None):
+    """Snapshot at or under path (see find_snapshot); None when there is none"""
+    found = find_snapshot(path, version)
+    return Snapshot(found) if found is not None else None
+
+
+def check_snapshot(path, version=None):
+    """Readiness of the snapshot at or under path: a dict with 'ready' and why
+
+    Only reads meta.json and checks that every listed file is in place, so
+    it is cheap enough for a readiness probe.
+    """
+    found = find_snapshot(path, version) if os.path.isdir(path) else None
+    if found is None:
+        return {'ready': False, 'path': path, 'reason': 'no snapshot' + (f' of {version}' if version else '')}
+    meta = read_meta(found)
+    missing = [name for name in meta['files'] if not os.path.exists(os.path.join(found, name))]
+    return {
+        'ready': not missing,
+        'path': found,
+        'version': meta['version'],
+        'built_at': meta['built_at'],
+        'reason': f'missing {missing}' if missing else 'ok',
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the dashboard snapshot, or check that one is ready')
+    parser.add_argument('--check', action='store_true', help='exit 1 unless a complete snapshot (of the current data, without --snapshot) exists')
+    parser.add_argument('--snapshot', default=None,
+                        help='snapshot directory or folder of snapshots (default: <cache>/snapshots)')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the version is already there')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    if args.check:
+        if args.snapshot:
+            status = check_snapshot(args.snapshot)
+        else:
+            # The local cache must hold the snapshot of the current data, not a stale one
+            version = rollups.data_version(data_path=args.data_path, cache_dir=args.cache_dir)
+            status = check_snapshot(snapshot_root(args.data_path, args.cache_dir), version)
+        print(json.dumps(status))
+        raise SystemExit(0 if status['ready'] else 1)
+
+    started = time.perf_counter()
+    path = build_snapshot(args.data_path, args.cache_dir, args.snapshot, args.force)
+    print(f"✅ Snapshot {path} in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    snapshot = Snapshot(path)
+    print(f"   {snapshot.meta['days']:,} days, {snapshot.meta['series']:,} series; "
+          f"opened in {(time.perf_counter() - started) * 1000:.0f} ms")
@@ -0,0 +1,188 @@
+"""Chunked ingest for a train.csv larger than memory.
+
+``train.csv`` is read ``chunksize`` rows at a time with fixed dtypes. Each
+chunk is written straight to the year-partitioned Parquet cache and folded
+into running per-year sums for every rollup cube; raw rows are never held
+beyond one chunk. The CSV is ordered by date, so once a chunk starts a
+later year the sums of earlier years are final and are written out and
+freed. Holiday flags are attached to the daily cube after aggregation, never
+to rows.
+
+Peak memory is one chunk plus one year of ``store_family`` sums, however
+many years the history covers. The result is the same ingest cache and
+rollups that ``ingest.build_cache`` + ``rollups.build_rollups`` produce, so
+every reader works unchanged.
+
+Enable it for every cache build with ``RETAIL_INGEST_CHUNKSIZE=1000000`` or
+run it directly::
+
+    python -m retail_forecast.streaming --chunksize 1000000
+"""
+import os
+import shutil
+import time
+
+import pandas as pd
+import pyarrow.dataset as ds
+
+from retail_forecast import holiday_calendar, ingest, rollups
+from retail_forecast.config import DATA_PATH, cache_dir_for
+
+DEFAULT_CHUNKSIZE = 1_000_000
+
+# Partial sums are re-folded once this many chunks have piled up for a year
+FOLD_EVERY = 8
+
+
+def _fold(partials, keys):
+    """Sum partial aggregates that may share keys"""
+    if len(partials) == 1:
+        return partials[0]
+    merged = pd.concat(partials, ignore_index=True)
+    return (merged.groupby(keys, observed=True)[['sales', 'onpromotion']]
+            .sum()
+            .reset_index())
+
+
+def _partial(chunk_df, keys):
+    partial = (chunk_df.groupby(keys, observed=True)[['sales', 'onpromotion']]
+               .sum()
+               .reset_index())
+    if 'family' in partial:
+        partial['family'] = partial['family'].astype(str)
+    return partial
+
+
+def _flush_year(year, partials, rollup_dir, calendar):
+    """Write the finished sums of one year as the cubes' year partitions"""
+    for name, keys in rollups.CUBES.items():
+        cube_path = os.path.join(rollup_dir, name)
+        part_dir = os.path.join(cube_path, f'year={year}')
+        pieces = partials[name]
+        if os.path.isdir(part_dir):
+            # Rows for an already written year (unsorted CSV): fold them in
+            existing = pd.read_parquet(part_dir).drop(columns=['year', 'is_holiday'], errors='ignore')
+            if 'family' in existing:
+                existing['family'] = existing['family'].astype(str)
+            pieces = [existing] + pieces
+        cube_df = rollups.compact(_fold(pieces, keys))
+        if name == 'daily':
+            cube_df['is_holiday'] = rollups.national_days_off(calendar, cube_df['date'])
+        ingest.write_partition(cube_path, year, cube_df.sort_values(keys))
+
+
+def build_streaming(data_path=DATA_PATH, cache_dir=None, chunksize=DEFAULT_CHUNKSIZE, force=False,
+                    progress=None):
+    """Build the ingest cache and rollups in one chunked pass; returns the cache path"""
+    cache_dir = cache_dir or cache_dir_for(data_path)
+    fingerprint = ingest.source_fingerprint(data_path)
+    target = ingest.cache_path(fingerprint, cache_dir)
+    if not force and os.path.exists(os.path.join(target, ingest.MANIFEST)):
+        return target
+
+    started = time.time()
+    tmp = f'{target}.tmp-{os.getpid()}'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    train_dir = os.path.join(tmp, 'train')
+    rollup_dir = os.path.join(tmp, rollups.ROLLUP_DIR)
+
+    # Small dimension tables first: holiday flags are needed when a year is flushed
+    stores_df = pd.read_csv(os.path.join(data_path, 'stores.csv'), dtype=ingest.STORES_DTYPES)
+    stores_df.to_parquet(os.path.join(tmp, 'stores.parquet'), index=False)
+    holidays_df = pd.read_csv(os.path.join(data_path, 'holidays_events.csv'), parse_dates=['date'])
+    holidays_df.to_parquet(os.path.join(tmp, 'holidays.parquet'), index=False)
+    calendar = holiday_calendar.EventCalendar(holiday_calendar.clean_events(holidays_df))
+
+    pending = {}
+    rows, date_min, date_max, years = 0, None, None, set()
+    reader = pd.read_csv(
+        os.path.join(data_path, 'train.csv'),
+        dtype=ingest.TRAIN_DTYPES,
+        parse_dates=['date'],
+        chunksize=chunksize
+    )
+    for i, chunk_df in enumerate(reader):
+        chunk_df['year'] = chunk_df['date'].dt.year.astype('int16')
+        rows += len(chunk_df)
+        date_min = min(date_min, chunk_df['date'].min()) if date_min is not None else chunk_df['date'].min()
+        date_max = max(date_max, chunk_df['date'].max()) if date_max is not None else chunk_df['date'].max()
+
+        for year, year_df in chunk_df.groupby('year'):
+            year = int(year)
+            years.add(year)
+            part_dir = os.path.join(train_dir, f'year={year}')
+            os.makedirs(part_dir, exist_ok=True)
+            year_df.drop(columns='year').to_parquet(os.path.join(part_dir, f'part-{i:06d}.parquet'), index=False)
+
+            partials = pending.setdefault(year, {name: [] for name in rollups.CUBES})
+            for name, keys in rollups.CUBES.items():
+                partials[name].append(_partial(year_df, keys))
+                if len(partials[name]) >= FOLD_EVERY:
+                    partials[name] = [_fold(partials[name], keys)]
+
+        first_year = int(chunk_df['year'].min())
+        for year in [year for year in pending if year < first_year]:
+            _flush_year(year, pending.pop(year), rollup_dir, calendar)
+        if progress is not None:
+            progress(rows, time.time() - started)
+        del chunk_df
+
+    for year in sorted(pending):
+        _flush_year(year, pending.pop(year), rollup_dir, calendar)
+
+    build_seconds = round(time.time() - started, 2)
+    stamp = str(time.time_ns())
+    rollups.write_manifest(rollup_dir, {
+        'format': rollups.ROLLUP_FORMAT,
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'build_seconds': build_seconds,
+        'rows': {
+            name: ds.dataset(os.path.join(rollup_dir, name), partitioning='hive').count_rows()
+            for name in rollups.CUBES
+        },
+        'versions': {str(year): stamp for year in sorted(years)},
+    })
+    ingest.write_manifest(tmp, {
+        'fingerprint': fingerprint,
+        'data_path': os.path.abspath(data_path),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'build_seconds': build_seconds,
+        'rows': rows,
+        'date_min': date_min.strftime('%Y-%m-%d'),
+        'date_max': date_max.strftime('%Y-%m-%d'),
+        'years': sorted(years),
+        'chunksize': chunksize,
+    })
+
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    try:
+        os.replace(tmp, target)
+    except OSError:
+        shutil.rmtree(tmp, ignore_errors=True)
+    ingest.remove_stale(cache_dir, keep=target)
+    return target
+
+
+def print_progress(rows, elapsed):
+    print(f"   {rows:,} rows ingested ({rows / max(elapsed, 1e-9):,.0f} rows/s)", flush=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    import resource
+
+    parser = argparse.ArgumentParser(description='Chunked ingest of train.csv into the cache and rollups')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument('--force', action='store_true', help='rebuild even if the cache is current')
+    args = parser.parse_args()
+
+    path = build_streaming(args.data_path, args.cache_dir, args.chunksize, args.force, print_progress)
+    manifest = ingest.read_manifest(path)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"✅ Ingest cache and rollups ready: {path}")
+    print(f"   Rows: {manifest['rows']:,} ({manifest['date_min']} to {manifest['date_max']})")
+    print(f"   Build time: {manifest['build_seconds']}s, peak RSS: {peak_mb:,.0f} MB")
@@ -0,0 +1,243 @@
+"""Synthetic store-sales data in the Kaggle CSV layout.
+
+Writes ``train.csv``, ``stores.csv`` and ``holidays_events.csv`` with the
+same columns and quirks as the competition files: stores that open late
+(zero sales before), families that only start selling later, no rows on
+Dec 25, promotions that lift sales, and national/regional/local holidays
+including transferred days, bridges and work days. Sales combine a
+per-series level, growth, weekday and yearly seasonality, paydays
+(15th and month end) and gamma noise.
+
+Sizes (stores x families x days)::
+
+    tiny     3 x 4 x 800        ~10k rows
+    medium   10 x 33 x 1684     ~550k rows
+    kaggle   54 x 33 x 1684     ~3M rows (the competition's shape)
+    10x      540 x 33 x 1684    ~30M rows
+
+Rows are generated and appended a block of days at a time, so memory stays
+flat for the largest size. The output is deterministic for a given seed.
+
+Usage::
+
+    python -m retail_forecast.synthetic --size medium --output data/synthetic-medium
+"""
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+SIZES = {
+    'tiny': {'stores': 3, 'families': 4, 'days': 800},
+    'medium': {'stores': 10, 'families': 33, 'days': 1684},
+    'kaggle': {'stores': 54, 'families': 33, 'days': 1684},
+    '10x': {'stores': 540, 'families': 33, 'days': 1684},
+}
+
+START_DATE = '2013-01-01'
+PARAMS_FILE = 'synthetic.json'
+
+FAMILIES = [
+    'AUTOMOTIVE', 'BABY CARE', 'BEAUTY', 'BEVERAGES', 'BOOKS', 'BREAD/BAKERY', 'CELEBRATION',
+    'CLEANING', 'DAIRY', 'DELI', 'EGGS', 'FROZEN FOODS', 'GROCERY I', 'GROCERY II', 'HARDWARE',
+    'HOME AND KITCHEN I', 'HOME AND KITCHEN II', 'HOME APPLIANCES', 'HOME CARE', 'LADIESWEAR',
+    'LAWN AND GARDEN', 'LINGERIE', 'LIQUOR,WINE,BEER', 'MAGAZINES', 'MEATS', 'PERSONAL CARE',
+    'PET SUPPLIES', 'PLAYERS AND ELECTRONICS', 'POULTRY', 'PREPARED FOODS', 'PRODUCE',
+    'SCHOOL AND OFFICE SUPPLIES', 'SEAFOOD',
+]
+
+CITIES = [
+    ('Quito', 'Pichincha'), ('Guayaquil', 'Guayas'), ('Cuenca', 'Azuay'), ('Santo Domingo',
+    'Santo Domingo de los Tsachilas'), ('Machala', 'El Oro'), ('Manta', 'Manabi'),
+    ('Ambato', 'Tungurahua'), ('Latacunga', 'Cotopaxi'), ('Loja', 'Loja'), ('Riobamba', 'Chimborazo'),
+]
+
+# (month, day, description) of fixed-date national holidays
+NATIONAL_HOLIDAYS = [
+    (1, 1, 'Primer dia del ano'), (5, 1, 'Dia del Trabajo'), (5, 24, 'Batalla de Pichincha'),
+    (8, 10, 'Primer Grito de Independencia'), (10, 9, 'Independencia de Guayaquil'),
+    (11, 2, 'Dia de Difuntos'), (11, 3, 'Independencia de Cuenca'), (12, 25, 'Navidad'),
+]
+
+BLOCK_DAYS = 64
+
+
+def make_stores(n_stores, rng):
+    cities = [CITIES[i % len(CITIES)] for i in range(n_stores)]
+    return pd.DataFrame({
+        'store_nbr': np.arange(1, n_stores + 1),
+        'city': [city for city, _ in cities],
+        'state': [state for _, state in cities],
+        'type': rng.choice(list('ABCDE'), n_stores, p=[0.2, 0.2, 0.3, 0.2, 0.1]),
+        'cluster': rng.integers(1, 18, n_stores),
+    })
+
+
+def make_holidays(dates, stores_df):
+    """Holiday events for every year in dates, in the Kaggle layout"""
+    rows = []
+    for year in sorted(set(dates.year)):
+        # Independence of Guayaquil moves to the Friday of its week, with a transfer day
+        independence = pd.Timestamp(f'{year}-10-09')
+        transferred = independence.dayofweek < 4
+        for month, day, description in NATIONAL_HOLIDAYS:
+            rows.append((f'{year}-{month:02d}-{day:02d}', 'Holiday', 'National', 'Ecuador', description,
+                         transferred and (month, day) == (10, 9)))
+        if transferred:
+            moved = independence + pd.Timedelta(days=4 - independence.dayofweek)
+            rows.append((f'{moved:%Y-%m-%d}', 'Transfer', 'National', 'Ecuador',
+                         'Traslado Independencia de Guayaquil', False))
+        for day in (21, 22, 23, 24, 26, 31):
+            rows.append((f'{year}-12-{day:02d}', 'Additional', 'National', 'Ecuador', 'Navidad+/-', False))
+        # Bridge day before New Year, made up on a Saturday in December
+        new_year_eve = pd.Timestamp(f'{year}-12-31')
+        if new_year_eve.dayofweek == 1:
+            rows.append((f'{year}-12-30', 'Bridge', 'National', 'Ecuador', 'Puente Primer dia del ano', False))
+            rows.append((f'{year}-12-20', 'Work Day', 'National', 'Ecuador', 'Recupero Puente', False))
+        for i, (city, state) in enumerate(sorted(set(zip(stores_df['city'], stores_df['state'])))):
+            rows.append((f'{year}-{3 + i % 9:02d}-{5 + i:02d}', 'Holiday', 'Local', city,
+                         f'Fundacion de {city}', False))
+            rows.append((f'{year}-{4 + i % 8:02d}-{12 + i:02d}', 'Holiday', 'Regional', state,
+                         f'Provincializacion de {state}', False))
+    holidays_df = pd.DataFrame(rows, columns=['date', 'type', 'locale', 'locale_name', 'description',
+                                              'transferred'])
+    holidays_df = holidays_df[pd.to_datetime(holidays_df['date']).between(dates[0], dates[-1])]
+    return holidays_df.sort_values('date', kind='stable').reset_index(drop=True)
+
+
+def _series_profile(n_stores, n_families, n_days, rng):
+    """Per-series parameters, each shaped (stores * families,)"""
+    n = n_stores * n_families
+    store_size = rng.lognormal(0, 0.5, n_stores)
+    family_size = rng.lognormal(3, 1.5, n_families)
+    level = np.outer(store_size, family_size).ravel() * rng.lognormal(0, 0.3, n)
+    # 1 in 10 stores opens late; a few families start selling late everywhere
+    open_day = np.zeros(n_stores, dtype=np.int64)
+    late = rng.random(n_stores) < 0.1
+    open_day[late] = rng.integers(n_days // 4, n_days * 3 // 4, late.sum())
+    family_start = np.where(rng.random(n_families) < 0.1, rng.integers(0, n_days // 2, n_families), 0)
+    start = np.maximum(np.repeat(open_day, n_families), np.tile(family_start, n_stores))
+    # Some small series hardly ever sell
+    sparse = level < np.quantile(level, 0.1)
+    return {
+        'level': level,
+        'growth': rng.normal(0.00025, 0.0002, n),
+        'weekday': 1 + rng.normal(0, 0.15, (n, 7)) + np.array([0, -0.05, -0.05, 0, 0.1, 0.35, 0.3]),
+        'yearly': rng.normal(0.1, 0.05, n),
+        'promo_rate': np.tile(rng.gamma(0.5, 4, n_families), n_stores),
+        'promo_lift': rng.uniform(0.01, 0.08, n),
+        'start': start,
+        'sparse': sparse,
+    }
+
+
+def _sales_block(dates, day_index, profile, holiday_boost, rng):
+    """(days, series) sales and onpromotion for one block of days"""
+    n = len(profile['level'])
+    t = day_index[:, None]
+    trend = 1 + profile['growth'][None, :] * t
+    weekday = profile['weekday'][:, dates.dayofweek.to_numpy()].T
+    yearly = 1 + profile['yearly'][None, :] * np.cos(2 * np.pi * (dates.dayofyear.to_numpy()[:, None] - 355) / 365.25)
+    payday = 1 + 0.08 * ((dates.day.to_numpy() == 15) | dates.is_month_end)[:, None]
+    promo = rng.poisson(profile['promo_rate'][None, :] * (1 + 0.5 * (dates.dayofweek.to_numpy() >= 4))[:, None],
+                        (len(dates), n))
+    lift = 1 + profile['promo_lift'][None, :] * np.sqrt(promo)
+    mean = (profile['level'][None, :] * trend * weekday * yearly * payday * lift
+            * holiday_boost[:, None])
+    sales = rng.gamma(4, np.maximum(mean, 0) / 4)
+    sales[:, profile['sparse']] *= rng.random((len(dates), profile['sparse'].sum())) < 0.2
+    closed = t < profile['start'][None, :]
+    sales[closed] = 0
+    promo[closed] = 0
+    return np.round(sales, 3), promo
+
+
+def generate(output, size='medium', stores=None, families=None, days=None, seed=0, progress=None):
+    """Write the three CSVs for a size (or explicit dimensions); returns their params"""
+    params = dict(SIZES[size]) if size else {}
+    params.update({k: v for k, v in {'stores': stores, 'families': families, 'days': days}.items() if v})
+    if params['families'] > len(FAMILIES):
+        raise ValueError(f"At most {len(FAMILIES)} families")
+    params.update({'size': size, 'seed': seed, 'start': START_DATE})
+    rng = np.random.default_rng(seed)
+    os.makedirs(output, exist_ok=True)
+    started = time.time()
+
+    dates = pd.date_range(START_DATE, periods=params['days'], freq='D')
+    families_list = FAMILIES[:params['families']]
+    stores_df = make_stores(params['stores'], rng)
+    stores_df.to_csv(os.path.join(output, 'stores.csv'), index=False)
+    holidays_df = make_holidays(dates, stores_df)
+    holidays_df.to_csv(os.path.join(output, 'holidays_events.csv'), index=False)
+
+    national = holidays_df[(holidays_df['locale'] == 'National') & ~holidays_df['transferred']]
+    holiday_boost = np.where(dates.isin(pd.to_datetime(national['date'])), 1.25, 1.0)
+    profile = _series_profile(params['stores'], params['families'], params['days'], rng)
+    store_col = np.repeat(stores_df['store_nbr'].to_numpy(), len(families_list))
+    family_col = np.tile(np.array(families_list, dtype=object), params['stores'])
+
+    tmp = os.path.join(output, f'train.csv.{os.getpid()}.tmp')
+    rows = 0
+    with open(tmp, 'w', newline='') as f:
+        for lo in range(0, len(dates), BLOCK_DAYS):
+            block = dates[lo:lo + BLOCK_DAYS]
+            sales, promo = _sales_block(block, np.arange(lo, lo + len(block)), profile,
+                                        holiday_boost[lo:lo + len(block)], rng)
+            # The competition data has no rows on Christmas day
+            keep = ~((block.month == 12) & (block.day == 25))
+            block, sales, promo = block[keep], sales[keep], promo[keep]
+            n = sales.size
+            pd.DataFrame({
+                'id': np.arange(rows, rows + n),
+                'date': np.repeat(block.strftime('%Y-%m-%d'), len(store_col)),
+                'store_nbr': np.tile(store_col, len(block)),
+                'family': np.tile(family_col, len(block)),
+                'sales': sales.ravel(),
+                'onpromotion': promo.ravel(),
+            }).to_csv(f, header=rows == 0, index=False)
+            rows += n
+            if progress is not None:
+                progress(rows, time.time() - started)
+    os.replace(tmp, os.path.join(output, 'train.csv'))
+
+    params.update({'rows': rows, 'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                   'seconds': round(time.time() - started, 2)})
+    with open(os.path.join(output, PARAMS_FILE), 'w') as f:
+        json.dump(params, f, indent=2)
+    return params
+
+
+def ensure(output, size='medium', seed=0):
+    """Generate into output unless it already holds this size and seed"""
+    params_file = os.path.join(output, PARAMS_FILE)
+    if os.path.exists(params_file):
+        with open(params_file) as f:
+            params = json.load(f)
+        if params.get('size') == size and params.get('seed') == seed:
+            return params
+    return generate(output, size, seed=seed)
+
+
+def print_progress(rows, elapsed):
+    print(f"   {rows:,} rows written ({rows / max(elapsed, 1e-9):,.0f} rows/s)", flush=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate synthetic store-sales CSVs')
+    parser.add_argument('--output', required=True, help='folder for the CSV files')
+    parser.add_argument('--size', choices=SIZES, default='medium')
+    parser.add_argument('--stores', type=int, default=None, help='override the size preset')
+    parser.add_argument('--families', type=int, default=None)
+    parser.add_argument('--days', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    params = generate(args.output, args.size, args.stores, args.families, args.days, args.seed,
+                      print_progress)
+    print(f"✅ Synthetic data written to {args.output}")
+    print(f"   {params['stores']} stores x {params['families']} families x {params['days']} days: "
+          f"{params['rows']:,} rows in {params['seconds']}s")
@@ -0,0 +1,92 @@
+"""Fit the notebook's models, score them on a holdout and register them.
+
+Each model is fitted on all but the last ``holdout_days`` days and scored on
+them, then refitted on the full history and stored in the model registry
+with those holdout metrics. ARIMA/SARIMA use the orders of ``order_search``
+when it has run; the holdout fit gets orders searched without the holdout
+days. Models already registered for the current data version and window are
+skipped unless ``--force`` is given.
+
+Usage::
+
+    python -m retail_forecast.train --models ARIMA SARIMA Prophet
+"""
+import os
+import time
+
+import pandas as pd
+
+from retail_forecast import order_search, prophet_runner, rollups
+from retail_forecast.config import DATA_PATH, cache_dir_for
+from retail_forecast.metrics import calculate_metrics
+from retail_forecast.models import available_models, make_model
+from retail_forecast.registry import ModelRegistry
+
+
+def holidays_frame(data_path=DATA_PATH, cache_dir=None):
+    """Prophet holidays frame of the national series (national holidays, bridges and events)"""
+    return prophet_runner.store_holidays(prophet_runner.holiday_events(data_path, cache_dir))
+
+
+def model_params(name, data_path=DATA_PATH, cache_dir=None):
+    if name == 'Prophet':
+        return {'holidays': holidays_frame(data_path, cache_dir)}
+    return {}
+
+
+def train_models(names=None, holdout_days=90, force=False, data_path=DATA_PATH, cache_dir=None,
+                 registry=None):
+    """Score, refit and register models; returns a frame of metrics and timings"""
+    registry = registry or ModelRegistry(os.path.join(cache_dir or cache_dir_for(data_path), 'models'))
+    names = names or available_models()
+    daily_df = rollups.load_daily_series(data_path, cache_dir)
+    fingerprint = rollups.data_version(data_path=data_path, cache_dir=cache_dir)
+    y = daily_df['sales'].to_numpy()
+    dates = pd.DatetimeIndex(daily_df['date'])
+    split = len(y) - holdout_days
+
+    rows = []
+    for name in names:
+        path = registry.entry_path(name, fingerprint, dates[0], dates[-1])
+        if not force and os.path.exists(os.path.join(path, 'meta.json')):
+            print(f"   {name}: already registered, skipping")
+            continue
+
+        print(f"Fitting {name}...")
+        started = time.time()
+        try:
+            params = model_params(name, data_path, cache_dir)
+            # Orders searched on the full series have seen the holdout; score with the training span's
+            holdout_params = order_search.holdout_params(name, y, split, data_path, cache_dir)
+            holdout_model = make_model(name, **params, **holdout_params).fit(y[:split], dates[:split])
+            metrics = calculate_metrics(y[split:], holdout_model.predict(holdout_days))
+            final_params = order_search.searched_params(name, y, data_path, cache_dir)
+            final_model = make_model(name, **params, **final_params).fit(y, dates).compact()
+        except Exception as e:
+            print(f"   {name} fitting failed: {e}")
+            continue
+        fit_seconds = round(time.time() - started, 2)
+        registry.save(
+            name, final_model, fingerprint, dates[0], dates[-1], metrics,
+            holdout_days=holdout_days, fit_seconds=fit_seconds
+        )
+        print(f"   MAE: ${metrics['MAE']:,.2f}  RMSE: ${metrics['RMSE']:,.2f}  "
+              f"MAPE: {metrics['MAPE']:.2f}%  ({fit_seconds}s)")
+        rows.append({'model': name, **metrics, 'fit_seconds': fit_seconds})
+    return pd.DataFrame(rows)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Fit, score and register forecasting models')
+    parser.add_argument('--models', nargs='+', default=None, help=f'default: {available_models()}')
+    parser.add_argument('--holdout-days', type=int, default=90)
+    parser.add_argument('--force', action='store_true', help='refit models that are already registered')
+    parser.add_argument('--data-path', default=DATA_PATH)
+    parser.add_argument('--cache-dir', default=None)
+    args = parser.parse_args()
+
+    results = train_models(args.models, args.holdout_days, args.force, args.data_path, args.cache_dir)
+    if not results.empty:
+        print("\n" + results.sort_values('MAE').to_string(index=False))